@@ -0,0 +1,194 @@
+"""Compact, column-oriented storage for the username -> user record map.
+
+A dict of per-user dicts costs several hundred bytes per account: the inner
+dict, its four values as separate objects, and the keys' hash table. An
+AccountTable keeps one row per account instead: balances and account
+numbers in int64 arrays, passwords and PINs in plain lists, usernames and
+PINs interned. It behaves like the old dict, so
+
+    users["Lance"]["balance"]
+    users["Lance"].get("pin")
+    dict(users["Lance"], balance=10)
+    users["Lance"] = {"password": ..., "pin": ..., "balance": ..., "account_no": ...}
+
+keep working; users["Lance"] is an AccountRecord view of the row, and
+assigning through it writes back into the table. Records that do not fit
+the columns (extra keys, non-integer balances, unusual account numbers)
+are kept as ordinary dicts on the side.
+"""
+import array
+import sys
+from collections.abc import MutableMapping
+
+FIELDS = ("password", "pin", "balance", "account_no")
+_FIELD_SET = frozenset(FIELDS)
+ACCOUNT_NO_WIDTH = 6
+_ACCOUNT_NO_FORMAT = f"%0{ACCOUNT_NO_WIDTH}d"
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def _columnar(record):
+    """True when a record can be stored in the typed columns without loss."""
+    if record.keys() != _FIELD_SET:
+        return False
+    balance, acc_no = record["balance"], record["account_no"]
+    return (
+        isinstance(record["password"], str) and isinstance(record["pin"], str)
+        and type(balance) is int and _INT64_MIN <= balance <= _INT64_MAX
+        and isinstance(acc_no, str) and len(acc_no) == ACCOUNT_NO_WIDTH
+        and acc_no.isascii() and acc_no.isdigit()
+    )
+
+
+class AccountRecord(MutableMapping):
+    """A live view of one user's row in an AccountTable."""
+
+    __slots__ = ("_table", "_username")
+
+    def __init__(self, table, username):
+        self._table = table
+        self._username = username
+
+    def __getitem__(self, field):
+        return self._table._get_field(self._username, field)
+
+    def __setitem__(self, field, value):
+        record = self._table.record(self._username)
+        record[field] = value
+        self._table[self._username] = record
+
+    def __delitem__(self, field):
+        record = self._table.record(self._username)
+        del record[field]
+        self._table[self._username] = record
+
+    def __iter__(self):
+        return iter(self._table.record(self._username))
+
+    def __len__(self):
+        return len(self._table.record(self._username))
+
+    def copy(self):
+        return self._table.record(self._username)
+
+    def __repr__(self):
+        return f"AccountRecord({self._username!r}, {self.copy()!r})"
+
+
+class AccountTable(MutableMapping):
+    """username -> user record, stored one row per account in typed columns."""
+
+    def __init__(self, users=None):
+        self._rows = {}  # username -> row
+        self._passwords = []
+        self._pins = []
+        self._balances = array.array("q")
+        self._account_nos = array.array("q")
+        self._irregular = {}  # row -> dict, for records _columnar() rejects
+        self._free = []
+        if users:
+            self.update(users)
+
+    def _get_field(self, username, field):
+        row = self._rows[username]
+        irregular = self._irregular.get(row)
+        if irregular is not None:
+            return irregular[field]
+        if field == "balance":
+            return self._balances[row]
+        if field == "account_no":
+            return _ACCOUNT_NO_FORMAT % self._account_nos[row]
+        if field == "pin":
+            return self._pins[row]
+        if field == "password":
+            return self._passwords[row]
+        raise KeyError(field)
+
+    def record(self, username):
+        """A plain dict copy of the user's record."""
+        row = self._rows[username]
+        irregular = self._irregular.get(row)
+        if irregular is not None:
+            return dict(irregular)
+        return {
+            "password": self._passwords[row],
+            "pin": self._pins[row],
+            "balance": self._balances[row],
+            "account_no": _ACCOUNT_NO_FORMAT % self._account_nos[row],
+        }
+
+    def account_numbers(self):
+        """(account_no, username) for every account, without building records."""
+        account_nos, irregular = self._account_nos, self._irregular
+        for username, row in self._rows.items():
+            if row in irregular:
+                yield irregular[row].get("account_no"), username
+            else:
+                yield _ACCOUNT_NO_FORMAT % account_nos[row], username
+
+    def __getitem__(self, username):
+        if username not in self._rows:
+            raise KeyError(username)
+        return AccountRecord(self, username)
+
+    def __setitem__(self, username, record):
+        if isinstance(record, AccountRecord):
+            record = record.copy()
+        row = self._rows.get(username)
+        if row is None:
+            row = self._allocate()
+            self._rows[sys.intern(username)] = row
+        if _columnar(record):
+            self._irregular.pop(row, None)
+            self._passwords[row] = record["password"]
+            self._pins[row] = sys.intern(record["pin"])
+            self._balances[row] = record["balance"]
+            self._account_nos[row] = int(record["account_no"])
+        else:
+            self._irregular[row] = dict(record)
+            self._passwords[row] = self._pins[row] = None
+
+    def update(self, other=(), **kwargs):
+        """Bulk load: new, regular records are appended straight to the columns."""
+        items = other.items() if hasattr(other, "items") else other
+        rows, intern = self._rows, sys.intern
+        add_password, add_pin = self._passwords.append, self._pins.append
+        add_balance, add_account_no = self._balances.append, self._account_nos.append
+        for username, record in items:
+            if username in rows or self._free or type(record) is not dict or not _columnar(record):
+                self[username] = record
+                continue
+            rows[intern(username)] = len(rows)
+            add_password(record["password"])
+            add_pin(intern(record["pin"]))
+            add_balance(record["balance"])
+            add_account_no(int(record["account_no"]))
+        for username, record in kwargs.items():
+            self[username] = record
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        self._passwords.append(None)
+        self._pins.append(None)
+        self._balances.append(0)
+        self._account_nos.append(0)
+        return len(self._passwords) - 1
+
+    def __delitem__(self, username):
+        row = self._rows.pop(username)
+        self._irregular.pop(row, None)
+        self._passwords[row] = self._pins[row] = None
+        self._free.append(row)
+
+    def __contains__(self, username):
+        return username in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return f"AccountTable({len(self)} accounts)"
@@ -0,0 +1,223 @@
+"""Statement analytics: monthly totals, running balances, largest transfers
+and counterparty/category breakdowns for one account.
+
+An account's journal records are read once into parallel columns (amounts,
+plus small integer codes for month, type and counterparty). Totals are then
+grouped over those columns with NumPy when it is installed and every sum
+is sure to fit in int64, or with plain Python otherwise; both give the
+same results. Columns are cached per
+account and extended with just the new records when the journal grows.
+
+    analytics = StatementAnalytics(storage.journal)
+    analytics.summary(acc_no, balance)
+"""
+import heapq
+import itertools
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INT64_MAX = 2 ** 63 - 1
+
+
+class _Codes:
+    """Assigns small integers to repeated values (months, types, account numbers)."""
+
+    __slots__ = ("names", "_codes")
+
+    def __init__(self):
+        self.names = []
+        self._codes = {}
+
+    def code(self, name):
+        if name is None:
+            return -1
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class AccountColumns:
+    """One account's records as parallel columns, oldest first."""
+
+    def __init__(self):
+        self.count = 0
+        self.timestamps = []
+        self.amounts = []
+        self.months = _Codes()
+        self.types = _Codes()
+        self.counterparties = _Codes()
+        self.month_codes = []
+        self.type_codes = []
+        self.counterparty_codes = []
+        self.max_abs_amount = 0  # infinite once a non-integer amount is seen
+        self._arrays = None
+
+    def extend(self, entries):
+        """Appends records (oldest first) in a single pass."""
+        month, kind, counterparty = self.months.code, self.types.code, self.counterparties.code
+        for entry in entries:
+            timestamp = entry.get("timestamp") or ""
+            self.timestamps.append(timestamp)
+            amount = entry.get("amount", 0)
+            self.amounts.append(amount)
+            if type(amount) is int:
+                self.max_abs_amount = max(self.max_abs_amount, abs(amount))
+            else:
+                self.max_abs_amount = float("inf")
+            self.month_codes.append(month(timestamp[:7] or None))
+            self.type_codes.append(kind(entry.get("type")))
+            self.counterparty_codes.append(counterparty(entry.get("target_acc_no")))
+            self.count += 1
+        self._arrays = None
+
+    def fits_int64(self, offset=0):
+        """True if no total of the amounts, nor a running balance ending at `offset`, can overflow int64."""
+        return 2 * self.max_abs_amount * self.count + abs(offset) <= INT64_MAX
+
+    def arrays(self):
+        """NumPy copies of the numeric columns, rebuilt after each extend()."""
+        if self._arrays is None:
+            self._arrays = {
+                name: np.array(getattr(self, name), dtype=np.int64)
+                for name in ("amounts", "month_codes", "type_codes", "counterparty_codes")
+            }
+        return self._arrays
+
+    def record(self, i):
+        return {
+            "timestamp": self.timestamps[i],
+            "type": self.types.names[self.type_codes[i]] if self.type_codes[i] >= 0 else None,
+            "amount": self.amounts[i],
+            "target_acc_no": (self.counterparties.names[self.counterparty_codes[i]]
+                              if self.counterparty_codes[i] >= 0 else None),
+        }
+
+
+def _group_totals(columns, codes_name, size):
+    """(money in, money out, record count) per code, each a list of length `size`."""
+    if np is not None and columns.fits_int64():
+        arrays = columns.arrays()
+        codes, amounts = arrays[codes_name], arrays["amounts"]
+        valid = codes >= 0
+        codes, amounts = codes[valid], amounts[valid]
+        money_in = np.zeros(size, dtype=np.int64)
+        money_out = np.zeros(size, dtype=np.int64)
+        # add.at keeps exact int64 sums (bincount weights would go through float64)
+        np.add.at(money_in, codes, np.maximum(amounts, 0))
+        np.add.at(money_out, codes, np.maximum(-amounts, 0))
+        return money_in.tolist(), money_out.tolist(), np.bincount(codes, minlength=size).tolist()
+
+    money_in, money_out, counts = [0] * size, [0] * size, [0] * size
+    for code, amount in zip(getattr(columns, codes_name), columns.amounts):
+        if code < 0:
+            continue
+        if amount > 0:
+            money_in[code] += amount
+        else:
+            money_out[code] -= amount
+        counts[code] += 1
+    return money_in, money_out, counts
+
+
+class StatementAnalytics:
+    """Per-account analytics over a journal, cached until new records arrive."""
+
+    def __init__(self, journal):
+        self.journal = journal
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def columns(self, acc_no):
+        """The account's columns, brought up to date with the journal."""
+        with self._lock:
+            columns = self._columns.get(acc_no)
+            count = self.journal.count_for(acc_no)
+            if columns is None or columns.count > count:
+                # New account, or the journal was replaced underneath us
+                columns = self._columns[acc_no] = AccountColumns()
+            if columns.count < count:
+                columns.extend(self.journal.iter_account_from(acc_no, columns.count))
+            return columns
+
+    def invalidate(self, acc_no=None):
+        with self._lock:
+            if acc_no is None:
+                self._columns.clear()
+            else:
+                self._columns.pop(acc_no, None)
+
+    def monthly_totals(self, acc_no):
+        """[{"month": "YYYY-MM", "in", "out", "net", "count"}], oldest month first."""
+        columns = self.columns(acc_no)
+        names = columns.months.names
+        money_in, money_out, counts = _group_totals(columns, "month_codes", len(names))
+        months = [
+            {"month": name, "in": money_in[i], "out": money_out[i], "net": money_in[i] - money_out[i],
+             "count": counts[i]}
+            for i, name in enumerate(names)
+        ]
+        months.sort(key=lambda month: month["month"])
+        return months
+
+    def running_balances(self, acc_no, balance):
+        """The balance after each record, oldest first, ending at `balance` (today's)."""
+        columns = self.columns(acc_no)
+        if np is not None and columns.fits_int64(balance):
+            amounts = columns.arrays()["amounts"]
+            opening = balance - int(amounts.sum())
+            return (np.cumsum(amounts) + opening).tolist()
+        opening = balance - sum(columns.amounts)
+        return list(itertools.accumulate(columns.amounts, initial=opening))[1:]
+
+    def largest_transfers(self, acc_no, n=5):
+        """The n records with the largest amounts either way, largest first."""
+        columns = self.columns(acc_no)
+        if np is not None and columns.fits_int64():
+            amounts = columns.arrays()["amounts"]
+            order = np.argsort(-np.abs(amounts), kind="stable")[:n].tolist()
+        else:
+            order = heapq.nlargest(n, range(columns.count), key=lambda i: abs(columns.amounts[i]))
+        return [columns.record(i) for i in order]
+
+    def counterparties(self, acc_no, n=None):
+        """[{"acc_no", "sent", "received", "count"}] by total volume, largest first."""
+        columns = self.columns(acc_no)
+        names = columns.counterparties.names
+        received, sent, counts = _group_totals(columns, "counterparty_codes", len(names))
+        parties = [
+            {"acc_no": name, "sent": sent[i], "received": received[i], "count": counts[i]}
+            for i, name in enumerate(names)
+        ]
+        parties.sort(key=lambda party: party["sent"] + party["received"], reverse=True)
+        return parties[:n]
+
+    def category_totals(self, acc_no):
+        """{type: {"in", "out", "count"}} for each record type, e.g. "Deposit"."""
+        columns = self.columns(acc_no)
+        names = columns.types.names
+        money_in, money_out, counts = _group_totals(columns, "type_codes", len(names))
+        return {name: {"in": money_in[i], "out": money_out[i], "count": counts[i]} for i, name in enumerate(names)}
+
+    def summary(self, acc_no, balance):
+        """Headline figures for the statements page and Arna."""
+        columns = self.columns(acc_no)
+        months = self.monthly_totals(acc_no)
+        balances = self.running_balances(acc_no, balance)
+        top = self.counterparties(acc_no, 1)
+        largest = self.largest_transfers(acc_no, 1)
+        return {
+            "count": columns.count,
+            "in": sum(month["in"] for month in months),
+            "out": sum(month["out"] for month in months),
+            "latest_month": months[-1] if months else None,
+            "lowest_balance": min(balances, default=balance),
+            "highest_balance": max(balances, default=balance),
+            "largest": largest[0] if largest else None,
+            "top_counterparty": top[0] if top else None,
+        }
@@ -0,0 +1,313 @@
+"""Command-line entry point: replay a file of banking operations headlessly.
+
+Each line of the input is one JSON operation, for example:
+
+    {"op": "signup", "username": "Ana", "password": "pw", "pin": "1234"}
+    {"op": "deposit", "username": "Ana", "amount": 500}
+    {"op": "withdraw", "username": "Ana", "amount": 100}
+    {"op": "send", "username": "Ana", "target_acc_no": "290305", "amount": 50}
+    {"op": "request", "username": "Ana", "source_acc_no": "290305", "amount": 75}
+    {"op": "approve", "username": "Lance", "request_id": "req_..."}
+    {"op": "deny", "username": "Lance", "request_id": "req_..."}
+    {"op": "batch", "username": "Lance", "transfers": [["280505", 10], ["000001", 20]], "atomic": true}
+
+If an operation carries a "pin", it is checked the same way the UI asks
+for it; without one the operation is treated as pre-authorized.
+
+    python bank_cli.py replay ops.jsonl [--storage sqlite] [--profile] [--metrics]
+
+The payroll command pays every row of a CSV file (target_acc_no,amount)
+from one account as a single batch:
+
+    python bank_cli.py payroll Lance payroll.csv [--partial]
+
+Balance snapshots (JSON storage) make startup and historical lookups fast:
+
+    python bank_cli.py snapshot                          # record one now
+    python bank_cli.py balance-at 280505 "2026-01-31 23:59:59"
+
+Statements are exported as CSV or JSON Lines, for one account or, in a
+single pass over the log, for every account:
+
+    python bank_cli.py export 280505 -o statement.csv --from 2025-11-01 --to 2025-11-30
+    python bank_cli.py export --all -o statements/ --format jsonl --from 2025-11-01 --to 2025-11-30
+"""
+import argparse
+import collections
+import cProfile
+import csv
+import json
+import os
+import pstats
+import sys
+import time
+
+import metrics
+import statement_export
+from bank_service import BankError, BankService
+from storage import open_storage
+
+
+def apply_operation(service, op):
+    """Runs one operation dict against the service; returns its result."""
+    kind = op["op"]
+    username = op.get("username")
+    authorize = None
+    if "pin" in op and kind != "signup":
+        authorize = lambda: service.check_pin(username, op["pin"])
+
+    if kind == "signup":
+        return service.signup(username, op["password"], op["pin"])
+    if kind == "login":
+        return service.login(username, op["password"])
+    if kind == "deposit":
+        return service.deposit(username, op["amount"], authorize=authorize)
+    if kind == "withdraw":
+        return service.withdraw(username, op["amount"], authorize=authorize)
+    if kind == "send":
+        return service.send(username, op["target_acc_no"], op["amount"], authorize=authorize)
+    if kind == "request":
+        return service.create_request(username, op["source_acc_no"], op["amount"])
+    if kind == "approve":
+        return service.approve_request(username, op["request_id"], authorize=authorize)
+    if kind == "deny":
+        return service.deny_request(username, op["request_id"])
+    if kind == "batch":
+        transfers = [(target, amount) for target, amount in op["transfers"]]
+        return service.batch_transfer(username, transfers, atomic=op.get("atomic", True), authorize=authorize)
+    raise ValueError(f"Unknown operation: {kind!r}")
+
+
+def replay(service, lines, show_errors=False):
+    """Applies every operation in lines; returns counters and elapsed seconds.
+
+    A line that is not a valid operation (bad JSON, missing fields, wrong
+    types) is counted as a failure like a rejected operation.
+    """
+    counts = collections.Counter()
+    start = time.perf_counter()
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        op = None
+        try:
+            op = json.loads(line)
+            if not isinstance(op, dict):
+                raise ValueError("an operation must be a JSON object")
+            apply_operation(service, op)
+            counts["ok"] += 1
+        except (BankError, KeyError, TypeError, ValueError) as e:
+            counts[type(e).__name__] += 1
+            if show_errors:
+                kind = op.get("op") if isinstance(op, dict) else None
+                print(f"line {line_no}: {kind}: {type(e).__name__}: {e}", file=sys.stderr)
+    return counts, time.perf_counter() - start
+
+
+def read_payroll(path):
+    """Reads (target_acc_no, amount) rows from a CSV file, skipping a header row.
+
+    Raises ValueError naming the line of the first row that has no
+    whole-number amount in its second column.
+    """
+    transfers = []
+    seen_row = False
+    with open(path, "r", newline="") as f:
+        reader = csv.reader(f)
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            cells = [cell.strip() for cell in row[:2]]
+            is_number = [cell.lstrip("-").isdigit() for cell in cells]
+            if len(cells) == 2 and is_number[1]:
+                transfers.append((cells[0], int(cells[1])))
+            elif seen_row or len(cells) < 2 or any(is_number):
+                raise ValueError(f"line {reader.line_num}: expected target_acc_no,amount, got {','.join(row)!r}")
+            seen_row = True
+    return transfers
+
+
+def add_storage_arguments(parser):
+    parser.add_argument("--storage", default="json", choices=("json", "sqlite"))
+    parser.add_argument("--users", default="users.json")
+    parser.add_argument("--log", default="transactions.log")
+    parser.add_argument("--requests", default="pending_requests.json")
+    parser.add_argument("--db", default="apex_bank.db")
+    parser.add_argument("--commit-window", type=float, default=None, metavar="SECONDS",
+                        help="group-commit concurrent writers, gathering commits for this long into one fsync "
+                             "(JSON storage; default off)")
+
+
+def run_payroll(service, args):
+    try:
+        transfers = read_payroll(args.payroll_file)
+    except ValueError as e:
+        print(f"Rejected: {args.payroll_file} {e}", file=sys.stderr)
+        return
+    start = time.perf_counter()
+    try:
+        results = service.batch_transfer(args.username, transfers, atomic=not args.partial)
+        paid = [r for r in results if r["ok"]]
+    except BankError as e:
+        print(f"Rejected: {e}")
+        results = getattr(e, "results", [])
+        paid = []
+    elapsed = time.perf_counter() - start
+
+    for r in results:
+        if not r["ok"]:
+            print(f"  {r['target_acc_no']}: {r['amount']}: {r['error']}")
+    total = sum(r["amount"] for r in paid)
+    print(f"Paid {len(paid)} accounts, {total:,} in total, in {elapsed * 1e3:.1f} ms")
+
+
+def run_export(storage, args):
+    fmt = args.format
+    if fmt is None:
+        extension = os.path.splitext(args.output)[1].lstrip(".").lower()
+        fmt = extension if extension in statement_export.FORMATS else "csv"
+    start = time.perf_counter()
+    if args.all:
+        counts = statement_export.export_all(storage.journal, args.output, fmt, args.start, args.end)
+        records, files = sum(counts.values()), len(counts)
+    else:
+        records = statement_export.export_account(storage.journal, args.acc_no, args.output, fmt, args.start, args.end)
+        files = 1
+    elapsed = time.perf_counter() - start
+    print(f"Exported {records:,} records to {files:,} {fmt} file(s) in {elapsed:.2f}s")
+
+
+def list_segments(storage):
+    segments = getattr(storage.journal, "segments", None)
+    if segments is None:
+        print("This storage has no log segments")
+        return
+    segments.refresh()
+    raw = stored = 0
+    for segment in segments.segments:
+        raw += segment.end - segment.start
+        stored += segment.stored_bytes
+        print(f"{segment.name}  {segment.first} to {segment.last}  {segment.count:>10,} records  "
+              f"{segment.end - segment.start:>14,} -> {segment.stored_bytes:>12,} bytes")
+    if segments.segments:
+        print(f"{len(segments.segments)} segments: {raw:,} bytes of log stored in {stored:,} ({stored / raw:.1%})")
+    else:
+        print("No sealed segments")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apex Digital Bank headless tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = subparsers.add_parser("replay", help="replay a JSONL file of operations")
+    replay_parser.add_argument("ops_file", help="JSONL operations file, or - for stdin")
+    add_storage_arguments(replay_parser)
+    replay_parser.add_argument("--errors", action="store_true", help="print every rejected operation")
+    replay_parser.add_argument("--profile", action="store_true", help="run under cProfile and print hot spots")
+    replay_parser.add_argument("--metrics", action="store_true", help="print latency histograms and counters")
+
+    payroll_parser = subparsers.add_parser("payroll", help="pay a CSV of target_acc_no,amount in one batch")
+    payroll_parser.add_argument("username", help="account paying the batch")
+    payroll_parser.add_argument("payroll_file")
+    payroll_parser.add_argument("--partial", action="store_true", help="skip invalid rows instead of rejecting the batch")
+    add_storage_arguments(payroll_parser)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="record a balance snapshot at the end of the log")
+    add_storage_arguments(snapshot_parser)
+
+    rotate_parser = subparsers.add_parser("rotate", help="seal the active log into a compressed segment now")
+    add_storage_arguments(rotate_parser)
+
+    segments_parser = subparsers.add_parser("segments", help="list the sealed log segments")
+    add_storage_arguments(segments_parser)
+
+    balance_at_parser = subparsers.add_parser("balance-at", help="an account's balance at a past time")
+    balance_at_parser.add_argument("acc_no")
+    balance_at_parser.add_argument("timestamp", help='"YYYY-mm-dd HH:MM:SS"')
+    add_storage_arguments(balance_at_parser)
+
+    export_parser = subparsers.add_parser("export", help="export statements as CSV or JSON Lines")
+    export_parser.add_argument("acc_no", nargs="?", help="account to export (omit with --all)")
+    export_parser.add_argument("--all", action="store_true", help="one file per account, in one pass over the log")
+    export_parser.add_argument("-o", "--output", required=True, help="output file, or directory with --all")
+    export_parser.add_argument("--format", choices=statement_export.FORMATS, default=None,
+                               help="defaults to the output file's extension, else csv")
+    export_parser.add_argument("--from", dest="start", help="first date (YYYY-mm-dd), inclusive")
+    export_parser.add_argument("--to", dest="end", help="last date (YYYY-mm-dd), inclusive")
+    add_storage_arguments(export_parser)
+    args = parser.parse_args(argv)
+    if args.command == "export" and args.all == bool(args.acc_no):
+        parser.error("export needs either an account number or --all")
+
+    if getattr(args, "metrics", False):
+        metrics.enable()
+    storage = open_storage(args.storage, args.users, args.log, args.requests, args.db,
+                           commit_window=args.commit_window)
+    service = BankService(storage)
+    if args.command == "payroll":
+        run_payroll(service, args)
+        storage.close()
+        return
+    if args.command == "snapshot":
+        start = time.perf_counter()
+        snapshot = storage.snapshot()
+        elapsed = time.perf_counter() - start
+        storage.close()
+        if snapshot is None:
+            print(f"{args.storage} storage does not use snapshots")
+        else:
+            print(f"Snapshot of {len(snapshot.balances)} accounts at byte {snapshot.position:,} "
+                  f"({snapshot.last_timestamp or 'empty log'}) in {elapsed * 1e3:.1f} ms")
+        return
+    if args.command == "rotate":
+        start = time.perf_counter()
+        segment = storage.rotate_log()
+        elapsed = time.perf_counter() - start
+        storage.close()
+        if segment is None:
+            print("Nothing to seal" if args.storage == "json" else f"{args.storage} storage has no log segments")
+        else:
+            print(f"Sealed {segment.count:,} records ({segment.first} to {segment.last}) into {segment.name}: "
+                  f"{segment.end - segment.start:,} -> {segment.stored_bytes:,} bytes in {elapsed:.2f}s")
+        return
+    if args.command == "segments":
+        list_segments(storage)
+        storage.close()
+        return
+    if args.command == "export":
+        run_export(storage, args)
+        storage.close()
+        return
+    if args.command == "balance-at":
+        balance = storage.balance_at(args.acc_no, args.timestamp)
+        storage.close()
+        if balance is None:
+            sys.exit(f"Account {args.acc_no} did not exist at {args.timestamp}")
+        print(f"{args.acc_no}: {balance:,} at {args.timestamp}")
+        return
+
+    lines = sys.stdin if args.ops_file == "-" else open(args.ops_file, "r")
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        counts, elapsed = replay(service, lines, show_errors=args.errors)
+    finally:
+        if profiler:
+            profiler.disable()
+        storage.close()
+
+    total = sum(counts.values())
+    rate = total / elapsed if elapsed else float("inf")
+    print(f"{total} operations in {elapsed:.3f}s ({rate:,.0f} ops/s)")
+    for name, count in counts.most_common():
+        print(f"  {name}: {count}")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    if args.metrics:
+        metrics.dump(sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Asyncio transaction server: the banking operations over line-delimited JSON on TCP.
+
+Every request is one JSON object on its own line, and every reply is one
+line carrying the same "id":
+
+    {"id": 1, "op": "send", "username": "Ana", "target_acc_no": "290305", "amount": 50, "pin": "1234"}
+    {"id": 1, "ok": true, "result": "Lance"}
+    {"id": 2, "ok": false, "error": "InsufficientFunds", "message": "Amount exceeds your balance."}
+
+Write operations are the ones bank_cli.py replays (signup, deposit,
+withdraw, send, request, approve, deny, batch). They go through a single
+writer thread, which applies whatever has queued up while the previous
+batch was being written and commits it as one group, so under load many
+operations share one fsync. A reply is only sent once its batch is
+durable.
+
+Read operations never wait for the writer:
+
+    {"op": "balance", "username": "Ana"}
+    {"op": "statement", "username": "Ana", "limit": 50}
+    {"op": "pending", "username": "Ana"}
+    {"op": "login", "username": "Ana", "password": "pw"}
+    {"op": "metrics"}      (Prometheus text; needs --metrics or --metrics-file)
+
+    python bank_server.py [--port 8765] [--storage sqlite] [--max-batch 256]
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from bank_cli import add_storage_arguments, apply_operation
+from bank_service import BankError, BankService
+from storage import open_storage
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+READ_OPS = ("balance", "statement", "pending", "login", "metrics")
+MAX_LINE_BYTES = 1 << 20
+
+
+def raise_open_file_limit():
+    """Lifts the soft open-files limit to the hard limit so thousands of sockets fit."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def _ok_reply(op, result):
+    return {"id": op.get("id"), "ok": True, "result": result}
+
+
+def _error_reply(op, error):
+    if isinstance(error, KeyError):
+        message = f"Unknown or missing {error}"
+    else:
+        message = str(error)
+    return {"id": op.get("id"), "ok": False, "error": type(error).__name__, "message": message}
+
+
+class BankServer:
+    """Serves one BankService to many TCP clients."""
+
+    def __init__(self, service, max_batch=256, read_threads=4):
+        self.service = service
+        self.max_batch = max_batch
+        self.stats = collections.Counter()
+        self._queue = None
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bank-writer")
+        self._readers = ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix="bank-reader")
+
+    async def start(self, host, port):
+        self._queue = asyncio.Queue()
+        asyncio.create_task(self._write_loop())
+        return await asyncio.start_server(self._handle_client, host, port, limit=MAX_LINE_BYTES)
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+    # Connections
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self._handle_line(line)
+                writer.write((json.dumps(reply) + "\n").encode("utf-8"))
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass  # client went away or sent an oversized line
+        finally:
+            writer.close()
+
+    async def _handle_line(self, line):
+        try:
+            op = json.loads(line)
+            if not isinstance(op, dict):
+                raise ValueError("Each request must be a JSON object")
+        except ValueError as e:
+            return {"id": None, "ok": False, "error": "BadRequest", "message": str(e)}
+
+        kind = op.get("op")
+        if kind in READ_OPS:
+            self.stats["reads"] += 1
+            if kind == "balance":
+                return self._run_read(op)
+            return await asyncio.get_running_loop().run_in_executor(self._readers, self._run_read, op)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, future))
+        return await future
+
+    # Reads
+
+    def _run_read(self, op):
+        try:
+            return _ok_reply(op, self._read(op))
+        except (BankError, KeyError, ValueError, TypeError) as e:
+            return _error_reply(op, e)
+
+    def _read(self, op):
+        kind = op["op"]
+        if kind == "metrics":
+            return metrics.render()
+        username = op["username"]
+        if kind == "login":
+            return self.service.login(username, op["password"])
+        acc_no = self.service.account_no(username)
+        if kind == "balance":
+            return {"account_no": acc_no, "balance": self.service.balance(username)}
+        if kind == "statement":
+            entries = self.service.storage.journal.iter_account(acc_no)
+            return list(itertools.islice(entries, int(op.get("limit", 50))))
+        return self.service.pending_requests(username)
+
+    # Writes
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            ops = [op for op, _ in batch]
+            try:
+                replies = await loop.run_in_executor(self._writer, self._apply_batch, ops)
+            except Exception as e:
+                # The group could not be written, so none of it is durable
+                replies = [_error_reply(op, e) for op in ops]
+            for (_, future), reply in zip(batch, replies):
+                if not future.done():
+                    future.set_result(reply)
+
+    def _apply_batch(self, ops):
+        replies = []
+        with metrics.timer("server_group_commit"), self.service.storage.group_commit():
+            for op in ops:
+                try:
+                    replies.append(_ok_reply(op, apply_operation(self.service, op)))
+                except (BankError, KeyError, ValueError, TypeError) as e:
+                    replies.append(_error_reply(op, e))
+        self.stats["batches"] += 1
+        self.stats["writes"] += len(ops)
+        metrics.count("server_writes", len(ops))
+        return replies
+
+
+async def serve(server, host, port):
+    tcp_server = await server.start(host, port)
+    print(f"Apex bank server listening on {host}:{port}")
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apex Digital Bank transaction server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=256, help="most write operations per group commit")
+    parser.add_argument("--metrics", action="store_true", help="collect metrics for the metrics op")
+    parser.add_argument("--metrics-file", help="also rewrite this Prometheus textfile every --metrics-interval s")
+    parser.add_argument("--metrics-interval", type=float, default=15.0)
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.metrics_file:
+        metrics.start_exporter(args.metrics_file, args.metrics_interval)
+    elif args.metrics:
+        metrics.enable()
+    raise_open_file_limit()
+    storage = open_storage(args.storage, args.users, args.log, args.requests, args.db,
+                           commit_window=args.commit_window)
+    server = BankServer(BankService(storage), max_batch=args.max_batch)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        storage.close()
+        stats = server.stats
+        if stats["batches"]:
+            print(f"{stats['writes']} writes in {stats['batches']} group commits "
+                  f"({stats['writes'] / stats['batches']:.1f} per commit), {stats['reads']} reads")
+
+
+if __name__ == "__main__":
+    main()
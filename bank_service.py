@@ -0,0 +1,454 @@
+"""Headless banking core: accounts, transfers and money requests.
+
+BankService holds the business rules that used to live inside BankApp.
+It never touches Tk; failures are raised as BankError subclasses whose
+message is ready to show to the user. Operations that need the user's
+PIN take an optional `authorize` callable, which is invoked at the point
+where the UI used to ask for the PIN and must return True to continue.
+
+Several services (threads or processes) may share one storage backend.
+Every operation takes the per-account locks of the accounts it touches,
+re-reads their balances and only then validates, so two concurrent
+transfers can never both spend the same money. The PIN is asked before
+the locks are taken, so a slow user never blocks anyone else.
+"""
+import contextlib
+import datetime
+import random
+
+import metrics
+from registry import AccountRegistry
+
+
+class BankError(Exception):
+    """Base class for rejected banking operations."""
+    title = "Error"
+
+
+class InvalidAmount(BankError):
+    pass
+
+
+class AccountNotFound(BankError):
+    pass
+
+
+class SelfTransferError(BankError):
+    pass
+
+
+class UsernameTaken(BankError):
+    pass
+
+
+class InvalidPinFormat(BankError):
+    pass
+
+
+class InvalidCredentials(BankError):
+    pass
+
+
+class RequestNotFound(BankError):
+    pass
+
+
+class InsufficientFunds(BankError):
+    title = "Failed"
+
+
+class MinimumBalanceError(BankError):
+    title = "Failed"
+
+
+class BatchRejected(BankError):
+    """An all-or-nothing batch had invalid items; nothing was applied.
+
+    `results` holds the per-item report (see BankService.batch_transfer).
+    """
+
+    def __init__(self, message, results):
+        super().__init__(message)
+        self.results = results
+
+
+class AuthorizationDeclined(BankError):
+    """The authorize callback returned False (wrong PIN or cancelled)."""
+    title = "Failed"
+
+
+def make_log_entry(acc_no, type, amount, status, target_acc_no=None):
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return {
+        "timestamp": timestamp,
+        "account_no": acc_no,
+        "type": type,
+        "amount": amount,
+        "status": status,
+        "target_acc_no": target_acc_no
+    }
+
+
+def generate_request_id(requests_data):
+    """Generates a unique ID for a new request."""
+    # requests_data is anything supporting `in` on request ids (dict or RequestStore)
+    while True:
+        req_id = f"req_{int(datetime.datetime.now().timestamp())}{random.randint(100,999)}"
+        if req_id not in requests_data:
+            return req_id
+
+
+def is_valid_amount(amount):
+    """Amounts are whole units: a positive int (floats, bools and numeric strings are not)."""
+    return type(amount) is int and amount > 0
+
+
+def check_amount(amount, message="Amount must be a positive whole amount."):
+    if not is_valid_amount(amount):
+        raise InvalidAmount(message)
+
+
+def format_currency(amount, currency="USD"):
+    return f"{currency} {amount:,.2f}"
+
+
+class BankService:
+    """Deposit, withdraw, send, request and approve logic over a storage backend."""
+
+    def __init__(self, storage, minimum_balance=1000, starting_balance=500000, currency="USD"):
+        self.storage = storage
+        self.minimum_balance = minimum_balance
+        self.starting_balance = starting_balance
+        self.currency = currency
+        self.registry = AccountRegistry()
+        self._indexed_data = None
+        self.reload()
+
+    @property
+    def data(self):
+        return self.storage.users
+
+    def reload(self):
+        """Picks up user changes made elsewhere and keeps the account index in step.
+
+        Only the records that changed in storage are re-read and re-indexed.
+        """
+        changed = self.storage.refresh_users()
+        if self._indexed_data is not self.storage.users:
+            self._indexed_data = self.storage.users
+            self.registry.rebuild(self.storage.users)
+            return
+        for username in changed:
+            if username in self.data:
+                self.registry.add(username, self.data[username])
+
+    @contextlib.contextmanager
+    def _locked(self, usernames, keys=()):
+        """Holds the accounts' locks and re-reads their records before yielding."""
+        with self.storage.locked(usernames, keys):
+            self.reload()
+            yield
+
+    def _lookup(self, acc_no):
+        username = self.registry.lookup(acc_no)
+        if username is None:
+            # The account may have been opened by another process since our last reload
+            self.reload()
+            username = self.registry.lookup(acc_no)
+        return username
+
+    def _with_balance_change(self, username, change):
+        """A copy of the user's record with `change` added to the balance."""
+        user_data = self.data[username]
+        return dict(user_data, balance=user_data.get("balance", 0) + change)
+
+    def _format(self, amount):
+        return format_currency(amount, self.currency)
+
+    @staticmethod
+    def _authorize(authorize):
+        if authorize is not None and not authorize():
+            raise AuthorizationDeclined("Transaction was not authorized.")
+
+    # Accounts
+
+    @metrics.timed("bank_login")
+    def login(self, username, password):
+        """Returns the user's account number, or raises InvalidCredentials."""
+        self.reload()
+        if username in self.data and self.data[username].get("password") == password:
+            return self.data[username].get("account_no")
+        raise InvalidCredentials("Invalid username or password")
+
+    @metrics.timed("bank_signup")
+    def signup(self, username, password, pin):
+        """Creates an account and returns its new account number."""
+        # "signup" serialises account creation so two processes never pick the same number
+        with self._locked([username], keys=["signup"]):
+            if username in self.data:
+                raise UsernameTaken("Username already exists!")
+            if not pin.isdigit() or len(pin) != 4:
+                raise InvalidPinFormat("PIN must be exactly 4 digits")
+
+            acc_no = self.registry.generate_account_number()
+            user_data = {
+                "password": password, "pin": pin,
+                "balance": self.starting_balance, "account_no": acc_no
+            }
+            # Logged like any other credit, so the journal alone accounts for every balance
+            self.storage.commit(
+                log_entries=[make_log_entry(acc_no, "Account Opened", self.starting_balance, "Success")],
+                updates={username: user_data},
+            )
+            self.registry.add(username, user_data)
+        return acc_no
+
+    def check_pin(self, username, pin):
+        return self.data[username].get("pin") == pin
+
+    def balance(self, username):
+        return self.data[username].get("balance", 0)
+
+    def account_no(self, username):
+        return self.data[username].get("account_no")
+
+    def balance_at(self, username, timestamp):
+        """The user's balance as of `timestamp` ("YYYY-mm-dd HH:MM:SS"), or None."""
+        return self.storage.balance_at(self.account_no(username), timestamp)
+
+    def find_account(self, acc_no):
+        """Returns the username owning acc_no, or None."""
+        return self._lookup(acc_no)
+
+    # Transactions
+
+    @metrics.timed("bank_deposit")
+    def deposit(self, username, amount, authorize=None):
+        check_amount(amount, "Deposit must be a whole amount greater than zero")
+        self._authorize(authorize)
+
+        with self._locked([username]):
+            self.storage.commit(
+                log_entries=[make_log_entry(self.account_no(username), "Deposit", amount, "Success")],
+                updates={username: self._with_balance_change(username, amount)},
+            )
+            return self.balance(username)
+
+    @metrics.timed("bank_withdraw")
+    def withdraw(self, username, amount, authorize=None):
+        check_amount(amount, "Withdrawal must be a positive whole amount.")
+        self._authorize(authorize)
+
+        with self._locked([username]):
+            current_balance = self.balance(username)
+            if amount > current_balance:
+                raise InsufficientFunds("Amount exceeds balance.")
+            if current_balance - amount < self.minimum_balance:
+                raise MinimumBalanceError(f"Minimum balance {self._format(self.minimum_balance)} required.")
+
+            self.storage.commit(
+                log_entries=[make_log_entry(self.account_no(username), "Withdrawal", amount * -1, "Success")],
+                updates={username: self._with_balance_change(username, -amount)},
+            )
+            return self.balance(username)
+
+    @metrics.timed("bank_send")
+    def send(self, username, target_acc_no, amount, authorize=None):
+        """Pushes money to another account; returns the recipient's username."""
+        target_user = self._lookup(target_acc_no)
+        acc_no = self.account_no(username)
+
+        check_amount(amount)
+        if not target_user:
+            raise AccountNotFound("Recipient Account not found.")
+        if target_user == username:
+            raise SelfTransferError("Cannot send to self.")
+        self._authorize(authorize)
+
+        with self._locked([username, target_user]):
+            current_balance = self.balance(username)
+            if amount > current_balance:
+                raise InsufficientFunds("Amount exceeds your balance.")
+            if current_balance - amount < self.minimum_balance:
+                raise MinimumBalanceError(f"Maintain minimum balance of {self._format(self.minimum_balance)}.")
+
+            self.storage.commit(
+                log_entries=[
+                    make_log_entry(acc_no, "Send", amount * -1, "Success", target_acc_no),
+                    make_log_entry(target_acc_no, "Receive (Send)", amount, "Success", acc_no),
+                ],
+                updates={
+                    username: self._with_balance_change(username, -amount),
+                    target_user: self._with_balance_change(target_user, amount),
+                },
+            )
+        return target_user
+
+    @metrics.timed("bank_batch_transfer")
+    def batch_transfer(self, username, transfers, atomic=True, authorize=None):
+        """Pays many accounts from `username` with a single storage commit.
+
+        `transfers` is a list of (target_acc_no, amount). Every item is
+        validated up front against the account index and the minimum
+        balance, in order. With atomic=True any invalid item raises
+        BatchRejected and nothing is applied; with atomic=False the valid
+        items are applied and the invalid ones skipped.
+
+        Returns one dict per item: target_acc_no, amount, ok and, for
+        rejected items, the error message.
+        """
+        self.reload()
+        results, accepted, _ = self._plan_batch(username, transfers)
+        if not self._batch_should_apply(results, accepted, atomic):
+            return results
+        self._authorize(authorize)
+
+        # Lock every known recipient, not just the accepted ones: fresh balances may accept more
+        recipients = {self.registry.lookup(target_acc_no) for target_acc_no, _ in transfers} - {None}
+        with self._locked([username, *recipients]):
+            # Validated again under the locks, since balances may have moved during the PIN prompt
+            results, accepted, remaining = self._plan_batch(username, transfers, recipients)
+            if not self._batch_should_apply(results, accepted, atomic):
+                return results
+
+            acc_no = self.account_no(username)
+            updates = {username: dict(self.data[username], balance=remaining)}
+            log_entries = []
+            for target_user, target_acc_no, amount in accepted:
+                record = updates.get(target_user) or dict(self.data[target_user])
+                record["balance"] = record.get("balance", 0) + amount
+                updates[target_user] = record
+                log_entries.append(make_log_entry(acc_no, "Send (Batch)", amount * -1, "Success", target_acc_no))
+                log_entries.append(make_log_entry(target_acc_no, "Receive (Batch)", amount, "Success", acc_no))
+            self.storage.commit(log_entries=log_entries, updates=updates)
+        return results
+
+    def _plan_batch(self, username, transfers, recipients=None):
+        """Validates a batch in order; returns (results, accepted items, remaining balance).
+
+        If `recipients` is given, accounts outside it count as not found.
+        """
+        remaining = self.balance(username)
+        results = []
+        accepted = []
+        for target_acc_no, amount in transfers:
+            result = {"target_acc_no": target_acc_no, "amount": amount, "ok": False}
+            target_user = self.registry.lookup(target_acc_no)
+            if recipients is not None and target_user not in recipients:
+                target_user = None
+            if not is_valid_amount(amount):
+                result["error"] = "Amount must be a positive whole amount."
+            elif not target_user:
+                result["error"] = "Recipient Account not found."
+            elif target_user == username:
+                result["error"] = "Cannot send to self."
+            elif remaining - amount < self.minimum_balance:
+                result["error"] = f"Maintain minimum balance of {self._format(self.minimum_balance)}."
+            else:
+                result["ok"] = True
+                remaining -= amount
+                accepted.append((target_user, target_acc_no, amount))
+            results.append(result)
+        return results, accepted, remaining
+
+    @staticmethod
+    def _batch_should_apply(results, accepted, atomic):
+        rejected = len(results) - len(accepted)
+        if atomic and rejected:
+            raise BatchRejected(f"{rejected} of {len(results)} transfers are invalid; nothing was sent.", results)
+        return bool(accepted)
+
+    # Money requests
+
+    @metrics.timed("bank_create_request")
+    def create_request(self, username, source_acc_no, amount):
+        """Creates a pending request. Does NOT transfer money or ask for PIN."""
+        source_user = self._lookup(source_acc_no)
+
+        if not source_user:
+            raise AccountNotFound("Source Account not found.")
+        check_amount(amount)
+        if source_user == username:
+            raise SelfTransferError("Cannot request from self.")
+
+        requests = self.storage.requests
+        requests.refresh()
+        new_request = {
+            "request_id": generate_request_id(requests),
+            "requester_acc_no": self.account_no(username),
+            "requester_username": username,
+            "source_acc_no": source_acc_no,
+            "source_username": source_user,
+            "amount": amount,
+            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "pending"
+        }
+        requests.add(new_request)
+        return new_request
+
+    def pending_requests(self, username):
+        self.storage.requests.refresh()
+        return self.storage.requests.pending_for(self.account_no(username))
+
+    def pending_count(self, username):
+        self.storage.requests.refresh()
+        return self.storage.requests.count_pending(self.account_no(username))
+
+    def _open_request(self, username, req_id, missing_message):
+        self.storage.requests.refresh()
+        request = self.storage.requests.get(req_id)
+        if not request or request.get("status") != "pending" or request.get("source_acc_no") != self.account_no(username):
+            raise RequestNotFound(missing_message)
+        return request
+
+    @metrics.timed("bank_approve_request")
+    def approve_request(self, username, req_id, authorize=None):
+        """Pays a pending request made to `username`; returns the request."""
+        request = self._open_request(
+            username, req_id, "Could not find the selected request. It may be outdated."
+        )
+        amount = request.get("amount", 0)
+        self._check_approval_funds(username, amount)
+        self._authorize(authorize)
+
+        requester_acc_no = request.get("requester_acc_no")
+        requester_user = self._lookup(requester_acc_no)
+        if not requester_user:
+            raise AccountNotFound("Could not find the requester's account. Cancelling transaction.")
+
+        with self._locked([username, requester_user], keys=[f"request:{req_id}"]):
+            # Another session may have answered the request, or spent the money, meanwhile
+            request = self._open_request(
+                username, req_id, "Could not find the selected request. It may be outdated."
+            )
+            self._check_approval_funds(username, amount)
+
+            acc_no = self.account_no(username)
+            self.storage.commit(
+                log_entries=[
+                    make_log_entry(acc_no, "Send (Request)", amount * -1, "Success", requester_acc_no),
+                    make_log_entry(requester_acc_no, "Receive (Request)", amount, "Success", acc_no),
+                ],
+                updates={
+                    username: self._with_balance_change(username, -amount),
+                    requester_user: self._with_balance_change(requester_user, amount),
+                },
+            )
+            self.storage.requests.set_status(req_id, "approved")
+        return dict(request, status="approved")
+
+    def _check_approval_funds(self, username, amount):
+        current_balance = self.balance(username)
+        if amount > current_balance:
+            raise InsufficientFunds("You do not have sufficient funds to approve this request.")
+        if current_balance - amount < self.minimum_balance:
+            raise MinimumBalanceError(
+                f"This transaction would bring you below the minimum balance of {self._format(self.minimum_balance)}."
+            )
+
+    @metrics.timed("bank_deny_request")
+    def deny_request(self, username, req_id):
+        with self._locked([], keys=[f"request:{req_id}"]):
+            request = self._open_request(username, req_id, "Could not find the selected request.")
+            self.storage.requests.set_status(req_id, "denied")
+        return dict(request, status="denied")
@@ -0,0 +1,81 @@
+"""Benchmark: memory and speed of AccountTable vs. the old dict of dicts.
+
+Loads the same synthetic users.json both ways and reports the heap each
+layout keeps afterwards (tracemalloc), and how long loading, indexing
+and reading balances take.
+
+    python benchmarks/bench_account_memory.py
+    python benchmarks/bench_account_memory.py --accounts 100000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from accounts import AccountTable
+from registry import AccountRegistry
+
+
+def make_users_json(count):
+    """users.json text with `count` accounts."""
+    rng = random.Random(0)
+    return json.dumps({
+        f"user{i}": {
+            "password": f"pw{rng.getrandbits(40):x}",
+            "pin": f"{rng.randrange(10000):04d}",
+            "balance": rng.randrange(1000, 10 ** 9),
+            "account_no": f"{i:06d}",
+        }
+        for i in range(count)
+    })
+
+
+def measure(build):
+    """Heap retained by build()'s result; the JSON parse in between is freed."""
+    gc.collect()
+    tracemalloc.start()
+    users = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return users, size
+
+
+def run(name, build, count, names):
+    build()  # warm-up
+    start = time.perf_counter()
+    build()
+    build_s = time.perf_counter() - start
+    users, size = measure(build)
+    start = time.perf_counter()
+    AccountRegistry(users)
+    index_s = time.perf_counter() - start
+    start = time.perf_counter()
+    total = sum(users[username]["balance"] for username in names)
+    read_us = (time.perf_counter() - start) / len(names) * 1e6
+    print(f"{name:<14} {size / 2 ** 20:9,.1f} MiB {size / count:8,.0f} B/acct "
+          f"load {build_s:6.2f}s  index {index_s:5.2f}s  balance read {read_us:5.2f} us")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AccountTable memory benchmark")
+    parser.add_argument("--accounts", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    text = make_users_json(args.accounts)
+    names = random.Random(1).sample([f"user{i}" for i in range(args.accounts)], min(args.accounts, 100_000))
+    print(f"{args.accounts:,} accounts, {len(text) / 2 ** 20:,.0f} MiB of JSON")
+    dicts = run("dict of dicts", lambda: json.loads(text), args.accounts, names)
+    table = run("AccountTable", lambda: AccountTable(json.loads(text)), args.accounts, names)
+    assert dicts == table
+
+
+if __name__ == "__main__":
+    main()
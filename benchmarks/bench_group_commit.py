@@ -0,0 +1,89 @@
+"""Benchmark: per-operation commits vs. the group-commit pipeline.
+
+Many threads send money between distinct pairs of accounts through one
+JSON backend. Without a commit window every transfer pays its own WAL
+fsync; with one, transfers that arrive within the window share a write.
+
+    python benchmarks/bench_group_commit.py
+    python benchmarks/bench_group_commit.py --threads 64 --windows off 0 0.001 0.005
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_service import BankService
+from storage import open_storage
+
+
+def run(window, threads, transfers):
+    directory = tempfile.mkdtemp(prefix="apex_group_commit_")
+    try:
+        storage = open_storage(
+            "json",
+            os.path.join(directory, "users.json"),
+            os.path.join(directory, "transactions.log"),
+            os.path.join(directory, "pending_requests.json"),
+            os.path.join(directory, "apex_bank.db"),
+            commit_window=window,
+        )
+        service = BankService(storage)
+        for i in range(threads * 2):
+            service.signup(f"user{i}", "pw", "0000")
+
+        latencies = [[] for _ in range(threads)]
+
+        def worker(n):
+            sender, receiver = f"user{2 * n}", f"user{2 * n + 1}"
+            target = service.account_no(receiver)
+            for _ in range(transfers):
+                start = time.perf_counter()
+                service.send(sender, target, 1)
+                latencies[n].append(time.perf_counter() - start)
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        pipeline = storage.pipeline
+        per_batch = pipeline.commits / pipeline.batches if pipeline and pipeline.batches else 1.0
+        storage.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    all_latencies = sorted(value for values in latencies for value in values)
+    return {
+        "transfers_per_s": len(all_latencies) / elapsed,
+        "p50_ms": all_latencies[len(all_latencies) // 2] * 1e3,
+        "p99_ms": all_latencies[int(len(all_latencies) * 0.99)] * 1e3,
+        "commits_per_write": per_batch,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group-commit benchmark")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--transfers", type=int, default=100, help="transfers per thread")
+    parser.add_argument("--windows", nargs="+", default=["off", "0", "0.002", "0.005"],
+                        help="commit windows in seconds; 'off' disables the pipeline")
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads x {args.transfers} transfers")
+    print(f"{'window':>8} {'transfers/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'commits/write':>14}")
+    for window in args.windows:
+        result = run(None if window == "off" else float(window), args.threads, args.transfers)
+        print(f"{window:>8} {result['transfers_per_s']:12,.0f} {result['p50_ms']:8.2f} "
+              f"{result['p99_ms']:8.2f} {result['commits_per_write']:14.1f}")
+
+
+if __name__ == "__main__":
+    main()
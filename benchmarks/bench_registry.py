@@ -0,0 +1,66 @@
+"""Benchmark: account-number lookup cost vs. number of accounts.
+
+Compares AccountRegistry.lookup with the old linear scan over the user map.
+Run from the repository root:
+
+    python benchmarks/bench_registry.py                 # 10 up to 1M accounts
+    python benchmarks/bench_registry.py --sizes 1000,100000 --lookups 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry import AccountRegistry
+
+SIZES = "10,100,1000,10000,100000,1000000"
+LOOKUPS = 10000
+SCAN_LIMIT = 10000  # the linear scan gets too slow to measure beyond this
+
+
+def make_users(count):
+    return {
+        f"user{i}": {"password": "pw", "pin": "0000", "balance": 500000, "account_no": str(i).zfill(7)}
+        for i in range(count)
+    }
+
+
+def linear_scan(data, acc_no):
+    return next((u for u, d in data.items() if d.get("account_no") == acc_no), None)
+
+
+def time_per_call(func, keys):
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return (time.perf_counter() - start) / len(keys) * 1e9
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Account-number lookup benchmark")
+    parser.add_argument("--sizes", default=SIZES, help="comma-separated account counts")
+    parser.add_argument("--lookups", type=int, default=LOOKUPS, help="lookups timed per size")
+    parser.add_argument("--scan-limit", type=int, default=SCAN_LIMIT,
+                        help="largest size the linear scan is timed at")
+    args = parser.parse_args(argv)
+
+    print(f"{'accounts':>10} {'registry ns/lookup':>20} {'scan ns/lookup':>16}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        data = make_users(size)
+        registry = AccountRegistry(data)
+        keys = [str(random.randrange(size)).zfill(7) for _ in range(args.lookups)]
+
+        indexed = time_per_call(registry.lookup, keys)
+        if size <= args.scan_limit:
+            scan_keys = keys[:max(10, args.lookups * 10 // size)]
+            scanned = f"{time_per_call(lambda k: linear_scan(data, k), scan_keys):16,.0f}"
+        else:
+            scanned = f"{'skipped':>16}"
+        print(f"{size:>10,} {indexed:20,.0f} {scanned}")
+
+
+if __name__ == "__main__":
+    main()
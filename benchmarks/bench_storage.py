@@ -0,0 +1,122 @@
+"""Benchmark: JSON files vs. SQLite storage backend.
+
+For each size N the benchmark builds N accounts and N log rows in both
+backends and times cold start, a transfer commit, the first statement
+page and the pending-request count.
+
+    python benchmarks/bench_storage.py                 # 10k, 100k, 1M
+    python benchmarks/bench_storage.py --sizes 10000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_backend import LOG_COLUMNS, SqliteBackend
+from storage import JsonBackend
+
+TRANSFERS = 200
+
+
+def make_rows(size):
+    users = {
+        f"user{i}": {"password": "pw", "pin": "0000", "balance": 500000, "account_no": str(i).zfill(7)}
+        for i in range(size)
+    }
+    logs = [
+        {"timestamp": "2025-11-15 14:51:23", "account_no": str(random.randrange(size)).zfill(7),
+         "type": "Deposit", "amount": 100, "status": "Success", "target_acc_no": None}
+        for _ in range(size)
+    ]
+    return users, logs
+
+
+def build_json(directory, users, logs):
+    with open(os.path.join(directory, "users.json"), "w") as f:
+        json.dump(users, f)
+    with open(os.path.join(directory, "transactions.log"), "w") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in logs)
+    with open(os.path.join(directory, "pending_requests.json"), "w") as f:
+        json.dump({}, f)
+    return lambda: JsonBackend(
+        os.path.join(directory, "users.json"),
+        os.path.join(directory, "transactions.log"),
+        os.path.join(directory, "pending_requests.json"),
+    )
+
+
+def build_sqlite(directory, users, logs):
+    db_path = os.path.join(directory, "apex_bank.db")
+    SqliteBackend(db_path).close()  # creates the schema
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+            [(name, u["password"], u["pin"], u["balance"], u["account_no"]) for name, u in users.items()],
+        )
+        conn.executemany(
+            f"INSERT INTO transactions ({', '.join(LOG_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            [tuple(entry[col] for col in LOG_COLUMNS) for entry in logs],
+        )
+    conn.close()
+    return lambda: SqliteBackend(db_path)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run(open_backend, size):
+    results = {}
+    backend = open_backend()
+    results["cold_start_s"], _ = timed(backend.load_users)
+    # First journal access builds/loads the per-account index for the JSON backend
+    results["first_statement_page_ms"] = timed(lambda: backend.journal.cursor("0000001").next_page(50))[0] * 1e3
+    results["statement_page_ms"] = timed(lambda: backend.journal.cursor("0000002").next_page(50))[0] * 1e3
+
+    names = list(backend.users)
+    start = time.perf_counter()
+    for _ in range(TRANSFERS):
+        sender, receiver = random.sample(names, 2)
+        backend.users[sender]["balance"] -= 1
+        backend.users[receiver]["balance"] += 1
+        backend.commit([sender, receiver], [
+            {"timestamp": "2025-11-16 00:00:00", "account_no": backend.users[sender]["account_no"], "type": "Send",
+             "amount": -1, "status": "Success", "target_acc_no": backend.users[receiver]["account_no"]},
+            {"timestamp": "2025-11-16 00:00:00", "account_no": backend.users[receiver]["account_no"],
+             "type": "Receive (Send)", "amount": 1, "status": "Success",
+             "target_acc_no": backend.users[sender]["account_no"]},
+        ])
+    results["transfer_ms"] = (time.perf_counter() - start) / TRANSFERS * 1e3
+    results["pending_count_us"] = timed(lambda: backend.requests.count_pending("0000001"))[0] * 1e6
+    backend.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    args = parser.parse_args(argv)
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        users, logs = make_rows(size)
+        for name, build in (("json", build_json), ("sqlite", build_sqlite)):
+            directory = tempfile.mkdtemp(prefix=f"bench_{name}_")
+            try:
+                results = run(build(directory, users, logs), size)
+            finally:
+                shutil.rmtree(directory)
+            print(f"{size:>9,} {name:<7} " + "  ".join(f"{k}={v:,.3f}" for k, v in results.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Benchmark suite: the app's hot paths on a synthetic ledger, with results saved as JSON.
+
+Generates a ledger of N accounts, M log records and K pending requests
+(see synthetic_ledger.py), opens it the way main.py does and times, without
+Tk:
+
+micro (one operation, many times)
+    login, dashboard, statement, send_money, approve_request,
+    generate_account_number
+macro (a whole path through the app)
+    first_open   opening a ledger for the first time (builds the log index
+                 and the balance snapshots)
+    startup      opening it again, as on every later app start
+    session      log in, dashboard, statements, send money, dashboard
+    app_import   importing main.py in a fresh interpreter: everything the
+                 app does before its window opens
+
+The screens are timed as the work their main.py handlers do before drawing:
+the dashboard reloads the ledger and counts pending requests, and the
+statements page reads the first page of history plus the summary figures.
+
+Everything is seeded, so two runs at the same sizes do the same work.
+--output saves the results; --compare reports the change against an
+earlier results file and flags slowdowns beyond --threshold.
+
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --accounts 100000 --entries 1000000 --storage sqlite
+    python benchmarks/bench_suite.py --compare results.json --fail-on-regression
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import StatementAnalytics
+from bank_service import BankService
+from storage import open_storage
+import synthetic_ledger
+
+HISTORY_PAGE_SIZE = 50  # as in main.py
+MINIMUM_BALANCE = synthetic_ledger.MINIMUM_BALANCE
+MICRO = ("login", "dashboard", "statement", "send_money", "approve_request", "generate_account_number")
+MACRO = ("first_open", "startup", "session", "app_import")
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Context:
+    """The open ledger plus the random choices every benchmark draws from."""
+
+    def __init__(self, directory, kind, seed):
+        self.directory = directory
+        self.kind = kind
+        self.rng = random.Random(seed)
+        self.storage = self.service = self.analytics = None
+
+    def open(self):
+        directory = self.directory
+        self.storage = open_storage(
+            self.kind,
+            os.path.join(directory, "users.json"),
+            os.path.join(directory, "transactions.log"),
+            os.path.join(directory, "pending_requests.json"),
+            os.path.join(directory, "apex_bank.db"),
+        )
+        self.service = BankService(self.storage, minimum_balance=MINIMUM_BALANCE)
+        self.analytics = StatementAnalytics(self.storage.journal)
+
+    def close(self):
+        if self.storage is not None:
+            self.storage.close()
+        self.storage = self.service = self.analytics = None
+
+    def user(self):
+        return f"user{self.rng.randrange(len(self.service.data))}"
+
+
+# Operations, each as main.py's handler calls the service
+
+def login(ctx, username):
+    return ctx.service.login(username, ctx.service.data[username]["password"])
+
+
+def dashboard(ctx, username):
+    ctx.service.reload()
+    return ctx.service.balance(username), ctx.service.pending_count(username)
+
+
+def statement(ctx, username):
+    acc_no = ctx.service.account_no(username)
+    page = ctx.storage.journal.cursor(acc_no).next_page(HISTORY_PAGE_SIZE)
+    if page:
+        ctx.analytics.summary(acc_no, ctx.service.balance(username))
+    return page
+
+
+def send_money(ctx, username):
+    target = ctx.user()
+    while target == username:
+        target = ctx.user()
+    pin = ctx.service.data[username]["pin"]
+    return ctx.service.send(username, ctx.service.account_no(target), ctx.rng.randint(1, 100),
+                            authorize=lambda: ctx.service.check_pin(username, pin))
+
+
+def approve_request(ctx, request):
+    username = request["source_username"]
+    pin = ctx.service.data[username]["pin"]
+    return ctx.service.approve_request(username, request["request_id"],
+                                       authorize=lambda: ctx.service.check_pin(username, pin))
+
+
+def session(ctx, username):
+    login(ctx, username)
+    dashboard(ctx, username)
+    statement(ctx, username)
+    send_money(ctx, username)
+    dashboard(ctx, username)
+
+
+# Timing
+
+def summarize(samples):
+    """Latency figures in microseconds for a list of per-operation times in seconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    total = sum(ordered)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1e6
+
+    return {
+        "count": len(ordered),
+        "total_s": round(total, 6),
+        "ops_per_s": round(len(ordered) / total, 1) if total else None,
+        "mean_us": round(total / len(ordered) * 1e6, 2),
+        "p50_us": round(percentile(50), 2),
+        "p95_us": round(percentile(95), 2),
+        "p99_us": round(percentile(99), 2),
+        "max_us": round(ordered[-1] * 1e6, 2),
+    }
+
+
+def measure(op, args, warmup):
+    """Times op(arg) for each arg, discarding the first `warmup` calls."""
+    samples = []
+    clock = time.perf_counter
+    for i, arg in enumerate(args):
+        start = clock()
+        op(arg)
+        if i >= warmup:
+            samples.append(clock() - start)
+    return samples
+
+
+def run_micro(ctx, name, iterations, warmup):
+    total = iterations + warmup
+    if name == "approve_request":
+        # Each request can be approved once; use them in a seeded order
+        requests = sorted(ctx.storage.requests.iter_open(), key=lambda request: request["request_id"])
+        ctx.rng.shuffle(requests)
+        requests = [request for request in requests
+                    if ctx.service.balance(request["source_username"]) - request["amount"] >= MINIMUM_BALANCE]
+        return measure(lambda request: approve_request(ctx, request), requests[:total], warmup)
+    if name == "generate_account_number":
+        return measure(lambda _: ctx.service.registry.generate_account_number(), range(total), warmup)
+    op = globals()[name]
+    return measure(lambda username: op(ctx, username), [ctx.user() for _ in range(total)], warmup)
+
+
+def time_app_import():
+    """Seconds for a new interpreter to import main.py (it needs Tk installed, not a display)."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=REPO, check=True)
+    return time.perf_counter() - start
+
+
+def run_macro(ctx, name, repeats):
+    if name == "app_import":
+        return [time_app_import() for _ in range(repeats)]
+    if name == "session":
+        return measure(lambda username: session(ctx, username), [ctx.user() for _ in range(repeats + 1)], 1)
+    # first_open and startup reopen the ledger, so the shared one is closed meanwhile
+    ctx.close()
+    samples = []
+    for _ in range(1 if name == "first_open" else repeats):
+        start = time.perf_counter()
+        ctx.open()
+        samples.append(time.perf_counter() - start)
+        ctx.close()
+    ctx.open()
+    return samples
+
+
+def build_ledger(directory, args):
+    synthetic_ledger.generate(directory, args.accounts, args.entries, args.requests, args.seed)
+    if args.storage == "sqlite":
+        from migrate_to_sqlite import migrate
+        migrate(*(os.path.join(directory, name) for name in
+                  ("users.json", "transactions.log", "pending_requests.json", "apex_bank.db")))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, directory):
+    # generate_account_number and request ids draw from the global generator
+    random.seed(args.seed)
+    start = time.perf_counter()
+    build_ledger(directory, args)
+    generate_s = time.perf_counter() - start
+
+    ctx = Context(directory, args.storage, args.seed)
+    results = {}
+    selected = set(args.only or MICRO + MACRO)
+    # first_open must see the ledger before anything has opened it
+    if "first_open" in selected:
+        results["first_open"] = summarize(run_macro(ctx, "first_open", 1))
+    else:
+        ctx.open()
+    for name in MICRO:
+        if name in selected:
+            results[name] = summarize(run_micro(ctx, name, args.iterations, args.warmup))
+    for name in ("startup", "session", "app_import"):
+        if name in selected:
+            results[name] = summarize(run_macro(ctx, name, args.repeats))
+    ctx.close()
+
+    return {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "accounts": args.accounts,
+            "entries": args.entries,
+            "requests": args.requests,
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "repeats": args.repeats,
+            "generate_s": round(generate_s, 3),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Prints the p50 change per benchmark; returns the names that got slower than threshold."""
+    meta, old_meta = report["meta"], baseline["meta"]
+    keys = ("storage", "accounts", "entries", "requests", "seed")
+    if any(meta.get(key) != old_meta.get(key) for key in keys):
+        print("warning: the baseline was run with different settings: "
+              + ", ".join(f"{key}={old_meta.get(key)}" for key in keys))
+    print(f"\nvs. {old_meta.get('commit') or 'baseline'} ({old_meta.get('date')})")
+    regressions = []
+    for name, result in report["results"].items():
+        old = baseline["results"].get(name)
+        if not old or not old.get("p50_us") or not result.get("p50_us"):
+            continue
+        ratio = result["p50_us"] / old["p50_us"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<24} {old['p50_us']:>12,.1f} -> {result['p50_us']:>12,.1f} us  {ratio - 1:+7.1%}{flag}")
+    return regressions
+
+
+def print_report(report):
+    meta = report["meta"]
+    print(f"{meta['storage']} storage, {meta['accounts']:,} accounts, {meta['entries']:,} log records, "
+          f"{meta['requests']:,} pending requests (generated in {meta['generate_s']:.1f}s)")
+    print(f"{'benchmark':<24} {'count':>6} {'ops/s':>10} {'p50 us':>12} {'p95 us':>12} {'p99 us':>12}")
+    for name, result in report["results"].items():
+        if not result["count"]:
+            print(f"{name:<24} {0:>6}  (nothing to run)")
+            continue
+        print(f"{name:<24} {result['count']:>6} {result['ops_per_s'] or 0:>10,.1f} {result['p50_us']:>12,.1f} "
+              f"{result['p95_us']:>12,.1f} {result['p99_us']:>12,.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apex benchmark suite")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--entries", type=int, default=100000, help="transaction log records")
+    parser.add_argument("--requests", type=int, default=2000, help="pending money requests")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=1000, help="timed calls per micro benchmark")
+    parser.add_argument("--warmup", type=int, default=50, help="untimed calls before each micro benchmark")
+    parser.add_argument("--repeats", type=int, default=5, help="runs of each macro benchmark")
+    parser.add_argument("--only", nargs="+", choices=MICRO + MACRO, help="run just these benchmarks")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="an earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="p50 slowdown counted as a regression (default 0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    parser.add_argument("--keep", help="generate the ledger in this directory and keep it")
+    args = parser.parse_args(argv)
+
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        if os.listdir(args.keep):
+            sys.exit(f"{args.keep} is not empty")
+        report = run(args, args.keep)
+    else:
+        directory = tempfile.mkdtemp(prefix="apex_bench_")
+        try:
+            report = run(args, directory)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold) and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
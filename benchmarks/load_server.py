@@ -0,0 +1,164 @@
+"""Load generator for bank_server.py.
+
+Opens many concurrent client connections, each firing a mix of balance
+reads and transfers between a pool of test accounts, and reports
+throughput and latency percentiles per operation.
+
+    python benchmarks/load_server.py --spawn                  # private server on a temp dir
+    python benchmarks/load_server.py --clients 2000 --spawn --storage sqlite
+    python benchmarks/load_server.py --port 8765              # an already running server
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bank_server import raise_open_file_limit
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._ids = 0
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+        return cls(reader, writer)
+
+    async def call(self, op, **fields):
+        self._ids += 1
+        request = dict(fields, op=op, id=self._ids)
+        self.writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def create_accounts(host, port, count):
+    """Signs up (or reuses) loadgen accounts; returns {username: account_no}."""
+    client = await Client.connect(host, port)
+    accounts = {}
+    for i in range(count):
+        username = f"loadgen{i}"
+        await client.call("signup", username=username, password="pw", pin="0000")
+        reply = await client.call("login", username=username, password="pw")
+        accounts[username] = reply["result"]
+    await client.close()
+    return accounts
+
+
+async def run_client(host, port, accounts, requests, read_ratio, seed, latencies, outcomes):
+    rng = random.Random(seed)
+    names = list(accounts)
+    client = await Client.connect(host, port)
+    for _ in range(requests):
+        sender = rng.choice(names)
+        start = time.perf_counter()
+        if rng.random() < read_ratio:
+            op = "balance"
+            reply = await client.call(op, username=sender)
+        else:
+            op = "send"
+            target = rng.choice([name for name in names if name != sender])
+            reply = await client.call(op, username=sender, target_acc_no=accounts[target], amount=rng.randint(1, 100))
+        latencies[op].append(time.perf_counter() - start)
+        outcomes["ok" if reply["ok"] else reply["error"]] += 1
+    await client.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_load(args):
+    accounts = await create_accounts(args.host, args.port, args.accounts)
+    latencies = collections.defaultdict(list)
+    outcomes = collections.Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_client(args.host, args.port, accounts, args.requests, args.read_ratio, seed, latencies, outcomes)
+        for seed in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{args.clients} clients, {total} requests in {elapsed:.2f}s ({total / elapsed:,.0f} req/s)")
+    for op, values in sorted(latencies.items()):
+        values.sort()
+        print(f"  {op:8} n={len(values):<7} p50={percentile(values, 0.5) * 1e3:7.2f} ms  "
+              f"p95={percentile(values, 0.95) * 1e3:7.2f} ms  p99={percentile(values, 0.99) * 1e3:7.2f} ms  "
+              f"max={values[-1] * 1e3:7.2f} ms")
+    for name, count in outcomes.most_common():
+        print(f"  {name}: {count}")
+
+
+def spawn_server(args, directory):
+    command = [
+        sys.executable, os.path.join(ROOT, "bank_server.py"), "--host", args.host, "--port", str(args.port),
+        "--storage", args.storage,
+        "--users", os.path.join(directory, "users.json"),
+        "--log", os.path.join(directory, "transactions.log"),
+        "--requests", os.path.join(directory, "pending_requests.json"),
+        "--db", os.path.join(directory, "apex_bank.db"),
+    ]
+    process = subprocess.Popen(command)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            asyncio.run(_probe(args.host, args.port))
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("bank_server.py did not start")
+
+
+async def _probe(host, port):
+    _, writer = await asyncio.open_connection(host, port)
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for bank_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=500, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--read-ratio", type=float, default=0.5, help="share of balance reads vs sends")
+    parser.add_argument("--spawn", action="store_true", help="start a private server on a temporary data dir")
+    parser.add_argument("--storage", default="json", choices=("json", "sqlite"), help="backend for --spawn")
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    process = directory = None
+    if args.spawn:
+        directory = tempfile.mkdtemp(prefix="apex_load_")
+        process = spawn_server(args, directory)
+    try:
+        asyncio.run(run_load(args))
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGINT)
+            process.wait()
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
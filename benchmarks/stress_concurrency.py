@@ -0,0 +1,145 @@
+"""Stress test: many processes transferring between the same accounts at once.
+
+Each worker process opens its own storage and BankService on a shared data
+directory and fires random transfers (single sends and small batches) at a
+handful of accounts, so the same balances are contended constantly. At the
+end the ledger is checked:
+
+- the total money across all accounts is unchanged,
+- no account is below the minimum balance,
+- every account's balance equals the sum of its log entries,
+- the log holds exactly two entries per successful transfer, plus one
+  "Account Opened" entry per account.
+
+    python benchmarks/stress_concurrency.py
+    python benchmarks/stress_concurrency.py --processes 16 --transfers 1000 --storage sqlite
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_service import BankError, BankService
+from storage import open_storage
+
+STARTING_BALANCE = 10000
+MINIMUM_BALANCE = 1000
+
+
+def open_service(directory, kind, checkpoint_every):
+    storage = open_storage(
+        kind,
+        os.path.join(directory, "users.json"),
+        os.path.join(directory, "transactions.log"),
+        os.path.join(directory, "pending_requests.json"),
+        os.path.join(directory, "apex_bank.db"),
+        checkpoint_every=checkpoint_every,
+    )
+    service = BankService(storage, minimum_balance=MINIMUM_BALANCE, starting_balance=STARTING_BALANCE)
+    return storage, service
+
+
+def worker(directory, kind, checkpoint_every, transfers, seed, results):
+    storage, service = open_service(directory, kind, checkpoint_every)
+    rng = random.Random(seed)
+    names = sorted(service.data)
+    counts = collections.Counter()
+    for _ in range(transfers):
+        sender = rng.choice(names)
+        try:
+            if rng.random() < 0.2:
+                targets = rng.sample([name for name in names if name != sender], 3)
+                batch = [(service.account_no(name), rng.randint(1, 3000)) for name in targets]
+                service.batch_transfer(sender, batch, atomic=True)
+                counts["transfers"] += len(batch)
+            else:
+                target = rng.choice([name for name in names if name != sender])
+                service.send(sender, service.account_no(target), rng.randint(1, 3000))
+                counts["transfers"] += 1
+        except BankError as e:
+            counts[type(e).__name__] += 1
+    storage.close()
+    results.put(dict(counts))
+
+
+def verify(directory, kind, accounts, expected_transfers):
+    storage, service = open_service(directory, kind, checkpoint_every=500)
+    problems = []
+    total = sum(user["balance"] for user in service.data.values())
+    if total != accounts * STARTING_BALANCE:
+        problems.append(f"total money is {total:,}, expected {accounts * STARTING_BALANCE:,}")
+
+    logged = collections.Counter()
+    entries = 0
+    for entry in storage.journal.iter_entries():
+        logged[entry["account_no"]] += entry["amount"]
+        entries += 1
+    if entries != 2 * expected_transfers + accounts:
+        problems.append(f"{entries} log entries for {expected_transfers} transfers and {accounts} accounts")
+
+    for name, user in service.data.items():
+        if user["balance"] < MINIMUM_BALANCE:
+            problems.append(f"{name} is below the minimum balance: {user['balance']:,}")
+        if user["balance"] != logged[user["account_no"]]:
+            problems.append(f"{name}: balance {user['balance']:,} does not match its log")
+    storage.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--transfers", type=int, default=300, help="operations per process")
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--storage", default="json", choices=("json", "sqlite"))
+    parser.add_argument("--checkpoint-every", type=int, default=50,
+                        help="small by default so checkpoints race with commits")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="apex_stress_")
+    try:
+        storage, service = open_service(directory, args.storage, args.checkpoint_every)
+        for i in range(args.accounts):
+            service.signup(f"user{i}", "pw", "0000")
+        storage.close()
+
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=worker, args=(
+                directory, args.storage, args.checkpoint_every, args.transfers, seed, results))
+            for seed in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        counts = collections.Counter()
+        for _ in workers:
+            counts.update(results.get())
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        print(f"{args.processes} processes, {args.storage} storage, {elapsed:.2f}s")
+        for name, count in counts.most_common():
+            print(f"  {name}: {count}")
+        problems = verify(directory, args.storage, args.accounts, counts["transfers"])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if problems:
+        print("FAILED")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK: money conserved, balances match the log")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Synthetic ledgers in the app's on-disk formats, for benchmarks at realistic scale.
+
+generate() writes, into one directory,
+
+- users.json: N accounts, {username: {password, pin, balance, account_no}},
+- transactions.log: M records as JSON Lines, oldest first,
+- pending_requests.json: K open money requests, {request_id: request},
+
+exactly as main.py and the storage layer write them, so the app itself can
+be pointed at the result. The log is a mix of deposits, withdrawals,
+transfers and approved requests between random accounts; every balance in
+users.json equals its opening balance plus its records, and no account ever
+drops below the minimum balance. The same seed always gives the same files.
+
+    python benchmarks/synthetic_ledger.py data/ --accounts 100000 --entries 1000000 --requests 10000
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+
+MINIMUM_BALANCE = 1000
+START_TIME = datetime.datetime(2024, 1, 1, 9, 0, 0)
+MAX_ACCOUNTS = 900000  # account numbers are 6 digits, 100000-999999
+
+# (weight, record types); the second type of a pair is the counterparty's record
+ACTIVITY = (
+    (20, ("Deposit",)),
+    (15, ("Withdrawal",)),
+    (50, ("Send", "Receive (Send)")),
+    (15, ("Send (Request)", "Receive (Request)")),
+)
+
+
+def make_users(rng, accounts):
+    """{username: record} with unique 6-digit account numbers; passwords are "pw<i>"."""
+    if accounts > MAX_ACCOUNTS:
+        raise ValueError(f"At most {MAX_ACCOUNTS:,} accounts fit in 6-digit account numbers")
+    account_nos = rng.sample(range(100000, 1000000), accounts)
+    return {
+        f"user{i}": {
+            "password": f"pw{i}",
+            "pin": f"{rng.randrange(10000):04d}",
+            "balance": rng.randrange(100000, 10000000),
+            "account_no": str(acc_no),
+        }
+        for i, acc_no in enumerate(account_nos)
+    }
+
+
+def _timestamps(rng, start=START_TIME):
+    """Ever-later "YYYY-mm-dd HH:MM:SS" strings, a few seconds to a few minutes apart."""
+    now = start
+    while True:
+        now += datetime.timedelta(seconds=rng.randint(1, 180))
+        yield now.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _record(timestamp, acc_no, type, amount, target_acc_no=None):
+    # Same keys, in the same order, as bank_service.make_log_entry
+    return {
+        "timestamp": timestamp,
+        "account_no": acc_no,
+        "type": type,
+        "amount": amount,
+        "status": "Success",
+        "target_acc_no": target_acc_no,
+    }
+
+
+def iter_log(rng, users, entries):
+    """`entries` log records, applying each one to the balances in `users`."""
+    records = list(users.values())
+    weights = [weight for weight, _ in ACTIVITY]
+    kinds = [types for _, types in ACTIVITY]
+    clock = _timestamps(rng)
+    written = 0
+    while written < entries:
+        types = rng.choices(kinds, weights)[0]
+        if len(types) == 2 and (entries - written < 2 or len(records) < 2):
+            types = ("Deposit",)  # no room (or nobody) for the second half of a pair
+        user = rng.choice(records)
+        amount = rng.randint(1, 5000)
+        timestamp = next(clock)
+        if len(types) == 1:
+            if types[0] == "Withdrawal" and user["balance"] - amount >= MINIMUM_BALANCE:
+                user["balance"] -= amount
+                yield _record(timestamp, user["account_no"], "Withdrawal", -amount)
+            else:
+                user["balance"] += amount
+                yield _record(timestamp, user["account_no"], "Deposit", amount)
+            written += 1
+            continue
+        other = rng.choice(records)
+        while other is user:
+            other = rng.choice(records)
+        if user["balance"] - amount < MINIMUM_BALANCE:
+            user, other = other, user  # the other side pays instead
+        if user["balance"] - amount < MINIMUM_BALANCE:
+            other["balance"] += amount
+            yield _record(timestamp, other["account_no"], "Deposit", amount)
+            written += 1
+            continue
+        user["balance"] -= amount
+        other["balance"] += amount
+        yield _record(timestamp, user["account_no"], types[0], -amount, other["account_no"])
+        yield _record(timestamp, other["account_no"], types[1], amount, user["account_no"])
+        written += 2
+
+
+def make_requests(rng, users, count):
+    """{request_id: request} of `count` open requests between random accounts."""
+    names = list(users)
+    if count and len(names) < 2:
+        raise ValueError("Pending requests need at least two accounts")
+    clock = _timestamps(rng, START_TIME + datetime.timedelta(days=365))
+    base_id = int(START_TIME.timestamp() * 1000)
+    requests = {}
+    for i in range(count):
+        requester, source = rng.sample(names, 2)
+        req_id = f"req_{base_id + i}"
+        requests[req_id] = {
+            "request_id": req_id,
+            "requester_acc_no": users[requester]["account_no"],
+            "requester_username": requester,
+            "source_acc_no": users[source]["account_no"],
+            "source_username": source,
+            "amount": rng.randint(1, 5000),
+            "timestamp": next(clock),
+            "status": "pending",
+        }
+    return requests
+
+
+def generate(directory, accounts, entries, requests, seed=0):
+    """Writes users.json, transactions.log and pending_requests.json; returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "users": os.path.join(directory, "users.json"),
+        "log": os.path.join(directory, "transactions.log"),
+        "requests": os.path.join(directory, "pending_requests.json"),
+    }
+    users = make_users(rng, accounts)
+    # The log is streamed to disk; only the user map is held in memory
+    with open(paths["log"], "w") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in iter_log(rng, users, entries))
+    with open(paths["users"], "w") as f:
+        json.dump(users, f, indent=4)
+    with open(paths["requests"], "w") as f:
+        json.dump(make_requests(rng, users, requests), f, indent=4)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Apex ledger")
+    parser.add_argument("directory")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--entries", type=int, default=100000, help="transaction log records")
+    parser.add_argument("--requests", type=int, default=1000, help="pending money requests")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    try:
+        paths = generate(args.directory, args.accounts, args.entries, args.requests, args.seed)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"Wrote {args.accounts:,} accounts, {args.entries:,} log records and "
+          f"{args.requests:,} requests to {args.directory}")
+    return paths
+
+
+if __name__ == "__main__":
+    main()
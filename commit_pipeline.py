@@ -0,0 +1,107 @@
+"""Group commit for many threads: one durable write for many operations.
+
+Threads hand their changes to CommitPipeline.submit(), which blocks until
+they are on disk. A background flusher collects everything submitted
+within `window` seconds (or until `max_batch` commits are waiting) and
+writes it with a single write callback, so one fsync covers the whole
+batch instead of one per operation.
+"""
+import threading
+import time
+
+
+class _Ticket:
+    __slots__ = ("done", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class CommitPipeline:
+    """Collects (updates, log_entries) commits and writes them in batches.
+
+    `write(updates, log_entries)` is called from the flusher thread with the
+    merged updates dict and the concatenated log entries of one batch.
+    """
+
+    def __init__(self, write, window=0.005, max_batch=256):
+        self._write = write
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.commits = 0
+        self._cond = threading.Condition()
+        self._pending = []
+        self._in_flight = []
+        self._thread = None
+        self._closed = False
+
+    def submit(self, updates, log_entries=()):
+        """Queues one commit and waits until the batch holding it is durable."""
+        ticket = _Ticket()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Commit pipeline is closed")
+            self._pending.append((updates, list(log_entries), ticket))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="commit-pipeline", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        ticket.done.wait()
+        if ticket.error is not None:
+            raise ticket.error
+
+    def pending_updates(self):
+        """Updates submitted but not yet written, merged oldest first."""
+        merged = {}
+        with self._cond:
+            for updates, _, _ in self._in_flight + self._pending:
+                merged.update(updates)
+        return merged
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Give other threads up to `window` seconds to join this batch
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+                self._in_flight = batch
+
+            updates = {}
+            log_entries = []
+            for commit_updates, commit_logs, _ in batch:
+                updates.update(commit_updates)
+                log_entries.extend(commit_logs)
+            error = None
+            try:
+                self._write(updates, log_entries)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._in_flight = []
+                self.batches += 1
+                self.commits += len(batch)
+            for _, _, ticket in batch:
+                ticket.error = error
+                ticket.done.set()
+
+    def close(self):
+        """Writes whatever is still queued and stops the flusher thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
@@ -0,0 +1,556 @@
+"""Append-only transaction journal stored as JSON Lines (one record per line).
+
+Next to the journal sits a small index file (`<journal>.idx`) mapping each
+account number to the byte offsets of its records, so one account's history
+can be read without parsing everyone else's.
+
+Several processes may append to the same journal; each write is a single
+O_APPEND write(), and every process indexes records by scanning what was
+appended since it last looked, so nobody's records are skipped.
+
+Older records can be sealed into compressed segments (see segments.py).
+Records are addressed by position, the byte offset they would have in one
+never-rotated log, so positions stay valid after sealing. Once sealed
+records are dropped from the active file, it starts with a header line
+{"segment_start": P} giving the position of its first record.
+"""
+import bisect
+import collections
+import datetime
+import json
+import os
+import shutil
+import threading
+
+import metrics
+from segments import Segment, SegmentStore
+
+HEADER_KEY = "segment_start"
+_HEADER_PREFIX = b'{"' + HEADER_KEY.encode("ascii") + b'"'
+SEALED_CACHE_SIZE = 1024  # accounts whose sealed record positions are kept in memory
+
+
+def _read_header(f):
+    """(position of the first record, header length in bytes) for an open active file."""
+    f.seek(0)
+    head = f.read(4096)
+    if head.startswith(_HEADER_PREFIX):
+        line = head[:head.find(b"\n") + 1]
+        try:
+            return int(json.loads(line)[HEADER_KEY]), len(line)
+        except (ValueError, KeyError, TypeError):
+            pass
+    return 0, 0
+
+
+def _file_id(st):
+    return st.st_dev, st.st_ino
+
+
+class Journal:
+    """Appends transaction records to a log file with a single write per call."""
+
+    def __init__(self, file_path, fsync_every=0, segment_bytes=None, monthly=False):
+        self.file_path = file_path
+        self.index_path = file_path + ".idx"
+        self.fsync_every = fsync_every
+        # Rotation policy: seal the active file past this size, and/or when a new month starts
+        self.segment_bytes = segment_bytes
+        self.monthly = monthly
+        self.segments = SegmentStore(file_path + ".segments")
+        self._file = None
+        self._file_id = None
+        self._index_file = None
+        self._unsynced = 0
+        self._offsets = {}  # acc_no -> positions of its records in the active file
+        self._indexed_upto = 0
+        self._start = 0  # position of the active file's first record
+        self._header_len = 0
+        self._first_month = None
+        self._sealed = collections.OrderedDict()  # acc_no -> (positions covered up to, sealed positions)
+        self._prepared = False
+        self._lock = threading.RLock()
+
+    def open(self):
+        """Opens the log and loads (or builds) the account index now instead of on first use."""
+        self._open()
+
+    def _open(self):
+        with self._lock:
+            return self._open_locked()
+
+    def _prepare(self):
+        """Brings the file into JSON Lines shape; enough for reads that don't need the index."""
+        with self._lock:
+            if not self._prepared:
+                self._migrate_legacy_format()
+                self._terminate_torn_line()
+                self._prepared = True
+
+    def _open_locked(self):
+        if self._file is None:
+            self._prepare()
+            # Unbuffered, so each append is exactly one write() on an O_APPEND file
+            self._file = open(self.file_path, "a+b", buffering=0)
+            self._file_id = _file_id(os.fstat(self._file.fileno()))
+            self._start, self._header_len = _read_header(self._file)
+            self._first_month = None
+            self.segments.refresh()
+            self._load_index()
+        return self._file
+
+    def _physical(self, position):
+        """Byte offset in the active file of the record at `position`."""
+        return position - self._start + self._header_len
+
+    def _reopen_if_rotated_locked(self):
+        """Switches to the new active file if a rotation replaced it (maybe in another process).
+
+        Returns the active file's size.
+        """
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return os.fstat(self._file.fileno()).st_size
+        if _file_id(st) == self._file_id:
+            return st.st_size
+        self._close_files()
+        self._open_locked()
+        return os.fstat(self._file.fileno()).st_size
+
+    def _layout(self, f):
+        """(position of the first record, header length) for a newly opened handle on the log."""
+        if self._file_id is not None and _file_id(os.fstat(f.fileno())) == self._file_id:
+            return self._start, self._header_len  # the file we have already read the header of
+        return _read_header(f)
+
+    def _migrate_legacy_format(self):
+        """Rewrites an old JSON-array transactions.log as JSON Lines, once."""
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, "rb") as f:
+            head = f.read(64).lstrip()
+            if not head.startswith(b"["):
+                return
+            f.seek(0)
+            content = f.read()
+
+        try:
+            entries = json.loads(content)
+        except json.JSONDecodeError:
+            # Keep the unreadable file around instead of silently dropping history
+            os.replace(self.file_path, self.file_path + ".bak")
+            return
+        if not isinstance(entries, list):
+            entries = []
+
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.file_path)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+    def _terminate_torn_line(self):
+        """Ends a half-written last record so the next append starts on a fresh line."""
+        if not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0:
+            return
+        with open(self.file_path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    # Per-account index
+
+    def _load_index(self):
+        self._offsets = {}
+        self._indexed_upto = self._start
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 3:
+                        continue  # torn line from an interrupted index write
+                    acc_no, start, end = parts[0], int(parts[1]), int(parts[2])
+                    if start < self._start:
+                        continue  # sealed into a segment since
+                    self._offsets.setdefault(acc_no, []).append(start)
+                    self._indexed_upto = max(self._indexed_upto, end)
+        # Processes sharing the journal may each have indexed the same record
+        for acc_no, offsets in self._offsets.items():
+            self._offsets[acc_no] = sorted(set(offsets))
+
+        if self._physical(self._indexed_upto) > os.fstat(self._file.fileno()).st_size:
+            # The journal was replaced or truncated underneath us
+            self.rebuild_index()
+            return
+        self._index_file = open(self.index_path, "ab", buffering=0)
+        self._catch_up()
+
+    def _catch_up(self):
+        """Indexes records appended since the index was last written (e.g. by another process)."""
+        with self._lock:
+            self._catch_up_locked()
+
+    def _catch_up_locked(self):
+        if self._reopen_if_rotated_locked() <= self._physical(self._indexed_upto):
+            return
+        lines = []
+        with open(self.file_path, "rb") as f:
+            if _file_id(os.fstat(f.fileno())) != self._file_id:
+                return  # rotated just now; the next call reopens
+            f.seek(self._physical(self._indexed_upto))
+            offset = self._indexed_upto
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # still being written
+                end = offset + len(raw)
+                try:
+                    acc_no = json.loads(raw).get("account_no") if raw.strip() else None
+                except json.JSONDecodeError:
+                    acc_no = None
+                if acc_no is not None:
+                    self._offsets.setdefault(acc_no, []).append(offset)
+                    lines.append(f"{acc_no} {offset} {end}\n")
+                offset = end
+        metrics.add_bytes("journal_indexed", offset - self._indexed_upto)
+        self._indexed_upto = offset
+        if lines:
+            # One unbuffered write, so index lines from different processes never interleave
+            self._index_file.write("".join(lines).encode("utf-8"))
+
+    def rebuild_index(self):
+        """Discards the index file and rebuilds it from the raw journal."""
+        if self._index_file is not None:
+            self._index_file.close()
+        self._offsets = {}
+        self._indexed_upto = self._start
+        self._index_file = open(self.index_path, "wb", buffering=0)
+        self._catch_up()
+
+    # Writing
+
+    def append(self, entry):
+        """Appends one record to the end of the journal."""
+        self.append_many([entry])
+
+    @metrics.timed("journal_append")
+    def append_many(self, entries):
+        """Appends several records with a single write."""
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        with self._lock:
+            self._open_locked()
+            self._reopen_if_rotated_locked()
+            self._file.write(data)
+            metrics.add_bytes("journal_written", len(data))
+            # Other processes may have appended just before us, so index by scanning
+            self._catch_up_locked()
+
+            if self.fsync_every:
+                self._unsynced += 1
+                if self._unsynced >= self.fsync_every:
+                    self.sync()
+
+    def sync(self):
+        """Forces any appended records to disk."""
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def _close_files(self):
+        self._file.close()
+        self._index_file.close()
+        self._file = None
+        self._file_id = None
+        self._index_file = None
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self.sync()
+                self._close_files()
+                self._prepared = False
+
+    # Rotation
+
+    def needs_rotation(self):
+        """True when the active file is due to be sealed."""
+        with self._lock:
+            self._open_locked()
+            size = self._indexed_upto - max(self._start, self.segments.end)
+            if not size:
+                return False
+            if self.segment_bytes and size >= self.segment_bytes:
+                return True
+            return self.monthly and self._first_month_locked() != datetime.datetime.now().strftime("%Y-%m")
+
+    def _first_month_locked(self):
+        if self._first_month is None:
+            with open(self.file_path, "rb") as f:
+                f.seek(self._header_len)
+                line = f.readline()
+            try:
+                self._first_month = (json.loads(line).get("timestamp") or "")[:7]
+            except (json.JSONDecodeError, AttributeError):
+                self._first_month = ""
+        return self._first_month
+
+    def compaction_due(self):
+        """True when sealed records are still in the active file (see compact())."""
+        with self._lock:
+            return self._file is not None and self.segments.end > self._start
+
+    def seal(self):
+        """Compresses the active file's records into a new segment; returns it, or None if none are new.
+
+        Appends carry on meanwhile; only records already written are sealed.
+        Callers must make sure one process seals at a time.
+        """
+        end = self.end_position()
+        self.segments.refresh()
+        # Read through one file object, so a compact() elsewhere cannot swap the file mid-way
+        with open(self.file_path, "rb") as source:
+            active_start, header_len = _read_header(source)
+            start = max(active_start, self.segments.end)
+            if end <= start:
+                return None
+            with metrics.timer("journal_seal"):
+                return self.segments.seal(source, start - active_start + header_len, start, end)
+
+    def compact(self):
+        """Drops sealed records from the active file; returns True if it was rewritten.
+
+        Appends must be blocked (in every process) while this runs. The
+        records after the last segment are copied into a new active file,
+        which replaces the old one; other processes notice and reopen it.
+        """
+        with self._lock:
+            self._open_locked()
+            self._catch_up_locked()
+            self.segments.refresh()
+            start = self.segments.end
+            if start <= self._start:
+                return False
+            temp_path = f"{self.file_path}.{os.getpid()}.tmp"
+            with open(self.file_path, "rb") as source, open(temp_path, "wb") as f:
+                f.write((json.dumps({HEADER_KEY: start}) + "\n").encode("utf-8"))
+                source.seek(self._physical(start))
+                shutil.copyfileobj(source, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.file_path)
+            # Lines for sealed records are skipped on load anyway; this just stops the index growing
+            temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            open(temp_path, "wb").close()
+            os.replace(temp_path, self.index_path)
+            self._close_files()
+            self._open_locked()
+            return True
+
+    # Reading
+
+    def __iter__(self):
+        return self.iter_entries()
+
+    def iter_entries(self, since=None, until=None):
+        """Streams records from oldest to newest without loading the whole file.
+
+        Sealed segments wholly outside [since, until] ("YYYY-mm-dd...") are
+        skipped; records are not filtered individually.
+        """
+        self._prepare()
+        with open(self.file_path, "rb") as f:
+            start, header_len = self._layout(f)
+            if start:
+                for segment in self._sealed_segments(0, start):
+                    if segment.overlaps(since, until):
+                        yield from (entry for entry, _ in self._parse(self.segments.iter_lines(segment)))
+            f.seek(header_len)
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from an interrupted write; skip it
+                        continue
+            finally:
+                metrics.add_bytes("journal_read", f.tell())
+
+    def end_position(self):
+        """Byte offset just past the last complete record."""
+        self._open()
+        self._catch_up()
+        return self._indexed_upto
+
+    def read_from(self, position=0, end=None):
+        """Streams (record, position after it) pairs from `position` up to `end`."""
+        self._prepare()
+        with open(self.file_path, "rb") as f:
+            start, header_len = self._layout(f)
+            if position < start:
+                sealed_end = start if end is None else min(start, end)
+                for segment in self._sealed_segments(position, sealed_end):
+                    yield from self._parse(self.segments.iter_lines(segment, position, sealed_end))
+                position = start
+            f.seek(position - start + header_len)
+            for line in f:
+                if not line.endswith(b"\n") or (end is not None and position >= end):
+                    return
+                position += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line), position
+                except json.JSONDecodeError:
+                    continue
+
+    @staticmethod
+    def _parse(lines):
+        for line, position in lines:
+            try:
+                yield json.loads(line), position
+            except json.JSONDecodeError:
+                continue
+
+    def _sealed_segments(self, position, end):
+        """Segments holding records between positions `position` and `end`."""
+        if self.segments.end < end:
+            self.segments.refresh()
+        return [segment for segment in self.segments.segments if segment.end > position and segment.start < end]
+
+    def _sealed_positions(self, acc_no):
+        """Positions of acc_no's records sealed out of the active file, oldest first."""
+        covered, positions = self._sealed.get(acc_no, (0, []))
+        if covered < self._start:
+            positions = list(positions)
+            for segment in self._sealed_segments(covered, self._start):
+                positions.extend(self.segments.account_positions(segment, acc_no))
+            covered = self._start
+        self._sealed[acc_no] = (covered, positions)
+        self._sealed.move_to_end(acc_no)
+        if len(self._sealed) > SEALED_CACHE_SIZE:
+            self._sealed.popitem(last=False)
+        return positions
+
+    def _account_offsets(self, acc_no):
+        """Positions of all acc_no's records, oldest first: sealed segments, then the active file."""
+        with self._lock:
+            active = self._offsets.get(acc_no, [])
+            if not self._start:
+                return active
+            return self._sealed_positions(acc_no) + active
+
+    def _cursor_sources(self, acc_no):
+        """acc_no's active-file offsets, plus what comes before them oldest first.
+
+        Earlier parts are position lists already cached in memory, or sealed
+        segments whose index has not been read for this account yet.
+        """
+        with self._lock:
+            active = self._offsets.get(acc_no, [])
+            if not self._start:
+                return active, []
+            covered, positions = self._sealed.get(acc_no, (0, []))
+            earlier = [positions] if positions else []
+            if covered < self._start:
+                earlier.extend(self._sealed_segments(covered, self._start))
+            return active, earlier
+
+    def iter_account(self, acc_no, newest_first=True):
+        """Streams one account's records using the index, newest first by default."""
+        self._open()
+        self._catch_up()
+        offsets = self._account_offsets(acc_no)
+        positions = range(len(offsets) - 1, -1, -1) if newest_first else range(len(offsets))
+        return self._read_at(offsets[i] for i in positions)
+
+    def iter_account_from(self, acc_no, index):
+        """One account's records after its first `index`, oldest first."""
+        self._open()
+        self._catch_up()
+        return self._read_at(self._account_offsets(acc_no)[index:])
+
+    def iter_account_range(self, acc_no, start, end=None):
+        """One account's records stored between byte offsets start and end, oldest first."""
+        self._open()
+        self._catch_up()
+        offsets = self._account_offsets(acc_no)
+        first = bisect.bisect_left(offsets, start)
+        last = len(offsets) if end is None else bisect.bisect_left(offsets, end)
+        return self._read_at(offsets[first:last])
+
+    def cursor(self, acc_no):
+        """Returns a newest-first AccountCursor over acc_no's records."""
+        self._open()
+        self._catch_up()
+        return AccountCursor(self, acc_no)
+
+    def _read_at(self, offsets):
+        read = 0
+        with open(self.file_path, "rb") as f:
+            start, header_len = self._layout(f)
+            if self.segments.end < start:
+                self.segments.refresh()
+            try:
+                for offset in offsets:
+                    if offset < start:
+                        line = self.segments.read_line(offset)
+                        if line is None:
+                            continue
+                    else:
+                        f.seek(offset - start + header_len)
+                        line = f.readline()
+                        read += len(line)
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+            finally:
+                metrics.add_bytes("journal_read", read)
+
+    def count_for(self, acc_no):
+        """Number of records logged for acc_no."""
+        self._open()
+        self._catch_up()
+        with self._lock:
+            active = len(self._offsets.get(acc_no, ()))
+            if not self._start:
+                return active
+            return len(self._sealed_positions(acc_no)) + active
+
+
+class AccountCursor:
+    """Walks one account's records from newest to oldest, a page at a time.
+
+    Records appended after the cursor was created are not included. A
+    sealed segment's index is only read once the cursor gets that far back.
+    """
+
+    def __init__(self, journal, acc_no):
+        self.journal = journal
+        self.acc_no = acc_no
+        self._offsets, self._earlier = journal._cursor_sources(acc_no)
+        self._position = len(self._offsets)
+
+    def has_more(self):
+        while self._position == 0 and self._earlier:
+            source = self._earlier.pop()
+            if isinstance(source, Segment):
+                source = self.journal.segments.account_positions(source, self.acc_no)
+            self._offsets, self._position = source, len(source)
+        return self._position > 0
+
+    def next_page(self, size):
+        """Returns up to `size` older records, newest first."""
+        page = []
+        while len(page) < size and self.has_more():
+            start = max(0, self._position - (size - len(page)))
+            page.extend(reversed(self._offsets[start:self._position]))
+            self._position = start
+        return list(self.journal._read_at(page))
@@ -0,0 +1,198 @@
+"""Locks for running several app processes against the same data files.
+
+FileLock is a reader/writer lock on a whole file: commits take it shared,
+checkpoints (which rewrite the file) take it exclusive. KeyLocks gives one
+lock per account (or request) so transfers touching different accounts
+run in parallel, both across threads and across processes.
+
+Cross-process locking uses fcntl advisory locks on POSIX and msvcrt on
+Windows. Elsewhere only the in-process half of each lock applies.
+"""
+import collections
+import contextlib
+import os
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+def _lock_range(fd, offset, exclusive=True, blocking=True):
+    """Locks one byte at offset; returns False if blocking=False and it is taken."""
+    if fcntl is not None:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.lockf(fd, flags if blocking else flags | fcntl.LOCK_NB, 1, offset, os.SEEK_SET)
+        except (BlockingIOError, PermissionError):
+            return False
+    elif msvcrt is not None:
+        # msvcrt has no shared locks and gives up after ~10s, so keep retrying
+        os.lseek(fd, offset, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.01)
+    return True
+
+
+def _unlock_range(fd, offset):
+    if fcntl is not None:
+        fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset, os.SEEK_SET)
+    elif msvcrt is not None:
+        os.lseek(fd, offset, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Reader/writer lock shared by threads in this process and by other processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+
+    def _file(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            if self._readers == 0:
+                _lock_range(self._file(), 0, exclusive=False)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    _unlock_range(self._file(), 0)
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self._cond:
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writer = True
+            _lock_range(self._file(), 0, exclusive=True)
+        try:
+            yield
+        finally:
+            with self._cond:
+                _unlock_range(self._file(), 0)
+                self._writer = False
+                self._cond.notify_all()
+
+
+class KeyLocks:
+    """Per-key exclusive locks (e.g. one per account) across threads and processes.
+
+    Keys are hashed onto `slots` byte ranges of a lock file, so two keys
+    occasionally share a cross-process slot; that only costs parallelism,
+    never correctness. Locks are always taken in sorted order to avoid
+    deadlocks.
+    """
+
+    def __init__(self, path, slots=4096):
+        self.path = path
+        self.slots = slots
+        self._fd = None
+        self._guard = threading.Lock()
+        self._key_locks = {}
+        self._slot_state = {}  # slot -> [keys held on it in this process, mutex]
+
+    def _file(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _slot_for(self, key):
+        return zlib.crc32(str(key).encode("utf-8")) % self.slots
+
+    def _slot_counts(self, keys):
+        # Counted per key, so keys sharing a slot may be released together or apart
+        return collections.Counter(self._slot_for(key) for key in keys)
+
+    def _thread_lock(self, key):
+        with self._guard:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _slot(self, slot):
+        with self._guard:
+            state = self._slot_state.get(slot)
+            if state is None:
+                state = self._slot_state[slot] = [0, threading.Lock()]
+            return state
+
+    def acquire(self, keys, blocking=True):
+        """Locks all keys, in sorted order.
+
+        With blocking=False, returns False (holding nothing) instead of
+        waiting when any key is taken.
+        """
+        keys = sorted(set(keys))
+        taken_keys = []
+        taken_slots = {}
+        try:
+            for key in keys:
+                if not self._thread_lock(key).acquire(blocking):
+                    return False
+                taken_keys.append(key)
+            for slot, count in sorted(self._slot_counts(keys).items()):
+                state = self._slot(slot)
+                with state[1]:
+                    # fcntl locks belong to the process, so only the first holder locks
+                    if state[0] == 0 and not _lock_range(self._file(), slot, blocking=blocking):
+                        return False
+                    state[0] += count
+                taken_slots[slot] = count
+            taken_keys = taken_slots = None
+            return True
+        finally:
+            if taken_keys is not None:
+                self._release(taken_keys, taken_slots)
+
+    def release(self, keys):
+        keys = set(keys)
+        self._release(keys, self._slot_counts(keys))
+
+    def _release(self, keys, slots):
+        for slot, count in slots.items():
+            state = self._slot(slot)
+            with state[1]:
+                state[0] -= count
+                if state[0] == 0:
+                    _unlock_range(self._file(), slot)
+        for key in keys:
+            self._thread_lock(key).release()
+
+    @contextlib.contextmanager
+    def hold(self, keys):
+        keys = set(keys)
+        self.acquire(keys)
+        try:
+            yield
+        finally:
+            self.release(keys)
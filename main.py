@@ -1,25 +1,66 @@
+import time
+_STARTUP_MARKS = [("start", time.perf_counter())] # --profile-startup timings, in the order they happen
+
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from tkinter import filedialog, messagebox, simpledialog
 import ttkbootstrap as ttk
-import json
 import os
-import random
-import datetime 
+import sys
+import datetime
+import functools
+import itertools
+import queue
+import re
+import threading
 from tkinter import scrolledtext 
 from tkinter.ttk import Treeview 
-import requests # For making API calls to Ollama
+_STARTUP_MARKS.append(("import tkinter + ttkbootstrap", time.perf_counter()))
+# Only the modules the login screen needs are imported here. requests (via
+# ollama_client), NumPy (via analytics) and the export code load on first use.
+from storage import open_storage
+from bank_service import BankService, BankError, AuthorizationDeclined, format_currency
+import metrics
+_STARTUP_MARKS.append(("import bank modules", time.perf_counter()))
 
 # Constants
 DATA_FILE = "users.json"
 TRANSACTION_LOG_FILE = "transactions.log" 
 REQUESTS_FILE = "pending_requests.json" 
+SQLITE_DB_FILE = "apex_bank.db"
+STORAGE_BACKEND = os.environ.get("APEX_STORAGE", "json") # "json" (the files above) or "sqlite"
 CURRENCY = "USD"
 MINIMUM_BALANCE = 1000
 DEFAULT_STARTING_BALANCE = 500000
+HISTORY_PAGE_SIZE = 50 # Rows fetched per page on the statements screen
+LEDGER_CHECKPOINT_EVERY = 500 # users.json is rewritten after this many WAL records
+JOURNAL_FSYNC_EVERY = 0 # fsync the transaction journal every N appends (0 = leave it to the OS)
+COMMIT_WINDOW = None # seconds to gather commits from concurrent threads into one fsync (None = write each at once)
+LOG_SEGMENT_BYTES = 32 << 20 # seal transactions.log into a compressed segment at this size (None = never)
+LOG_ROTATE_MONTHLY = False # also seal it when a new month starts
+LEDGER_POLL_INTERVAL_MS = 50 # How often a login waiting for the background ledger load checks on it
+SUMMARY_POLL_INTERVAL_MS = 50 # How often the statements page checks for its totals, worked out on a worker thread
 
 # OLLAMA Configuration (Ensure Ollama is running locally)
 OLLAMA_API_URL = "http://localhost:11434/api/generate" 
 OLLAMA_MODEL = "qwen2.5" # Change to your preferred model
+OLLAMA_CONNECT_TIMEOUT = 3.05 # seconds to establish the connection
+OLLAMA_READ_TIMEOUT = 30 # seconds to wait between streamed chunks
+OLLAMA_RETRIES = 2 # retries on connection errors and 502/503/504
+OLLAMA_KEEP_ALIVE = "10m" # how long Ollama keeps the model loaded between questions
+AI_POLL_INTERVAL_MS = 50 # How often the chat window drains streamed tokens
+AI_CACHE_FILE = "arna_cache.json" # Cached answers to general questions (None = memory only)
+AI_CACHE_MAX_ENTRIES = 256
+AI_CACHE_TTL_SECONDS = 7 * 24 * 3600
+METRICS_FILE = os.environ.get("APEX_METRICS_FILE") # Prometheus textfile; unset = instrumentation off
+METRICS_INTERVAL_SECONDS = 15
+
+# Arna answers from the user's statement only for questions about their own account
+# ("what did I spend", "my largest transfers") or one of these bare commands
+ARNA_ACCOUNT_WORDS = re.compile(r"\b(my|i|i'?ve|i'?m|me|mine)\b")
+ARNA_ANALYTICS_COMMANDS = {
+    "summary", "monthly summary", "spending", "largest", "largest transactions", "biggest transactions",
+    "top contacts", "counterparties",
+}
 
 WEALTH_TIERS = [
     (10000000000000, "You have truly ascended the Matrix..."),
@@ -27,55 +68,157 @@ WEALTH_TIERS = [
     (10000000, "Buss itna paisa chaiye zindagi main"),
 ]
 
-# File handling and utility functions
+# Instrumentation (started before storage so the initial load is measured)
+if METRICS_FILE:
+    metrics.start_exporter(METRICS_FILE, METRICS_INTERVAL_SECONDS)
+
+# Storage (opened on a background thread by LedgerLoader, so the login screen is not kept waiting)
+
+class LedgerLoader:
+    """Opens storage and reads the ledger on a background thread.
 
-def load_data(file_path):
-    """Loads a JSON file."""
-    if os.path.exists(file_path):
+    The login screen is shown meanwhile; wait() blocks only if the user
+    logs in before the load has finished. A failed load is re-raised from
+    wait().
+    """
+
+    def __init__(self):
+        self.storage = None
+        self.service = None
+        self.error = None
+        self.seconds = None
+        self.finished_at = None
+        self._done = threading.Event()
+        threading.Thread(target=self._load, name="ledger-load", daemon=True).start()
+
+    def _load(self):
+        start = time.perf_counter()
         try:
-            with open(file_path, "r") as f:
-                content = f.read()
-                return json.loads(content) if content else {}
-        except json.JSONDecodeError:
-            return {}
-    return {}
-
-def save_data(data, file_path):
-    """Saves data to a JSON file."""
-    with open(file_path, "w") as f:
-        json.dump(data, f, indent=4)
-
-def generate_account_number(data):
-    while True:
-        acc_no = str(random.randint(100000, 999999))
-        if all(user.get("account_no") != acc_no for user in data.values()):
-            return acc_no
-
-def generate_request_id(requests_data):
-    """Generates a unique ID for a new request."""
-    while True:
-        req_id = f"req_{int(datetime.datetime.now().timestamp())}{random.randint(100,999)}"
-        if req_id not in requests_data:
-            return req_id
-
-# Log Transaction function
-def log_transaction(acc_no, type, amount, status, target_acc_no=None):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = {
-        "timestamp": timestamp,
-        "account_no": acc_no,
-        "type": type,
-        "amount": amount,
-        "status": status,
-        "target_acc_no": target_acc_no
-    }
-    
-    logs = load_data(TRANSACTION_LOG_FILE)
-    if not isinstance(logs, list):
-        logs = []
-        
-    logs.append(log_entry)
-    save_data(logs, TRANSACTION_LOG_FILE)
+            with metrics.timer("ledger_load"):
+                self.storage = open_storage(
+                    STORAGE_BACKEND, DATA_FILE, TRANSACTION_LOG_FILE, REQUESTS_FILE, SQLITE_DB_FILE,
+                    checkpoint_every=LEDGER_CHECKPOINT_EVERY, fsync_every=JOURNAL_FSYNC_EVERY,
+                    commit_window=COMMIT_WINDOW, segment_bytes=LOG_SEGMENT_BYTES, rotate_monthly=LOG_ROTATE_MONTHLY,
+                )
+                self.service = BankService(
+                    self.storage, minimum_balance=MINIMUM_BALANCE, starting_balance=DEFAULT_STARTING_BALANCE,
+                    currency=CURRENCY,
+                )
+                # Load (or build) the journal index here too, not on the Tk thread at the first statement
+                self.storage.journal.open()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.perf_counter()
+            self.seconds = self.finished_at - start
+            self._done.set()
+
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """The BankService once the ledger is loaded (None if `timeout` runs out first)."""
+        if not self._done.wait(timeout):
+            return None
+        if self.error is not None:
+            raise self.error
+        return self.service
+
+
+# Arna and statement helpers, created on first use
+
+@functools.lru_cache(maxsize=None)
+def get_ollama_client():
+    from ollama_client import OllamaClient
+    return OllamaClient(
+        OLLAMA_API_URL, OLLAMA_MODEL,
+        connect_timeout=OLLAMA_CONNECT_TIMEOUT, read_timeout=OLLAMA_READ_TIMEOUT,
+        retries=OLLAMA_RETRIES, keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache():
+    from response_cache import ResponseCache
+    return ResponseCache(
+        max_entries=AI_CACHE_MAX_ENTRIES, ttl_seconds=AI_CACHE_TTL_SECONDS, file_path=AI_CACHE_FILE
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_statement_analytics(journal):
+    """Per-account statement figures, refreshed from the journal as new records arrive."""
+    from analytics import StatementAnalytics
+    return StatementAnalytics(journal)
+
+
+# Arna AI worker (runs off the Tk main thread)
+def stream_ollama_response(prompt, out_queue, cancel_event, cache_question=None):
+    """Streams an Ollama answer into out_queue as ("token", text) items.
+
+    Finishes with ("done", None) or ("error", message). Stops early when
+    cancel_event is set, e.g. because the chat window was closed. Per-request
+    timings are kept on get_ollama_client().last_latency. A complete answer
+    is stored in the response cache under cache_question, if one is given.
+    """
+    import requests # loaded with the Ollama client, on the first question for it
+    try:
+        tokens = []
+        for token in get_ollama_client().stream(prompt, cancel_event):
+            tokens.append(token)
+            out_queue.put(("token", token))
+        if cancel_event.is_set():
+            return
+        if not tokens:
+            out_queue.put(("token", "Sorry, I received an empty response."))
+        elif cache_question is not None:
+            get_response_cache().put(cache_question, OLLAMA_MODEL, "".join(tokens))
+        out_queue.put(("done", None))
+    except requests.exceptions.ConnectionError:
+        out_queue.put(("error", "**Connection Error.** Please ensure **Ollama is running**."))
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 404:
+            out_queue.put(("error", f"**Model Error (404).** The model **{OLLAMA_MODEL}** may not be installed."))
+        else:
+            out_queue.put(("error", f"An HTTP error occurred: {e}"))
+    except Exception as e:
+        out_queue.put(("error", f"An unexpected error occurred: {e}"))
+
+
+# Screens
+
+class ScreenManager:
+    """Builds each page once and shows the same widgets again on later visits.
+
+    Pages are frames sharing one cell of the root window, and only the
+    current one is mapped. show() calls a page's build function the first
+    time the page is asked for. Every time, it runs the page's refresh
+    function, which updates just the widgets that depend on the ledger
+    (balances, tables, form fields). Nothing is destroyed on navigation.
+    """
+
+    def __init__(self, root):
+        self.container = ttk.Frame(root)
+        self.container.pack(expand=True, fill="both")
+        self.container.grid_rowconfigure(0, weight=1)
+        self.container.grid_columnconfigure(0, weight=1)
+        self.current = None
+        self._pages = {}
+
+    def show(self, name, build, refresh=None):
+        """Refreshes and raises page `name`, building it with build() on first use."""
+        page = self._pages.get(name)
+        if page is None:
+            page = self._pages[name] = build()
+            metrics.count("ui_screens_built")
+        if refresh is not None:
+            refresh()
+        if page is not self.current:
+            if self.current is not None:
+                self.current.grid_remove()
+            page.grid(row=0, column=0, sticky="nsew", padx=50, pady=50)
+            self.current = page
+        return page
 
 
 # Main Application Class
@@ -84,20 +227,72 @@ class BankApp:
         self.root = root
         self.root.title("Apex Digital Bank")
         self.root.geometry("1100x900") 
-        self.data = load_data(DATA_FILE)
+        self.ledger = LedgerLoader()
+        self._ledger_waiting = False
         self.current_user = None
         self.current_acc_no = None
+        self.screens = ScreenManager(root)
+        self._forms = {} # page name -> its entry fields, emptied each time the page is shown
+        self.tree = None
+        self.requests_tree = None
+        self.history_cursor = None
+        self._history_loading = False
+        self.summary_queue = queue.Queue()
+        self._summary_generation = 0 # only the newest request's totals are shown
+        self._summary_polling = False
+        self._ai_poll_id = None # pending after() of the chat window's token loop
         
         self.show_login()
 
-    def clear_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    @property
+    def service(self):
+        return self.ledger.wait()
+
+    @property
+    def data(self):
+        return self.service.data
+
+    @property
+    def journal(self):
+        return self.service.storage.journal
+
+    @property
+    def statement_analytics(self):
+        return get_statement_analytics(self.journal)
+
+    def _when_ledger_loaded(self, callback):
+        """Runs callback now if the ledger is loaded, otherwise once the background load finishes.
+
+        The Tk loop keeps running meanwhile (with a busy cursor); repeated
+        clicks while waiting are ignored.
+        """
+        if not self.ledger.ready():
+            if not self._ledger_waiting:
+                self._ledger_waiting = True
+                self.root.config(cursor="watch")
+                self.root.after(LEDGER_POLL_INTERVAL_MS, self._poll_ledger, callback)
+            return
+        if self.ledger.error is not None:
+            messagebox.showerror("Storage Error", f"The ledger could not be opened:\n{self.ledger.error}")
+            return
+        callback()
+
+    def _poll_ledger(self, callback):
+        if not self.ledger.ready():
+            self.root.after(LEDGER_POLL_INTERVAL_MS, self._poll_ledger, callback)
+            return
+        self._ledger_waiting = False
+        self.root.config(cursor="")
+        self._when_ledger_loaded(callback)
+
+    def _show_bank_error(self, error):
+        """Shows a BankError raised by the service (declined PINs were already reported)."""
+        if not isinstance(error, AuthorizationDeclined):
+            messagebox.showerror(error.title, str(error))
 
     def setup_frame(self, title, back_command=None):
-        self.clear_screen()
-        frame = ttk.Frame(self.root, padding=40) 
-        frame.pack(expand=True, fill="both", padx=50, pady=50) 
+        """A new page frame with its title (and back button); ScreenManager places it."""
+        frame = ttk.Frame(self.screens.container, padding=40) 
 
         frame.grid_columnconfigure(0, weight=1)
         frame.grid_columnconfigure(1, weight=1)
@@ -125,9 +320,16 @@ class BankApp:
         entry.grid(row=row, column=1, pady=10, sticky="w", padx=10)
         return entry
 
+    def _clear_form(self, name):
+        for entry in self._forms[name]:
+            entry.delete(0, tk.END)
+
     # Login/Signup/Dashboard Methods
 
     def show_login(self):
+        self.screens.show("login", self._build_login, lambda: self._clear_form("login"))
+
+    def _build_login(self):
         frame = self.setup_frame("Access Your Account")
         
         center_frame = ttk.Frame(frame, padding=30)
@@ -144,21 +346,37 @@ class BankApp:
         ttk.Button(center_frame, text="Create New Account", bootstyle="info-outline", command=self.show_signup, padding=10).grid(
             row=3, column=0, columnspan=2, pady=10, sticky="ew"
         )
+        self._forms["login"] = [self.login_user, self.login_pass]
+        return frame
+
+    def logout(self):
+        """Ends the session and empties the cached pages that show account data."""
+        self.current_user = None
+        self.current_acc_no = None
+        self.history_cursor = None
+        for tree in (self.tree, self.requests_tree):
+            if tree is not None:
+                tree.delete(*tree.get_children())
+        self.show_login()
 
     def login(self):
+        self._when_ledger_loaded(self._login)
+
+    def _login(self):
         username = self.login_user.get()
         password = self.login_pass.get()
         
-        self.data = load_data(DATA_FILE) 
-
-        if username in self.data and self.data[username].get("password") == password:
-            self.current_user = username
-            self.current_acc_no = self.data[username].get("account_no")
-            self.show_dashboard()
-        else:
-            messagebox.showerror("Error", "Invalid username or password")
+        try:
+            self.current_acc_no = self.service.login(username, password)
+        except BankError as e:
+            self._show_bank_error(e); return
+        self.current_user = username
+        self.show_dashboard()
 
     def show_signup(self):
+        self.screens.show("signup", self._build_signup, lambda: self._clear_form("signup"))
+
+    def _build_signup(self):
         frame = self.setup_frame("New User Registration", back_command=self.show_login)
 
         center_frame = ttk.Frame(frame, padding=30)
@@ -173,39 +391,36 @@ class BankApp:
         ttk.Button(center_frame, text="REGISTER", bootstyle="success", command=self.signup, padding=12).grid(
             row=3, column=0, columnspan=2, pady=(30, 15), sticky="ew"
         )
+        self._forms["signup"] = [self.signup_user, self.signup_pass, self.signup_pin]
+        return frame
 
     def signup(self):
+        self._when_ledger_loaded(self._signup)
+
+    def _signup(self):
         username = self.signup_user.get()
         password = self.signup_pass.get()
         pin = self.signup_pin.get()
 
-        if username in self.data:
-            messagebox.showerror("Error", "Username already exists!")
-            return
-        if not pin.isdigit() or len(pin) != 4:
-            messagebox.showerror("Error", "PIN must be exactly 4 digits")
-            return
-
-        acc_no = generate_account_number(self.data)
-        self.data[username] = {
-            "password": password, "pin": pin, 
-            "balance": DEFAULT_STARTING_BALANCE, "account_no": acc_no
-        }
-        save_data(self.data, DATA_FILE)
+        try:
+            acc_no = self.service.signup(username, password, pin)
+        except BankError as e:
+            self._show_bank_error(e); return
         messagebox.showinfo("Success", f"Account created!\nAccount No: {acc_no}")
         self.show_login()
 
+    @metrics.timed("ui_dashboard")
     def show_dashboard(self):
-        frame = self.setup_frame("Account Dashboard")
-        
         # Refresh data
-        self.data = load_data(DATA_FILE)
+        self.service.reload()
         if self.current_user not in self.data:
             messagebox.showerror("Error", "User data not found. Logging out.")
-            self.show_login()
+            self.logout()
             return
-            
-        balance = self.data[self.current_user].get("balance", 0)
+        self.screens.show("dashboard", self._build_dashboard, self._refresh_dashboard)
+
+    def _build_dashboard(self):
+        frame = self.setup_frame("Account Dashboard")
         
         frame.grid_columnconfigure(0, weight=3)
         frame.grid_columnconfigure(1, weight=2)
@@ -216,12 +431,10 @@ class BankApp:
         details_frame.grid_columnconfigure(1, weight=1)
 
         # Labels will now be visible on dark theme
-        ttk.Label(details_frame, text=f"Welcome, {self.current_user}", font=("Arial", 18, "bold")).grid(
-            row=0, column=0, columnspan=2, pady=(0, 10), sticky="w"
-        )
-        ttk.Label(details_frame, text=f"Account No: {self.current_acc_no}", font=("Arial", 14)).grid(
-            row=1, column=0, columnspan=2, pady=5, sticky="w"
-        )
+        self.welcome_label = ttk.Label(details_frame, font=("Arial", 18, "bold"))
+        self.welcome_label.grid(row=0, column=0, columnspan=2, pady=(0, 10), sticky="w")
+        self.account_label = ttk.Label(details_frame, font=("Arial", 14))
+        self.account_label.grid(row=1, column=0, columnspan=2, pady=5, sticky="w")
         ttk.Separator(details_frame, bootstyle="light").grid(row=2, column=0, columnspan=2, sticky="ew", pady=20)
 
         ttk.Label(details_frame, text="Current Balance", font=("Arial", 16, "bold")).grid(
@@ -229,7 +442,6 @@ class BankApp:
         )
         self.balance_label = ttk.Label(
             details_frame, 
-            text=self._format_currency(balance), 
             font=("Arial", 22, "bold"), 
             bootstyle="success" 
         )
@@ -258,26 +470,16 @@ class BankApp:
             )
             button_row += 1
             
-        
-        all_requests = load_data(REQUESTS_FILE)
-        pending_for_me = []
-        if isinstance(all_requests, dict):
-            pending_for_me = [
-                req for req in all_requests.values() 
-                if req.get('source_acc_no') == self.current_acc_no and req.get('status') == 'pending'
-            ]
-        
-        if pending_for_me:
-            ttk.Separator(buttons_frame).grid(row=button_row, column=0, sticky="ew", pady=15)
-            button_row += 1
-            
-            ttk.Button(
-                buttons_frame, 
-                text=f"Pending Requests ({len(pending_for_me)})", 
-                bootstyle="danger", 
-                command=self.show_pending_requests_page, 
-                padding=12
-            ).grid(row=button_row, column=0, pady=10, sticky="ew")
+        # Shown by _refresh_dashboard only while the user has pending requests
+        self.pending_separator = ttk.Separator(buttons_frame)
+        self.pending_separator.grid(row=button_row, column=0, sticky="ew", pady=15)
+        self.pending_button = ttk.Button(
+            buttons_frame, 
+            bootstyle="danger", 
+            command=self.show_pending_requests_page, 
+            padding=12
+        )
+        self.pending_button.grid(row=button_row + 1, column=0, pady=10, sticky="ew")
 
             
         # Bottom Frame (Logout and AI Assistant)
@@ -290,31 +492,53 @@ class BankApp:
             row=0, column=0, padx=10, sticky="ew"
         )
         
-        ttk.Button(bottom_frame, text="Logout", bootstyle="danger", command=self.show_login, padding=12).grid(
+        ttk.Button(bottom_frame, text="Logout", bootstyle="danger", command=self.logout, padding=12).grid(
             row=0, column=1, padx=10, sticky="ew"
         )
+        return frame
+
+    def _refresh_dashboard(self):
+        self.welcome_label.config(text=f"Welcome, {self.current_user}")
+        self.account_label.config(text=f"Account No: {self.current_acc_no}")
+        self._update_balance_display()
+
+        pending_count = self.service.pending_count(self.current_user)
+        if pending_count:
+            self.pending_button.config(text=f"Pending Requests ({pending_count})")
+            self.pending_separator.grid()
+            self.pending_button.grid()
+        else:
+            self.pending_separator.grid_remove()
+            self.pending_button.grid_remove()
 
 
     # Transaction History / Statements
+    @metrics.timed("ui_statements")
     def show_statements_page(self):
+        self.screens.show("statements", self._build_statements_page, self._refresh_statements_page)
+
+    def _build_statements_page(self):
         frame = self.setup_frame("Transaction History", back_command=self.show_dashboard)
         
-        all_logs = load_data(TRANSACTION_LOG_FILE)
-        if not isinstance(all_logs, list):
-            all_logs = []
-            
-        user_logs = [log for log in all_logs if log.get('account_no') == self.current_acc_no]
+        self.history_empty_label = ttk.Label(frame, text="No transactions recorded yet.", font=("Arial", 14))
+        self.history_empty_label.grid(row=2, column=0, columnspan=2, pady=50, sticky="n")
+
+        # Totals panel above the history table; _show_statement_summary fills in as many columns as it needs
+        self.summary_panel = ttk.Frame(frame, padding=15, bootstyle="secondary-toolwindow")
+        self.summary_panel.grid(row=2, column=0, columnspan=2, padx=20, sticky="ew")
+        self.summary_labels = []
+        for column in range(5):
+            name_label = ttk.Label(self.summary_panel, font=("Arial", 10))
+            name_label.grid(row=0, column=column, sticky="w", padx=10)
+            value_label = ttk.Label(self.summary_panel, font=("Arial", 12, "bold"))
+            value_label.grid(row=1, column=column, sticky="w", padx=10)
+            self.summary_labels.append((name_label, value_label))
+
+        self.history_table = ttk.Frame(frame)
+        table_frame = self.history_table
+        table_frame.grid(row=3, column=0, columnspan=2, padx=20, pady=20, sticky="nsew")
         
-        if not user_logs:
-            ttk.Label(frame, text="No transactions recorded yet.", font=("Arial", 14)).grid(
-                row=2, column=0, columnspan=2, pady=50, sticky="n"
-            )
-            return
-
-        table_frame = ttk.Frame(frame)
-        table_frame.grid(row=2, column=0, columnspan=2, padx=20, pady=20, sticky="nsew")
-        
-        frame.grid_rowconfigure(2, weight=1)
+        frame.grid_rowconfigure(3, weight=1)
         table_frame.grid_columnconfigure(0, weight=1)
 
         columns = ("#1", "#2", "#3", "#4", "#5")
@@ -334,7 +558,113 @@ class BankApp:
         self.tree.column("#4", width=150, anchor=tk.CENTER)
         self.tree.column("#5", width=80, anchor=tk.CENTER)
 
-        for log in reversed(user_logs):
+        self.tree.tag_configure('danger', foreground='red', font=('Arial', 10, 'bold'))
+        self.tree.tag_configure('success', foreground='green', font=('Arial', 10, 'bold'))
+
+        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: self._on_history_scroll(vsb, first, last))
+        
+        self.tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+
+        self.load_more_button = ttk.Button(
+            frame, text="Load More", bootstyle="secondary-outline", command=self._load_more_history
+        )
+        self.load_more_button.grid(row=4, column=0, pady=(0, 10), padx=10, sticky="e")
+        self.export_button = ttk.Button(
+            frame, text="Export Statement", bootstyle="info-outline", command=self.export_statement
+        )
+        self.export_button.grid(row=4, column=1, pady=(0, 10), padx=10, sticky="w")
+        return frame
+
+    def _refresh_statements_page(self):
+        # Rows are pulled a page at a time, newest first, as the user scrolls
+        self.history_cursor = self.journal.cursor(self.current_acc_no)
+        first_page = self.history_cursor.next_page(HISTORY_PAGE_SIZE)
+        self.tree.delete(*self.tree.get_children())
+        self._history_loading = False
+        
+        history_widgets = (self.summary_panel, self.history_table, self.load_more_button, self.export_button)
+        if not first_page:
+            self.history_empty_label.grid()
+            for widget in history_widgets:
+                widget.grid_remove()
+            return
+        self.history_empty_label.grid_remove()
+        for widget in history_widgets:
+            widget.grid()
+
+        self._show_summary_figures([("Summary", "Calculating...")])
+        self.load_more_button.config(text="Load More", state="normal")
+        self._insert_history_rows(first_page)
+        self.tree.yview_moveto(0)
+        self._start_statement_summary()
+
+    def _start_statement_summary(self):
+        """Works out the totals panel on a worker thread; the first scan of a long history takes a while."""
+        self._summary_generation += 1
+        args = (self.statement_analytics, self._summary_generation, self.current_acc_no,
+                self.data[self.current_user].get("balance", 0))
+        threading.Thread(target=self._compute_statement_summary, args=args, name="statement-summary",
+                         daemon=True).start()
+        if not self._summary_polling:
+            self._summary_polling = True
+            self.root.after(SUMMARY_POLL_INTERVAL_MS, self._poll_statement_summary)
+
+    def _compute_statement_summary(self, statement_analytics, generation, acc_no, balance):
+        try:
+            result = statement_analytics.summary(acc_no, balance)
+        except Exception as e:
+            result = e
+        self.summary_queue.put((generation, result))
+
+    def _poll_statement_summary(self):
+        """Shows the newest summary once its worker finishes; results for an earlier refresh are dropped."""
+        while True:
+            try:
+                generation, result = self.summary_queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._summary_generation:
+                self._summary_polling = False
+                if isinstance(result, Exception):
+                    self._show_summary_figures([("Summary", "Unavailable")])
+                else:
+                    self._show_statement_summary(result)
+                return
+        self.root.after(SUMMARY_POLL_INTERVAL_MS, self._poll_statement_summary)
+
+    def _show_statement_summary(self, summary):
+        """Fills the totals panel above the history table."""
+        figures = [
+            ("Money In", self._format_currency(summary["in"])),
+            ("Money Out", self._format_currency(summary["out"])),
+        ]
+        latest_month = summary["latest_month"]
+        if latest_month:
+            figures.append((f"Net {latest_month['month']}", self._format_currency(latest_month["net"])))
+        figures.append(("Lowest Balance", self._format_currency(summary["lowest_balance"])))
+        top = summary["top_counterparty"]
+        if top:
+            figures.append(("Top Counterparty", f"{top['acc_no']} ({top['count']} transfers)"))
+        self._show_summary_figures(figures)
+
+    def _show_summary_figures(self, figures):
+        for column, (name_label, value_label) in enumerate(self.summary_labels):
+            shown = column < len(figures)
+            self.summary_panel.grid_columnconfigure(column, weight=1 if shown else 0)
+            if shown:
+                label, value = figures[column]
+                name_label.config(text=label)
+                value_label.config(text=value)
+                name_label.grid()
+                value_label.grid()
+            else:
+                name_label.grid_remove()
+                value_label.grid_remove()
+
+    def _insert_history_rows(self, logs):
+        for log in logs:
             amount = log.get('amount', 0)
             amount_display = self._format_currency(abs(amount))
             log_type = log.get('type')
@@ -354,22 +684,70 @@ class BankApp:
                 tags=(tag,)
             )
 
-        self.tree.tag_configure('danger', foreground='red', font=('Arial', 10, 'bold'))
-        self.tree.tag_configure('success', foreground='green', font=('Arial', 10, 'bold'))
+        if not self.history_cursor.has_more():
+            self.load_more_button.config(text="End of history", state="disabled")
 
-        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vsb.set)
-        
-        self.tree.pack(side="left", fill="both", expand=True)
-        vsb.pack(side="right", fill="y")
+    def export_statement(self):
+        """Saves the account's records in a date range as CSV or JSON Lines."""
+        start = simpledialog.askstring("Export Statement", "From date (YYYY-MM-DD), blank for the beginning:")
+        if start is None:
+            return
+        end = simpledialog.askstring("Export Statement", "To date (YYYY-MM-DD), blank for today:")
+        if end is None:
+            return
+        try:
+            # Normalised to zero-padded YYYY-MM-DD, which the exporter compares as text
+            start, end = (datetime.datetime.strptime(value.strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+                          if value.strip() else None for value in (start, end))
+        except ValueError:
+            messagebox.showerror("Export Statement", "Dates must be real dates written as YYYY-MM-DD.")
+            return
+        if start and end and start > end:
+            messagebox.showerror("Export Statement", "The From date must not be after the To date.")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Save Statement", defaultextension=".csv",
+            initialfile=f"statement_{self.current_acc_no}.csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")],
+        )
+        if not path:
+            return
+        fmt = "jsonl" if path.lower().endswith(".jsonl") else "csv"
+        import statement_export # loaded on first export
+        try:
+            with metrics.timer("statement_export"):
+                count = statement_export.export_account(
+                    self.journal, self.current_acc_no, path, fmt, start, end
+                )
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e))
+            return
+        messagebox.showinfo("Statement Exported", f"{count} transactions saved to {path}")
+
+    def _load_more_history(self):
+        self._history_loading = False
+        if self.history_cursor is not None and self.history_cursor.has_more():
+            self._insert_history_rows(self.history_cursor.next_page(HISTORY_PAGE_SIZE))
+
+    def _on_history_scroll(self, scrollbar, first, last):
+        """Keeps the scrollbar in sync and fetches the next page near the bottom."""
+        scrollbar.set(first, last)
+        if (float(last) >= 0.95 and not self._history_loading
+                and self.history_cursor is not None and self.history_cursor.has_more()):
+            self._history_loading = True
+            self.root.after_idle(self._load_more_history)
         
     # AI Assistant Methods (Live Ollama Integration)
     def open_ai_assistant(self):
         """Opens a new window for the AI Assistant chat."""
+        self._cancel_ai_poll()
         self.ai_window = ttk.Toplevel(self.root) 
         self.ai_window.title("AI Assistant Arna")
         self.ai_window.geometry("500x600")
         self.ai_window.grab_set() 
+        self.ai_window.protocol("WM_DELETE_WINDOW", self._close_ai_assistant)
+        self.ai_queue = queue.Queue()
+        self.ai_cancel = None
 
         ttk.Label(self.ai_window, text="Arna chatbot!", font=("Arial", 16, "bold")).pack(pady=20)
         
@@ -383,10 +761,23 @@ class BankApp:
         self.chat_input.pack(side=tk.LEFT, fill="x", expand=True, padx=(0, 10))
         self.chat_input.bind("<Return>", lambda event: self._ai_placeholder_response())
         
-        ttk.Button(input_frame, text="Send", command=self._ai_placeholder_response, bootstyle="info").pack(side=tk.RIGHT)
+        self.chat_send_button = ttk.Button(input_frame, text="Send", command=self._ai_placeholder_response, bootstyle="info")
+        self.chat_send_button.pack(side=tk.RIGHT)
         
         self._append_message(f"Arna: Hello Myself Arna! I am your banking AI Assistant . Try asking me for your 'balance', your 'last transactions', or a general question like 'What is compound interest?'", "white")
 
+    def _close_ai_assistant(self):
+        """Cancels any in-flight Ollama generation and closes the chat window."""
+        if self.ai_cancel is not None:
+            self.ai_cancel.set()
+        self._cancel_ai_poll()
+        self.ai_window.destroy()
+
+    def _cancel_ai_poll(self):
+        if self._ai_poll_id is not None:
+            self.root.after_cancel(self._ai_poll_id)
+            self._ai_poll_id = None
+
     def _append_message(self, message, color):
         self.chat_display.config(state='normal')
         tag_name = f"tag_{color}"
@@ -399,26 +790,81 @@ class BankApp:
         self.chat_display.see(tk.END)
         self.chat_display.config(state='disabled')
 
+    def _append_stream_text(self, text, color="white"):
+        """Appends streamed text to the current chat line without a newline."""
+        self.chat_display.config(state='normal')
+        self.chat_display.tag_config(f"tag_{color}", foreground=color)
+        self.chat_display.insert(tk.END, text, f"tag_{color}")
+        self.chat_display.see(tk.END)
+        self.chat_display.config(state='disabled')
+
     def _ai_placeholder_response(self):
         user_message = self.chat_input.get()
         if not user_message.strip():
             return
+        if self.ai_cancel is not None:
+            return # Arna is still answering the previous question
         
         self.chat_input.delete(0, tk.END)
         self._append_message(f"You: {user_message}", "yellow")
         self.root.after(100, lambda: self._generate_ai_response(user_message))
 
-    def _get_user_logs(self):
-        all_logs = load_data(TRANSACTION_LOG_FILE)
-        if not isinstance(all_logs, list): all_logs = []
-        user_logs = [log for log in all_logs if log.get('account_no') == self.current_acc_no]
-        return list(reversed(user_logs))
+    def _get_user_logs(self, limit=None):
+        """Returns the current user's log entries, newest first."""
+        return list(itertools.islice(self.journal.iter_account(self.current_acc_no), limit))
+
+    def _analytics_response(self, message):
+        """Answers spending, largest-transfer and counterparty questions from the statement analytics.
+
+        Returns None (so the question goes to the LLM) unless it is about
+        the user's own account or is one of ARNA_ANALYTICS_COMMANDS.
+        """
+        command = message.strip().rstrip("?!. ")
+        if command not in ARNA_ANALYTICS_COMMANDS and not ARNA_ACCOUNT_WORDS.search(message):
+            return None
+        acc_no = self.current_acc_no
+        if any(word in message for word in ["largest", "biggest"]):
+            largest = self.statement_analytics.largest_transfers(acc_no, 3)
+            if not largest:
+                return "Arna: There are no transactions on this account yet."
+            response = "Arna: Your **largest transactions** were:\n"
+            for log in largest:
+                target = f" with {log['target_acc_no']}" if log["target_acc_no"] else ""
+                response += (f"  - {log['timestamp'].split(' ')[0]}: {self._format_currency(abs(log['amount']))} "
+                             f"({log['type']}{target})\n")
+            return response
+
+        if any(phrase in message for phrase in ["who do i", "counterpart", "top contact", "sent the most"]):
+            parties = self.statement_analytics.counterparties(acc_no, 3)
+            if not parties:
+                return "Arna: You have not sent money to or received money from another account yet."
+            response = "Arna: The accounts you deal with most:\n"
+            for party in parties:
+                response += (f"  - {party['acc_no']}: sent {self._format_currency(party['sent'])}, "
+                             f"received {self._format_currency(party['received'])} ({party['count']} transfers)\n")
+            return response
+
+        if any(word in message for word in ["spend", "spent", "monthly", "this month", "summary"]):
+            months = self.statement_analytics.monthly_totals(acc_no)
+            if not months:
+                return "Arna: There are no transactions on this account yet."
+            response = "Arna: Your **monthly summary** (most recent first):\n"
+            for month in reversed(months[-3:]):
+                response += (f"  - {month['month']}: in {self._format_currency(month['in'])}, "
+                             f"out {self._format_currency(month['out'])}, net {self._format_currency(month['net'])}\n")
+            return response
+        return None
 
     def _generate_ai_response(self, user_message):
         message = user_message.lower()
         response = ""
         
         # 1. Internal Banking Queries
+        analytics_response = self._analytics_response(message)
+        if analytics_response:
+            self._append_message(analytics_response, "white")
+            return
+
         if "balance" in message or "money" in message and not any(word in message for word in ["send", "deposit", "withdraw"]):
             balance = self._format_currency(self.data[self.current_user].get('balance', 0))
             response = f"Arna: Your current balance is {balance}. For security, I cannot execute transfers."
@@ -426,7 +872,7 @@ class BankApp:
             return
 
         elif "history" in message or "transactions" in message or "statement" in message or "past activity" in message:
-            recent_logs = self._get_user_logs()
+            recent_logs = self._get_user_logs(limit=3)
             
             if not recent_logs:
                 response = "Arna: I checked the logs, and there is no transaction history recorded for this account yet."
@@ -439,6 +885,10 @@ class BankApp:
                     amount = self._format_currency(abs(log.get('amount', 0)))
                     action = "sent/withdrawn" if log.get('amount', 0) < 0 or log.get('type') in ["Withdrawal", "Send", "Send (Request)"] else "received/deposited"
                     response += f"  - {log.get('timestamp', 'N/A').split(' ')[0]}: {amount} {action} ({log.get('type', 'N/A')})\n"
+                latest_month = self.statement_analytics.monthly_totals(self.current_acc_no)[-1]
+                response += (f"In {latest_month['month']} you received {self._format_currency(latest_month['in'])} "
+                             f"and spent {self._format_currency(latest_month['out'])} "
+                             f"over {latest_month['count']} transactions.")
             self._append_message(response, "white")
             return
             
@@ -447,25 +897,51 @@ class BankApp:
              self._append_message(response, "red")
              return
 
-        # 2. General Finance Questions (Ollama API Call)
-        try:
-            prompt = f"You are a helpful banking assistant. Answer the user's question concisely. Question: {user_message}"
-            payload = {"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}
-            api_response = requests.post(OLLAMA_API_URL, json=payload, timeout=30)
-            api_response.raise_for_status() 
-            response_data = api_response.json()
-            response = f"Arna: {response_data.get('response', 'Sorry, I received an empty response.')}"
-        except requests.exceptions.ConnectionError:
-            response = f"Arna: **Connection Error.** Please ensure **Ollama is running**."
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                 response = f"Arna: **Model Error (404).** The model **{OLLAMA_MODEL}** may not be installed."
-            else:
-                response = f"Arna: An HTTP error occurred: {e}"
-        except Exception as e:
-            response = f"Arna: An unexpected error occurred: {e}"
+        # 2. General Finance Questions (streamed from Ollama on a worker thread)
+        # Only these general answers are cached; the account-specific ones above never are
+        cached_answer = get_response_cache().get(user_message, OLLAMA_MODEL)
+        metrics.count("arna_cache_misses" if cached_answer is None else "arna_cache_hits")
+        if cached_answer is not None:
+            self._append_message(f"Arna: {cached_answer}", "white")
+            return
 
-        self._append_message(response, "white")
+        prompt = f"You are a helpful banking assistant. Answer the user's question concisely. Question: {user_message}"
+        self.ai_cancel = threading.Event()
+        self.chat_input.config(state='disabled')
+        self.chat_send_button.config(state='disabled')
+        self._append_stream_text("Arna: ")
+        threading.Thread(
+            target=stream_ollama_response, args=(prompt, self.ai_queue, self.ai_cancel, user_message), daemon=True
+        ).start()
+        self._cancel_ai_poll()
+        self._ai_poll_id = self.root.after(AI_POLL_INTERVAL_MS, self._poll_ai_queue)
+
+    def _poll_ai_queue(self):
+        """Drains tokens produced by the Ollama worker into the chat window."""
+        self._ai_poll_id = None
+        if not self.ai_window.winfo_exists():
+            return
+        finished = False
+        while True:
+            try:
+                kind, text = self.ai_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "token":
+                self._append_stream_text(text)
+            else:
+                if kind == "error":
+                    self._append_stream_text(text)
+                self._append_stream_text("\n")
+                finished = True
+                break
+
+        if finished:
+            self.ai_cancel = None
+            self.chat_input.config(state='normal')
+            self.chat_send_button.config(state='normal')
+        else:
+            self._ai_poll_id = self.root.after(AI_POLL_INTERVAL_MS, self._poll_ai_queue)
         
     # Helper Methods for Transactions
 
@@ -477,7 +953,7 @@ class BankApp:
             pass 
 
     def _format_currency(self, amount):
-        return f"{CURRENCY} {amount:,.2f}" 
+        return format_currency(amount, CURRENCY)
 
     def _get_wealth_message(self, balance):
         for threshold, message in WEALTH_TIERS:
@@ -500,7 +976,15 @@ class BankApp:
         messagebox.showinfo(title, full_message)
         self._update_balance_display()
 
-    def _create_transaction_page(self, title, entry_labels, callback, button_style="primary"):
+    def _show_transaction_page(self, title, entry_labels, callback, button_style="primary"):
+        """Shows the form page `title` (built on first use) with its fields emptied."""
+        self.screens.show(
+            title,
+            lambda: self._build_transaction_page(title, entry_labels, callback, button_style),
+            lambda: self._clear_form(title),
+        )
+
+    def _build_transaction_page(self, title, entry_labels, callback, button_style):
         frame = self.setup_frame(title, back_command=self.show_dashboard)
         
         center_frame = ttk.Frame(frame, padding=30)
@@ -515,49 +999,45 @@ class BankApp:
         ttk.Button(center_frame, text=f"Confirm {title.split(' ')[0]}", bootstyle=button_style, command=lambda: callback(entries), padding=12).grid(
             row=len(entry_labels), column=0, columnspan=2, pady=30, sticky="ew"
         )
+        self._forms[title] = list(entries.values())
+        return frame
         
     # Transaction logic
 
     def show_deposit_page(self):
-        self._create_transaction_page("Deposit Funds", ["Amount to Deposit:"], self.deposit, "success")
+        self._show_transaction_page("Deposit Funds", ["Amount to Deposit:"], self.deposit, "success")
 
     def deposit(self, entries):
         try: amount = int(entries["Amount to Deposit:"].get())
         except ValueError: messagebox.showerror("Error", "Enter a valid integer amount."); return
-        if amount <= 0: messagebox.showerror("Error", "Deposit must be greater than zero"); return
-        if not self._verify_pin("Enter PIN for Deposit", self.data[self.current_user].get("pin")): return
-            
-        self.data[self.current_user]["balance"] += amount
-        save_data(self.data, DATA_FILE)
-        log_transaction(self.current_acc_no, "Deposit", amount, "Success")
+        try:
+            self.service.deposit(self.current_user, amount, authorize=lambda: self._verify_pin(
+                "Enter PIN for Deposit", self.data[self.current_user].get("pin")))
+        except BankError as e:
+            self._show_bank_error(e); return
+
         base_message = f"Deposit Successful! Amount: {self._format_currency(amount)}"
         self._handle_transaction_result("Success", base_message)
         self.show_dashboard()
 
     def show_withdraw_page(self):
-        self._create_transaction_page("Withdraw Funds", ["Amount to Withdraw:"], self.withdraw, "primary")
+        self._show_transaction_page("Withdraw Funds", ["Amount to Withdraw:"], self.withdraw, "primary")
 
     def withdraw(self, entries):
         try: amount = int(entries["Amount to Withdraw:"].get())
         except ValueError: messagebox.showerror("Error", "Enter a valid integer amount."); return
-        user_data = self.data[self.current_user]
-        current_balance = user_data.get("balance", 0)
-        
-        if amount <= 0: messagebox.showerror("Failed", "Withdrawal must be positive."); return
-        if not self._verify_pin("Enter PIN for Withdrawal", user_data.get("pin")): return
-        if amount > current_balance: messagebox.showerror("Failed", "Amount exceeds balance."); return
-        if current_balance - amount < MINIMUM_BALANCE: 
-            messagebox.showerror("Failed", f"Minimum balance {self._format_currency(MINIMUM_BALANCE)} required."); return
-
-        user_data["balance"] -= amount
-        save_data(self.data, DATA_FILE)
-        log_transaction(self.current_acc_no, "Withdrawal", amount * -1, "Success")
+        try:
+            self.service.withdraw(self.current_user, amount, authorize=lambda: self._verify_pin(
+                "Enter PIN for Withdrawal", self.data[self.current_user].get("pin")))
+        except BankError as e:
+            self._show_bank_error(e); return
+
         base_message = f"Withdrawal Successful! Amount: {self._format_currency(amount)}"
         self._handle_transaction_result("Success", base_message)
         self.show_dashboard()
         
     def show_send_money_page(self):
-        self._create_transaction_page(
+        self._show_transaction_page(
             "Send Funds (Push)", 
             ["Recipient Account No:", "Amount to Send:"], 
             self.send_money, 
@@ -569,24 +1049,11 @@ class BankApp:
         try: amount = int(entries["Amount to Send:"].get())
         except ValueError: messagebox.showerror("Error", "Enter a valid integer amount."); return
 
-        target_user = next((u for u, d in self.data.items() if d.get("account_no") == target_acc_no), None)
-        user_data = self.data[self.current_user]
-        current_balance = user_data.get("balance", 0)
-
-        if amount <= 0: messagebox.showerror("Error", "Amount must be positive."); return
-        if not target_user: messagebox.showerror("Error", "Recipient Account not found."); return
-        if target_user == self.current_user: messagebox.showerror("Error", "Cannot send to self."); return
-        if not self._verify_pin("Enter PIN to Authorize Send", user_data.get("pin")): return
-        if amount > current_balance: messagebox.showerror("Failed", "Amount exceeds your balance."); return
-        if current_balance - amount < MINIMUM_BALANCE: 
-            messagebox.showerror("Failed", f"Maintain minimum balance of {self._format_currency(MINIMUM_BALANCE)}."); return
-
-        self.data[target_user]["balance"] += amount
-        user_data["balance"] -= amount
-        save_data(self.data, DATA_FILE)
-        
-        log_transaction(self.current_acc_no, "Send", amount * -1, "Success", target_acc_no)
-        log_transaction(target_acc_no, "Receive (Send)", amount, "Success", self.current_acc_no)
+        try:
+            target_user = self.service.send(self.current_user, target_acc_no, amount, authorize=lambda: self._verify_pin(
+                "Enter PIN to Authorize Send", self.data[self.current_user].get("pin")))
+        except BankError as e:
+            self._show_bank_error(e); return
         
         base_message = f"Sent {self._format_currency(amount)} to {target_user} (Acc No: {target_acc_no})."
         self._handle_transaction_result("Success", base_message)
@@ -596,7 +1063,7 @@ class BankApp:
     
     def show_request_money_page(self):
         """Shows the page for *creating* a money request."""
-        self._create_transaction_page(
+        self._show_transaction_page(
             "Request Funds (Pull)", 
             ["Source Account No:", "Amount to Request:"], 
             self.create_money_request, 
@@ -609,61 +1076,30 @@ class BankApp:
         try: amount = int(entries["Amount to Request:"].get())
         except ValueError: messagebox.showerror("Error", "Enter a valid integer amount."); return
 
-        source_user_item = next(((u, d) for u, d in self.data.items() if d.get("account_no") == source_acc_no), None)
-
-        if not source_user_item:
-            messagebox.showerror("Error", "Source Account not found."); return
-            
-        source_user, source_data = source_user_item
-
-        if amount <= 0: messagebox.showerror("Error", "Amount must be positive."); return
-        if source_user == self.current_user: messagebox.showerror("Error", "Cannot request from self."); return
-
-        all_requests = load_data(REQUESTS_FILE)
-        if not isinstance(all_requests, dict):
-            all_requests = {}
-        
-        new_req_id = generate_request_id(all_requests)
-        
-        new_request = {
-            "request_id": new_req_id,
-            "requester_acc_no": self.current_acc_no,
-            "requester_username": self.current_user,
-            "source_acc_no": source_acc_no,
-            "source_username": source_user,
-            "amount": amount,
-            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "status": "pending" 
-        }
-        
-        all_requests[new_req_id] = new_request
-        save_data(all_requests, REQUESTS_FILE)
+        try:
+            new_request = self.service.create_request(self.current_user, source_acc_no, amount)
+        except BankError as e:
+            self._show_bank_error(e); return
         
-        messagebox.showinfo("Request Sent", f"Your request for {self._format_currency(amount)} has been sent to {source_user}. They will be notified when they log in.")
+        messagebox.showinfo("Request Sent", f"Your request for {self._format_currency(amount)} has been sent to {new_request['source_username']}. They will be notified when they log in.")
         self.show_dashboard()
         
 
     # Page and Functions for  Approving Requests
 
+    @metrics.timed("ui_pending_requests")
     def show_pending_requests_page(self):
         """Displays all pending requests for the current user."""
+        self.screens.show("pending_requests", self._build_pending_requests_page, self._refresh_pending_requests_page)
+
+    def _build_pending_requests_page(self):
         frame = self.setup_frame("Pending Money Requests", back_command=self.show_dashboard)
         
-        self.all_requests = load_data(REQUESTS_FILE)
-        if not isinstance(self.all_requests, dict): self.all_requests = {}
-        
-        self.pending_list = [
-            req for req in self.all_requests.values() 
-            if req.get('source_acc_no') == self.current_acc_no and req.get('status') == 'pending'
-        ]
-        
-        if not self.pending_list:
-            ttk.Label(frame, text="You have no pending requests.", font=("Arial", 14)).grid(
-                row=2, column=0, columnspan=2, pady=50, sticky="n"
-            )
-            return
+        self.requests_empty_label = ttk.Label(frame, text="You have no pending requests.", font=("Arial", 14))
+        self.requests_empty_label.grid(row=2, column=0, columnspan=2, pady=50, sticky="n")
 
-        table_frame = ttk.Frame(frame)
+        self.requests_table = ttk.Frame(frame)
+        table_frame = self.requests_table
         table_frame.grid(row=2, column=0, columnspan=2, padx=20, pady=20, sticky="nsew")
         frame.grid_rowconfigure(2, weight=1)
         table_frame.grid_columnconfigure(0, weight=1)
@@ -680,6 +1116,31 @@ class BankApp:
         self.requests_tree.column("#2", width=150, anchor=tk.W)
         self.requests_tree.column("#3", width=120, anchor=tk.E)
 
+        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.requests_tree.yview)
+        self.requests_tree.configure(yscrollcommand=vsb.set)
+        self.requests_tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+        
+        self.requests_buttons = ttk.Frame(frame)
+        self.requests_buttons.grid(row=3, column=0, columnspan=2, pady=20)
+        
+        ttk.Button(self.requests_buttons, text="Approve Selected", bootstyle="success", command=self.approve_request).pack(side=tk.LEFT, padx=20)
+        ttk.Button(self.requests_buttons, text="Deny Selected", bootstyle="danger", command=self.deny_request).pack(side=tk.LEFT, padx=20)
+        return frame
+
+    def _refresh_pending_requests_page(self):
+        self.pending_list = self.service.pending_requests(self.current_user)
+        self.requests_tree.delete(*self.requests_tree.get_children())
+        
+        if not self.pending_list:
+            self.requests_empty_label.grid()
+            self.requests_table.grid_remove()
+            self.requests_buttons.grid_remove()
+            return
+        self.requests_empty_label.grid_remove()
+        self.requests_table.grid()
+        self.requests_buttons.grid()
+
         for req in self.pending_list:
             self.requests_tree.insert(
                 "", tk.END, iid=req.get('request_id', 'N/A'),
@@ -690,17 +1151,6 @@ class BankApp:
                 )
             )
 
-        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.requests_tree.yview)
-        self.requests_tree.configure(yscrollcommand=vsb.set)
-        self.requests_tree.pack(side="left", fill="both", expand=True)
-        vsb.pack(side="right", fill="y")
-        
-        button_frame = ttk.Frame(frame)
-        button_frame.grid(row=3, column=0, columnspan=2, pady=20)
-        
-        ttk.Button(button_frame, text="Approve Selected", bootstyle="success", command=self.approve_request).pack(side=tk.LEFT, padx=20)
-        ttk.Button(button_frame, text="Deny Selected", bootstyle="danger", command=self.deny_request).pack(side=tk.LEFT, padx=20)
-
     def approve_request(self):
         """Handles the logic for approving a selected money request."""
         try:
@@ -709,39 +1159,14 @@ class BankApp:
             messagebox.showerror("Error", "Please select a request to approve.")
             return
 
-        request = self.all_requests.get(selected_id)
-        if not request:
-            messagebox.showerror("Error", "Could not find the selected request. It may be outdated."); return
-            
-        amount = request.get('amount', 0)
-        
-        user_data = self.data[self.current_user]
-        current_balance = user_data.get("balance", 0)
-        
-        if amount > current_balance:
-            messagebox.showerror("Failed", "You do not have sufficient funds to approve this request."); return
-        if current_balance - amount < MINIMUM_BALANCE: 
-            messagebox.showerror("Failed", f"This transaction would bring you below the minimum balance of {self._format_currency(MINIMUM_BALANCE)}."); return
-        
-        # Verify the CURRENT user's PIN
-        if not self._verify_pin(f"Enter YOUR PIN to send {self._format_currency(amount)}", user_data.get("pin")):
-            return
-
-        requester_user = next((u for u, d in self.data.items() if d.get('account_no') == request.get('requester_acc_no')), None)
-        
-        if not requester_user:
-            messagebox.showerror("Error", "Could not find the requester's account. Cancelling transaction."); return
-            
-        # All checks passed, process the transaction
-        self.data[self.current_user]["balance"] -= amount
-        self.data[requester_user]["balance"] += amount
-        save_data(self.data, DATA_FILE)
-        
-        request['status'] = 'approved'
-        save_data(self.all_requests, REQUESTS_FILE)
-        
-        log_transaction(self.current_acc_no, "Send (Request)", amount * -1, "Success", request.get('requester_acc_no'))
-        log_transaction(request.get('requester_acc_no'), "Receive (Request)", amount, "Success", self.current_acc_no)
+        shown = next((req for req in self.pending_list if req.get('request_id') == selected_id), {})
+        amount = shown.get('amount', 0)
+        try:
+            # Verify the CURRENT user's PIN
+            self.service.approve_request(self.current_user, selected_id, authorize=lambda: self._verify_pin(
+                f"Enter YOUR PIN to send {self._format_currency(amount)}", self.data[self.current_user].get("pin")))
+        except BankError as e:
+            self._show_bank_error(e); return
         
         messagebox.showinfo("Success", "Request approved and money sent!")
         self.show_pending_requests_page() 
@@ -754,18 +1179,46 @@ class BankApp:
             messagebox.showerror("Error", "Please select a request to deny.")
             return
             
-        request = self.all_requests.get(selected_id)
-        if not request:
-            messagebox.showerror("Error", "Could not find the selected request."); return
-            
-        request['status'] = 'denied'
-        save_data(self.all_requests, REQUESTS_FILE)
+        try:
+            self.service.deny_request(self.current_user, selected_id)
+        except BankError as e:
+            self._show_bank_error(e); return
         
         messagebox.showinfo("Request Denied", "The money request has been successfully denied.")
         self.show_pending_requests_page() 
 
 
+def startup_report(ledger):
+    """The --profile-startup table: each startup step's time and when it ended, in milliseconds."""
+    start = _STARTUP_MARKS[0][1]
+    lines = [f"{'step':<32} {'took ms':>9} {'at ms':>9}"]
+    previous = start
+    for name, at in _STARTUP_MARKS[1:]:
+        lines.append(f"{name:<32} {(at - previous) * 1000:>9.1f} {(at - start) * 1000:>9.1f}")
+        previous = at
+    if ledger.error is not None:
+        lines.append(f"{'load ledger (background)':<32} failed: {ledger.error}")
+    else:
+        lines.append(f"{'load ledger (background)':<32} {ledger.seconds * 1000:>9.1f} "
+                     f"{(ledger.finished_at - start) * 1000:>9.1f}")
+    return "\n".join(lines)
+
+
+def _print_startup_report(root, ledger):
+    if not ledger.ready():
+        root.after(LEDGER_POLL_INTERVAL_MS, _print_startup_report, root, ledger)
+        return
+    print(startup_report(ledger), file=sys.stderr)
+
+
 if __name__ == "__main__":
     root = ttk.Window(themename="darkly") 
+    _STARTUP_MARKS.append(("create window", time.perf_counter()))
     app = BankApp(root)
+    _STARTUP_MARKS.append(("build login screen", time.perf_counter()))
+    root.update()
+    _STARTUP_MARKS.append(("draw login screen", time.perf_counter()))
+    metrics.observe("startup_login_screen", _STARTUP_MARKS[-1][1] - _STARTUP_MARKS[0][1])
+    if "--profile-startup" in sys.argv[1:]:
+        _print_startup_report(root, app.ledger)
     root.mainloop()
@@ -0,0 +1,205 @@
+"""Lightweight metrics: latency histograms, call and error counts, bytes moved.
+
+Instrumented code uses
+
+    @metrics.timed("bank_deposit")          # latency histogram + calls + errors
+    with metrics.timer("ledger_checkpoint"):
+    metrics.add_bytes("journal_written", n)
+    metrics.count("arna_cache_hits")
+
+Everything is off until enable() (or start_exporter()) is called; while
+off, each hook is a single flag check. Metrics are rendered in the
+Prometheus text format, either on demand (render(), dump()) or to a file
+rewritten every few seconds for the node_exporter textfile collector.
+On POSIX, SIGUSR1 makes a running exporter write the file immediately.
+"""
+import atexit
+import bisect
+import contextlib
+import functools
+import os
+import signal
+import sys
+import threading
+import time
+
+PREFIX = "apex_"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+enabled = False
+_lock = threading.RLock()  # re-entrant: the SIGUSR1 handler may interrupt an update
+_histograms = {}
+_counters = {}
+_exporter = None
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(name, seconds):
+    """Records one latency sample for `name`."""
+    if not enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram.sum += seconds
+        histogram.count += 1
+
+
+def count(name, n=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def add_bytes(name, n):
+    count(name + "_bytes", n)
+
+
+@contextlib.contextmanager
+def _timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        count(name + "_errors")
+        raise
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def timer(name):
+    """Context manager timing its block into the `name` histogram."""
+    return _timer(name) if enabled else _NULL_TIMER
+
+
+def timed(name):
+    """Decorator timing each call into the `name` histogram (and counting exceptions)."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                count(name + "_errors")
+                raise
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+# Export
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {name: (list(h.buckets), h.sum, h.count) for name, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name in sorted(histograms):
+        buckets, total, calls = histograms[name]
+        metric = f"{PREFIX}{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, buckets):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {calls}')
+        lines.append(f"{metric}_sum {total:.6f}")
+        lines.append(f"{metric}_count {calls}")
+    for name in sorted(counters):
+        metric = f"{PREFIX}{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {counters[name]}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def write(path):
+    """Writes render() to path atomically, so a scraper never sees half a file."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(render())
+    os.replace(temp_path, path)
+
+
+def dump(stream=None):
+    """Prints the current metrics (to stderr by default)."""
+    (stream or sys.stderr).write(render())
+
+
+class _Exporter:
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            write(self.path)
+        except OSError:
+            pass  # metrics must never take the bank down
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+
+def start_exporter(path, interval=15.0):
+    """Enables metrics and rewrites `path` every `interval` seconds (and at exit)."""
+    global _exporter
+    enable()
+    if _exporter is not None:
+        return _exporter
+    _exporter = _Exporter(path, interval)
+    _exporter._thread.start()
+    atexit.register(stop_exporter)
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, _write_now)
+    return _exporter
+
+
+def _write_now(signum, frame):
+    if _exporter is not None:
+        _exporter.write()
+
+
+def stop_exporter():
+    global _exporter
+    if _exporter is not None:
+        _exporter.stop()
+        _exporter = None
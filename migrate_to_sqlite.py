@@ -0,0 +1,66 @@
+"""One-shot migration of the JSON data files into a SQLite database.
+
+Usage (from the directory holding the data files):
+    python migrate_to_sqlite.py [--db apex_bank.db]
+
+Then start the app with APEX_STORAGE=sqlite to use the database.
+"""
+import argparse
+import itertools
+import os
+import sys
+
+from sqlite_backend import SqliteBackend
+from storage import JsonBackend
+
+BATCH_SIZE = 10000
+
+
+def migrate(users_file, log_file, requests_file, db_file):
+    """Copies users, log entries and money requests; returns the row counts."""
+    source = JsonBackend(users_file, log_file, requests_file)
+    target = SqliteBackend(db_file)
+    if target.load_users():
+        raise SystemExit(f"{db_file} already contains users; refusing to migrate into it.")
+
+    users = source.load_users()
+    target.users.update(users)
+    target.commit(list(users))
+
+    log_count = 0
+    entries = source.journal.iter_entries()
+    while True:
+        batch = list(itertools.islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        target.journal.append_many(batch)
+        log_count += len(batch)
+
+    # Migrate the open requests and the archive of resolved ones
+    source.requests.refresh()
+    requests = list(source.requests.iter_archive())
+    requests.extend(source.requests.iter_open())
+    target.requests.add_many(requests)
+
+    source.close()
+    target.close()
+    return {"users": len(users), "log_entries": log_count, "requests": len(requests)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", default="users.json")
+    parser.add_argument("--log", default="transactions.log")
+    parser.add_argument("--requests", default="pending_requests.json")
+    parser.add_argument("--db", default="apex_bank.db")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.users):
+        sys.exit(f"{args.users} not found")
+    counts = migrate(args.users, args.log, args.requests, args.db)
+    print(f"Migrated {counts['users']} users, {counts['log_entries']} log entries "
+          f"and {counts['requests']} requests into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Pooled HTTP client for the local Ollama API used by the Arna assistant."""
+import collections
+import json
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+
+class OllamaClient:
+    """Talks to Ollama over a shared keep-alive session with retries.
+
+    Connections to the Ollama server are reused between questions, and
+    `keep_alive` asks Ollama to keep the model loaded in memory so short
+    answers don't pay the cold-start cost every time.
+    """
+
+    def __init__(self, api_url, model, connect_timeout=3.05, read_timeout=30,
+                 retries=2, backoff_factor=0.5, keep_alive="10m"):
+        self.api_url = api_url
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.last_latency = None
+        self.latency_history = collections.deque(maxlen=100)
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0, # a half-streamed answer can't be replayed safely
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=4))
+
+    def stream(self, prompt, cancel_event=None):
+        """Yields answer tokens as Ollama produces them.
+
+        Stops quietly when cancel_event is set. Raises the usual
+        requests exceptions on connection or HTTP errors.
+        """
+        payload = {"model": self.model, "prompt": prompt, "stream": True, "keep_alive": self.keep_alive}
+        started = time.perf_counter()
+        latency = {"first_token": None, "total": None, "model_load": None}
+        metrics.count("ollama_requests")
+        try:
+            with self.session.post(self.api_url, json=payload, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get("response", "")
+                    if token:
+                        if latency["first_token"] is None:
+                            latency["first_token"] = time.perf_counter() - started
+                            metrics.observe("ollama_first_token", latency["first_token"])
+                        yield token
+                    if chunk.get("done"):
+                        # Ollama reports durations in nanoseconds
+                        if chunk.get("load_duration") is not None:
+                            latency["model_load"] = chunk["load_duration"] / 1e9
+                        break
+        except requests.exceptions.RequestException:
+            metrics.count("ollama_request_errors")
+            raise
+        latency["total"] = time.perf_counter() - started
+        metrics.observe("ollama_request", latency["total"])
+        self.last_latency = latency
+        self.latency_history.append(latency)
+
+    def generate(self, prompt):
+        """Returns the complete answer for prompt."""
+        return "".join(self.stream(prompt))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,44 @@
+"""Account-number index kept alongside the user map loaded from users.json."""
+import random
+
+
+class AccountRegistry:
+    """Maps account numbers to usernames so lookups don't scan every user."""
+
+    def __init__(self, data=None):
+        self._by_acc_no = {}
+        if data:
+            self.rebuild(data)
+
+    def rebuild(self, data):
+        """Re-indexes the full user map, e.g. after it was reloaded from disk."""
+        if hasattr(data, "account_numbers"):
+            # AccountTable: read the column directly instead of building a record per user
+            self._by_acc_no = dict(data.account_numbers())
+            return
+        self._by_acc_no = {
+            user.get("account_no"): username for username, user in data.items()
+        }
+
+    def add(self, username, user_data):
+        self._by_acc_no[user_data.get("account_no")] = username
+
+    def remove(self, acc_no):
+        self._by_acc_no.pop(acc_no, None)
+
+    def lookup(self, acc_no):
+        """Returns the username owning acc_no, or None."""
+        return self._by_acc_no.get(acc_no)
+
+    def __contains__(self, acc_no):
+        return acc_no in self._by_acc_no
+
+    def __len__(self):
+        return len(self._by_acc_no)
+
+    def generate_account_number(self):
+        """Picks a random 6-digit account number that is not taken yet."""
+        while True:
+            acc_no = str(random.randint(100000, 999999))
+            if acc_no not in self._by_acc_no:
+                return acc_no
@@ -0,0 +1,118 @@
+"""Money-request storage indexed by (source account, status).
+
+Open requests live in pending_requests.json behind a WalStore, so a status
+change is one small WAL append instead of a full-file rewrite. Once a
+request is approved or denied it is moved to an append-only archive file
+(`<file>.archive.jsonl`), keeping the hot file limited to open requests.
+"""
+import json
+import os
+import threading
+
+from wal_store import WalStore
+
+RESOLVED_STATUSES = ("approved", "denied")
+
+
+class RequestStore:
+    """Open money requests plus a (source_acc_no, status) -> request ids index."""
+
+    def __init__(self, file_path, archive_path=None, checkpoint_every=500, before_commit=None):
+        self._store = WalStore(file_path, checkpoint_every=checkpoint_every, name="requests")
+        # Called before every write, e.g. to flush balance changes a status change depends on
+        self.before_commit = before_commit
+        self.archive_path = archive_path or os.path.splitext(file_path)[0] + ".archive.jsonl"
+        self._index = {}
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """Reloads from disk if another process changed the requests file."""
+        with self._lock:
+            if self._store.refresh():
+                self._rebuild_index()
+                self.archive_resolved()
+
+    def _rebuild_index(self):
+        self._index = {}
+        for req_id, request in self._store.data.items():
+            self._index_add(req_id, request)
+
+    def _index_add(self, req_id, request):
+        key = (request.get("source_acc_no"), request.get("status"))
+        self._index.setdefault(key, {})[req_id] = None
+
+    def _index_remove(self, req_id, request):
+        key = (request.get("source_acc_no"), request.get("status"))
+        self._index.get(key, {}).pop(req_id, None)
+
+    def _before_commit(self):
+        if self.before_commit is not None:
+            self.before_commit()
+
+    def __contains__(self, req_id):
+        return req_id in self._store.data
+
+    def get(self, req_id):
+        return self._store.data.get(req_id)
+
+    def add(self, request):
+        """Stores a new request; its "request_id" field is the key."""
+        req_id = request["request_id"]
+        with self._lock:
+            self._before_commit()
+            self._store.commit(updates={req_id: request})
+            self._index_add(req_id, request)
+
+    def iter_open(self):
+        """All requests still in the hot file (i.e. not yet archived)."""
+        return iter(list(self._store.data.values()))
+
+    def pending_for(self, source_acc_no):
+        """Open requests that source_acc_no has been asked to pay, oldest first."""
+        ids = list(self._index.get((source_acc_no, "pending"), {}))
+        return [self._store.data[req_id] for req_id in ids if req_id in self._store.data]
+
+    def count_pending(self, source_acc_no):
+        return len(self._index.get((source_acc_no, "pending"), ()))
+
+    def set_status(self, req_id, status):
+        """Moves a request to a new status; resolved requests go to the archive."""
+        with self._lock:
+            old = self._store.data[req_id]
+            request = dict(old, status=status)
+            self._index_remove(req_id, old)
+            self._before_commit()
+            if status in RESOLVED_STATUSES:
+                self._archive([request])
+                self._store.commit(deleted=[req_id])
+            else:
+                self._store.commit(updates={req_id: request})
+                self._index_add(req_id, request)
+
+    def archive_resolved(self):
+        """Moves any approved/denied requests still in the hot file to the archive."""
+        with self._lock:
+            resolved = [req for req in self._store.data.values() if req.get("status") in RESOLVED_STATUSES]
+            if not resolved:
+                return
+            self._before_commit()
+            self._archive(resolved)
+            for request in resolved:
+                self._index_remove(request["request_id"], request)
+            self._store.commit(deleted=[req["request_id"] for req in resolved])
+
+    def _archive(self, requests):
+        # Written before the hot-file delete, so a crash can only duplicate, never lose
+        with open(self.archive_path, "a") as f:
+            f.write("".join(json.dumps(req) + "\n" for req in requests))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iter_archive(self):
+        """Streams resolved requests from the archive, oldest first."""
+        if not os.path.exists(self.archive_path):
+            return
+        with open(self.archive_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
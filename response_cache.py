@@ -0,0 +1,85 @@
+"""LRU/TTL cache for Arna's answers to general (non-account) questions."""
+import collections
+import json
+import os
+import re
+import threading
+import time
+
+
+class ResponseCache:
+    """Caches answers keyed on normalized question text plus model name.
+
+    Entries expire after `ttl_seconds`, the least recently used entry is
+    evicted beyond `max_entries`, and if `file_path` is given the cache is
+    persisted there so it survives restarts. Only put general questions in
+    here; account-specific answers must never be cached.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=7 * 24 * 3600, file_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.file_path = file_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()  # key -> (stored_at, answer)
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def normalize(question):
+        """Lower-cases, collapses whitespace and drops trailing punctuation."""
+        return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+    def _key(self, question, model):
+        return f"{model}\n{self.normalize(question)}"
+
+    def get(self, question, model):
+        """Returns the cached answer, or None on a miss or expired entry."""
+        key = self._key(question, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, question, model, answer):
+        key = self._key(question, model)
+        with self._lock:
+            self._entries[key] = (time.time(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def _load(self):
+        if not self.file_path or not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r") as f:
+                stored = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        now = time.time()
+        for key, stored_at, answer in stored[-self.max_entries:]:
+            if now - stored_at <= self.ttl_seconds:
+                self._entries[key] = (stored_at, answer)
+
+    def _save(self):
+        if not self.file_path:
+            return
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump([[key, stored_at, answer] for key, (stored_at, answer) in self._entries.items()], f)
+        os.replace(temp_path, self.file_path)
@@ -0,0 +1,295 @@
+"""Sealed, compressed segments of the transaction journal.
+
+When the active transactions.log grows past a size limit (or a new month
+starts), its records are sealed into a segment in `<log>.segments/`: an
+LZMA-compressed copy, cut into independently compressed chunks so one
+record can be read without inflating the whole segment. manifest.json lists
+every segment with
+
+    start, end      the journal positions (byte offsets) it covers
+    first, last     its oldest and newest record timestamps
+    count           how many records it holds
+    chunks          [raw offset, stored offset] of each compressed chunk
+
+and next to each segment file are a Bloom filter of its account numbers
+(<segment>.bloom) and a compressed per-account index (<segment>.idx.xz).
+Readers skip segments whose time range or Bloom filter rules them out.
+
+Positions keep their meaning after sealing: the record at position P is
+found in the segment covering P, or in the active file, so the journal
+index, cursors and balance snapshots are unaffected by rotation. Segments
+never change once written; only the manifest is replaced (atomically).
+"""
+import bisect
+import collections
+import hashlib
+import json
+import lzma
+import os
+import threading
+
+import metrics
+
+MANIFEST = "manifest.json"
+CHUNK_BYTES = 256 << 10  # raw bytes per compressed chunk
+COMPRESSION_PRESET = 1  # ~20 MB/s and about a tenth of the size; higher presets are 10x slower for little gain
+BLOOM_HASHES = 7
+BLOOM_BITS_PER_KEY = 10  # about 1% false positives
+CHUNK_CACHE_SIZE = 32
+INDEX_CACHE_SIZE = 4
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter over strings (account numbers)."""
+
+    def __init__(self, bits, hashes=BLOOM_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self._size = len(bits) * 8
+
+    @classmethod
+    def for_keys(cls, keys, bits_per_key=BLOOM_BITS_PER_KEY):
+        keys = list(keys)
+        bloom = cls(bytearray(max(8, len(keys) * bits_per_key // 8 + 1)))
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self._size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class Segment:
+    """One sealed segment, as listed in the manifest."""
+
+    FIELDS = ("name", "start", "end", "count", "first", "last", "chunks", "stored_bytes")
+    __slots__ = FIELDS + ("chunk_offsets",)
+
+    def __init__(self, name, start, end, count, first, last, chunks, stored_bytes):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.count = count
+        self.first = first
+        self.last = last
+        self.chunks = chunks
+        self.stored_bytes = stored_bytes
+        self.chunk_offsets = [raw for raw, _ in chunks]
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(**{field: entry[field] for field in cls.FIELDS})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def overlaps(self, since=None, until=None):
+        """False when every record is outside [since, until] (compared at each bound's precision)."""
+        if not self.count:
+            return False
+        return ((since is None or self.last[:len(since)] >= since)
+                and (until is None or self.first[:len(until)] <= until))
+
+
+class SegmentStore:
+    """The directory of sealed segments and its manifest."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self.segments = []
+        self._starts = []
+        self._manifest_stat = None
+        self._blooms = {}  # segment name -> BloomFilter; segments never change
+        self._indexes = collections.OrderedDict()  # segment name -> {acc_no: [positions]}
+        self._chunks = collections.OrderedDict()  # (segment name, chunk) -> raw bytes
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @property
+    def end(self):
+        """Position just past the last sealed record (0 when nothing is sealed)."""
+        return self.segments[-1].end if self.segments else 0
+
+    def refresh(self):
+        """Re-reads the manifest if another process (or thread) replaced it; True if it changed."""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return False
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._manifest_stat:
+            return False
+        with open(self.manifest_path, "r") as f:
+            manifest = json.load(f)
+        with self._lock:
+            self.segments = [Segment.from_dict(entry) for entry in manifest.get("segments", [])]
+            self._starts = [segment.start for segment in self.segments]
+            self._manifest_stat = stamp
+        return True
+
+    def _write_manifest(self, segments):
+        temp_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"segments": [segment.to_dict() for segment in segments]}, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+        self.refresh()
+
+    def segment_at(self, position):
+        """The segment holding the record at `position`, or None."""
+        i = bisect.bisect_right(self._starts, position) - 1
+        if i >= 0 and position < self.segments[i].end:
+            return self.segments[i]
+        return None
+
+    # Reading
+
+    def may_contain(self, segment, acc_no):
+        bloom = self._blooms.get(segment.name)
+        if bloom is None:
+            with open(self._path(segment.name + ".bloom"), "rb") as f:
+                bloom = self._blooms[segment.name] = BloomFilter(bytearray(f.read()))
+        return acc_no in bloom
+
+    def account_positions(self, segment, acc_no):
+        """Positions of acc_no's records in the segment, oldest first."""
+        if not self.may_contain(segment, acc_no):
+            return []
+        with self._lock:
+            index = self._indexes.get(segment.name)
+            if index is not None:
+                self._indexes.move_to_end(segment.name)
+        if index is None:
+            index = {}
+            with lzma.open(self._path(segment.name + ".idx.xz"), "rt") as f:
+                for line in f:
+                    parts = line.split()
+                    index.setdefault(parts[0], []).append(int(parts[1]))
+            with self._lock:
+                self._indexes[segment.name] = index
+                if len(self._indexes) > INDEX_CACHE_SIZE:
+                    self._indexes.popitem(last=False)
+        return index.get(acc_no, [])
+
+    def _chunk(self, segment, i):
+        key = (segment.name, i)
+        with self._lock:
+            raw = self._chunks.get(key)
+            if raw is not None:
+                self._chunks.move_to_end(key)
+                return raw
+        stored_start = segment.chunks[i][1]
+        stored_end = segment.chunks[i + 1][1] if i + 1 < len(segment.chunks) else segment.stored_bytes
+        with open(self._path(segment.name), "rb") as f:
+            f.seek(stored_start)
+            raw = lzma.decompress(f.read(stored_end - stored_start))
+        metrics.add_bytes("segment_read", stored_end - stored_start)
+        with self._lock:
+            self._chunks[key] = raw
+            if len(self._chunks) > CHUNK_CACHE_SIZE:
+                self._chunks.popitem(last=False)
+        return raw
+
+    def read_line(self, position):
+        """The raw line of the record at `position`, or None if no segment holds it."""
+        segment = self.segment_at(position)
+        if segment is None:
+            return None
+        offset = position - segment.start
+        i = bisect.bisect_right(segment.chunk_offsets, offset) - 1
+        raw = self._chunk(segment, i)
+        start = offset - segment.chunks[i][0]
+        end = raw.find(b"\n", start)
+        return raw[start:] if end < 0 else raw[start:end + 1]
+
+    def iter_lines(self, segment, position=0, end=None):
+        """(raw line, position after it) for the segment's records from `position` up to `end`."""
+        for i, (raw_offset, _) in enumerate(segment.chunks):
+            chunk_start = segment.start + raw_offset
+            chunk_end = segment.start + segment.chunks[i + 1][0] if i + 1 < len(segment.chunks) else segment.end
+            if chunk_end <= position:
+                continue
+            if end is not None and chunk_start >= end:
+                return
+            line_start = chunk_start
+            for line in self._chunk(segment, i).splitlines(keepends=True):
+                line_end = line_start + len(line)
+                if end is not None and line_start >= end:
+                    return
+                if line_start >= position:
+                    yield line, line_end
+                line_start = line_end
+
+    # Sealing
+
+    def seal(self, source, offset, start, end):
+        """Compresses the records at journal positions [start, end) into a new segment.
+
+        They are read from the open file `source` beginning at byte
+        `offset`. The segment is listed in the manifest once fully written,
+        so a crash part-way leaves only an unlisted file behind. Callers
+        must make sure one process seals at a time.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{start:016d}.jsonl.xz"
+        chunks, index_lines, accounts = [], [], set()
+        first = last = None
+        count = 0
+        stored = 0
+        temp_path = self._path(f"{name}.{os.getpid()}.tmp")
+        with open(temp_path, "wb") as out:
+            source.seek(offset)
+            position = start
+            while position < end:
+                data = source.read(min(CHUNK_BYTES, end - position))
+                if not data:
+                    break
+                if position + len(data) < end and not data.endswith(b"\n"):
+                    data += source.readline()  # chunks end on a record boundary
+                chunks.append([position - start, stored])
+                line_start = position
+                for line in data.splitlines(keepends=True):
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        entry = None
+                    if isinstance(entry, dict) and entry.get("account_no") is not None:
+                        acc_no = entry["account_no"]
+                        accounts.add(acc_no)
+                        index_lines.append(f"{acc_no} {line_start}\n")
+                        timestamp = entry.get("timestamp") or ""
+                        first = timestamp if first is None else min(first, timestamp)
+                        last = timestamp if last is None else max(last, timestamp)
+                        count += 1
+                    line_start += len(line)
+                compressed = lzma.compress(data, preset=COMPRESSION_PRESET)
+                out.write(compressed)
+                stored += len(compressed)
+                position += len(data)
+            out.flush()
+            os.fsync(out.fileno())
+
+        with lzma.open(self._path(name + ".idx.xz"), "wt", preset=COMPRESSION_PRESET) as f:
+            f.writelines(index_lines)
+        with open(self._path(name + ".bloom"), "wb") as f:
+            f.write(BloomFilter.for_keys(accounts).bits)
+        os.replace(temp_path, self._path(name))
+        metrics.add_bytes("segment_written", stored)
+
+        segment = Segment(name, start, position, count, first or "", last or "", chunks, stored)
+        self.refresh()
+        self._write_manifest(self.segments + [segment])
+        return segment
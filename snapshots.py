@@ -0,0 +1,176 @@
+"""Binary snapshots of every account balance at a point in the transaction journal.
+
+A snapshot records the balance of each account after the journal records
+before byte `position`, plus the newest record timestamp it covers. The
+current balances, or one account's balance at any past time, are then the
+nearest snapshot plus a replay of at most one snapshot interval of journal
+records, instead of the whole history. Only the newest few snapshots are
+kept (see SnapshotStore.prune), plus the one at position 0: it holds the
+opening balances of accounts older than the journal, which no replay can
+rebuild. Lookups before the oldest kept snapshot replay from position 0.
+
+File layout (little-endian), one file per snapshot named by its position:
+
+    header   magic "APXB", version, position, account count,
+             last timestamp (19 bytes), account blob length, CRC32 of payload
+    payload  account numbers, newline separated (UTF-8)
+             balances as int64, in the same order
+             (version 2) a JSON object of the balances that do not fit in
+             int64, by account number; their int64 slot holds 0
+"""
+import array
+import json
+import os
+import struct
+import sys
+import threading
+import zlib
+
+MAGIC = b"APXB"
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+HEADER = struct.Struct("<4sHQI19sQI")
+TIMESTAMP_BYTES = 19
+MIN_BALANCE, MAX_BALANCE = -2 ** 63, 2 ** 63 - 1
+
+
+class SnapshotCorruptError(Exception):
+    """A snapshot file is truncated or fails its checksum."""
+
+
+class Snapshot:
+    __slots__ = ("position", "last_timestamp", "balances")
+
+    def __init__(self, position, last_timestamp, balances):
+        self.position = position
+        self.last_timestamp = last_timestamp
+        self.balances = balances
+
+
+def apply_entries(balances, entries, last_timestamp=""):
+    """Adds each record's amount to its account; returns the newest timestamp seen."""
+    for entry in entries:
+        acc_no = entry.get("account_no")
+        if acc_no is None:
+            continue
+        balances[acc_no] = balances.get(acc_no, 0) + entry.get("amount", 0)
+        last_timestamp = max(last_timestamp, entry.get("timestamp") or "")
+    return last_timestamp
+
+
+class SnapshotStore:
+    """A directory of immutable snapshot files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._headers = {}  # file name -> (position, last_timestamp); files never change
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def headers(self):
+        """(position, last_timestamp, file name) of every snapshot, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".snap"):
+                continue
+            if name not in self._headers:
+                try:
+                    with open(self._path(name), "rb") as f:
+                        magic, version, position, _, last, _, _ = HEADER.unpack(f.read(HEADER.size))
+                except (OSError, struct.error):
+                    continue
+                if magic != MAGIC or version not in READABLE_VERSIONS:
+                    continue
+                self._headers[name] = (position, last.rstrip(b"\0").decode("ascii"))
+            position, last = self._headers[name]
+            found.append((position, last, name))
+        found.sort()
+        return found
+
+    def latest_position(self):
+        headers = self.headers()
+        return headers[-1][0] if headers else None
+
+    def latest(self, at_or_before=None):
+        """Newest readable snapshot, or the newest covering only records up to a timestamp."""
+        candidates = [h for h in self.headers() if at_or_before is None or h[1] <= at_or_before]
+        for _, _, name in reversed(candidates):
+            try:
+                return self.load(name)
+            except (SnapshotCorruptError, FileNotFoundError):  # or pruned since it was listed
+                continue
+        return None
+
+    def next_position(self, position):
+        """Position of the first snapshot after `position`, or None."""
+        for later, _, _ in self.headers():
+            if later > position:
+                return later
+        return None
+
+    def prune(self, keep):
+        """Deletes all but the newest `keep` snapshots and the one at position 0; returns how many went."""
+        removed = 0
+        for position, _, name in self.headers()[:-keep or None]:
+            if position == 0:
+                continue
+            try:
+                os.remove(self._path(name))
+                removed += 1
+            except FileNotFoundError:
+                pass  # another process pruned it first
+            self._headers.pop(name, None)
+        return removed
+
+    def load(self, name):
+        with open(self._path(name), "rb") as f:
+            content = f.read()
+        try:
+            magic, version, position, count, last, blob_len, crc = HEADER.unpack_from(content)
+        except struct.error as e:
+            raise SnapshotCorruptError(f"{name}: truncated header") from e
+        payload = memoryview(content)[HEADER.size:]
+        values_end = blob_len + 8 * count
+        if (magic != MAGIC or version not in READABLE_VERSIONS or len(payload) < values_end
+                or (version == 1 and len(payload) != values_end) or zlib.crc32(payload) != crc):
+            raise SnapshotCorruptError(f"{name}: damaged snapshot")
+
+        accounts = bytes(payload[:blob_len]).decode("utf-8").split("\n") if count else []
+        values = array.array("q")
+        values.frombytes(payload[blob_len:values_end])
+        if sys.byteorder == "big":
+            values.byteswap()
+        balances = dict(zip(accounts, values))
+        if len(payload) > values_end:
+            balances.update(json.loads(bytes(payload[values_end:])))
+        return Snapshot(position, last.rstrip(b"\0").decode("ascii"), balances)
+
+    def write(self, position, last_timestamp, balances):
+        """Atomically stores a snapshot of `balances` (acc_no -> int) at journal `position`."""
+        os.makedirs(self.directory, exist_ok=True)
+        accounts = list(balances)
+        # The ledger itself has no limit; anything array("q") cannot hold goes in the JSON part
+        wide = {acc_no: balance for acc_no, balance in balances.items()
+                if type(balance) is not int or not MIN_BALANCE <= balance <= MAX_BALANCE}
+        blob = "\n".join(accounts).encode("utf-8")
+        values = array.array("q", (0 if acc_no in wide else balances[acc_no] for acc_no in accounts))
+        if sys.byteorder == "big":
+            values.byteswap()
+        payload = blob + values.tobytes() + (json.dumps(wide).encode("utf-8") if wide else b"")
+        header = HEADER.pack(
+            MAGIC, VERSION, position, len(accounts),
+            last_timestamp.encode("ascii")[:TIMESTAMP_BYTES], len(blob), zlib.crc32(payload),
+        )
+
+        name = f"{position:016d}.snap"
+        # Unique temp name: a background and an explicit snapshot may race to the same position
+        temp_path = self._path(f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(header + payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._path(name))
+        return Snapshot(position, last_timestamp, dict(balances))
@@ -0,0 +1,345 @@
+"""SQLite storage backend (stdlib sqlite3, WAL mode).
+
+Drop-in alternative to the JSON files; see storage.py for the interface.
+A transfer's balance updates and log rows are written in one transaction.
+locked() holds a BEGIN IMMEDIATE transaction, which SQLite already
+serialises across processes, so no separate lock files are needed.
+"""
+import contextlib
+import sqlite3
+import threading
+
+import metrics
+from accounts import AccountTable
+from storage import StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    pin TEXT NOT NULL,
+    balance INTEGER NOT NULL,
+    account_no TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    account_no TEXT,
+    type TEXT,
+    amount INTEGER,
+    status TEXT,
+    target_acc_no TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions (account_no, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp);
+CREATE TABLE IF NOT EXISTS requests (
+    request_id TEXT PRIMARY KEY,
+    requester_acc_no TEXT,
+    requester_username TEXT,
+    source_acc_no TEXT,
+    source_username TEXT,
+    amount INTEGER,
+    timestamp TEXT,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_requests_source_status ON requests (source_acc_no, status);
+CREATE INDEX IF NOT EXISTS idx_requests_timestamp ON requests (timestamp);
+"""
+
+LOG_COLUMNS = ("timestamp", "account_no", "type", "amount", "status", "target_acc_no")
+REQUEST_COLUMNS = (
+    "request_id", "requester_acc_no", "requester_username", "source_acc_no",
+    "source_username", "amount", "timestamp", "status",
+)
+RESOLVED_STATUSES = ("approved", "denied")
+
+
+class SqliteBackend(StorageBackend):
+    """Users, transaction log and money requests in a single SQLite database."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Autocommit mode; multi-statement writes use explicit BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        self._depth = 0
+        self.users = AccountTable()
+        self._data_version = None
+        self.journal = SqliteJournal(self)
+        self.requests = SqliteRequestStore(self)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT; nested calls join the outer transaction."""
+        with self.lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self.conn
+                finally:
+                    self._depth -= 1
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                self._data_version = None  # self.users may hold rolled-back values; reload next time
+                raise
+            else:
+                self.conn.execute("COMMIT")
+            finally:
+                self._depth = 0
+
+    def locked(self, usernames=(), keys=()):
+        # The write lock is database-wide; callers re-read balances inside it
+        return self.transaction()
+
+    def group_commit(self):
+        # One transaction for the whole group, so one WAL sync
+        return self.transaction()
+
+    def _current_data_version(self):
+        # Changes whenever another connection commits to the database
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @metrics.timed("ledger_load")
+    def load_users(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT username, password, pin, balance, account_no FROM users")
+            users = AccountTable()
+            for username, password, pin, balance, account_no in rows:
+                users[username] = {"password": password, "pin": pin, "balance": balance, "account_no": account_no}
+            self.users = users
+            self._data_version = self._current_data_version()
+        return self.users
+
+    def refresh_users(self):
+        with self.lock:
+            if self._data_version is not None and self._current_data_version() == self._data_version:
+                return []
+            return list(self.load_users())
+
+    @metrics.timed("ledger_commit")
+    def commit(self, usernames=(), log_entries=(), updates=None):
+        """Writes the given users' records and log entries in one transaction."""
+        records = {name: self.users[name] for name in usernames}
+        records.update(updates or {})
+        user_rows = [
+            (name, user["password"], user["pin"], user["balance"], user["account_no"])
+            for name, user in records.items()
+        ]
+        log_rows = [tuple(entry.get(col) for col in LOG_COLUMNS) for entry in log_entries]
+        with self.transaction() as conn:
+            if user_rows:
+                conn.executemany(
+                    "INSERT INTO users (username, password, pin, balance, account_no) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(username) DO UPDATE SET password = excluded.password, pin = excluded.pin, "
+                    "balance = excluded.balance, account_no = excluded.account_no",
+                    user_rows,
+                )
+            if log_rows:
+                conn.executemany(
+                    f"INSERT INTO transactions ({', '.join(LOG_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", log_rows
+                )
+            if updates:
+                self.users.update(updates)
+
+    def balance_at(self, acc_no, timestamp):
+        """Today's balance minus everything logged after `timestamp` (indexed per account)."""
+        with self.lock:
+            row = self.conn.execute("SELECT balance FROM users WHERE account_no = ?", (acc_no,)).fetchone()
+            if row is None:
+                return None
+            later, opened_later = self.conn.execute(
+                "SELECT COALESCE(SUM(amount), 0), COALESCE(MAX(type = 'Account Opened'), 0) "
+                "FROM transactions WHERE account_no = ? AND timestamp > ?",
+                (acc_no, timestamp),
+            ).fetchone()
+        return None if opened_later else row[0] - later
+
+    def close(self):
+        self.conn.close()
+
+
+def _log_row_to_entry(row):
+    return dict(zip(LOG_COLUMNS, row))
+
+
+class SqliteJournal:
+    """Journal-compatible view of the transactions table."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def open(self):
+        pass  # the connection is already open and the table indexed
+
+    def append(self, entry):
+        self.backend.commit(log_entries=[entry])
+
+    def append_many(self, entries):
+        self.backend.commit(log_entries=entries)
+
+    def _query(self, sql, params=()):
+        with self.backend.lock:
+            rows = self.backend.conn.execute(sql, params).fetchall()
+        return rows
+
+    def iter_entries(self, since=None, until=None, batch_size=5000):
+        """Streams log rows, oldest first, in id-ordered batches; since/until bound their timestamps."""
+        last_id = 0
+        where, params = "", []
+        if since is not None:
+            where += " AND timestamp >= ?"
+            params.append(since)
+        if until is not None:
+            where += " AND substr(timestamp, 1, ?) <= ?"
+            params += [len(until), until]
+        while True:
+            rows = self._query(
+                f"SELECT id, {', '.join(LOG_COLUMNS)} FROM transactions WHERE id > ?{where} ORDER BY id LIMIT ?",
+                (last_id, *params, batch_size),
+            )
+            if not rows:
+                return
+            for row in rows:
+                yield _log_row_to_entry(row[1:])
+            last_id = rows[-1][0]
+
+    def __iter__(self):
+        return self.iter_entries()
+
+    def iter_account(self, acc_no, newest_first=True, batch_size=500):
+        """Streams one account's rows in id-ordered batches."""
+        if newest_first:
+            cursor = self.cursor(acc_no)
+            while cursor.has_more():
+                yield from cursor.next_page(batch_size)
+            return
+        last_id = 0
+        while True:
+            rows = self._query(
+                f"SELECT id, {', '.join(LOG_COLUMNS)} FROM transactions "
+                "WHERE account_no = ? AND id > ? ORDER BY id LIMIT ?",
+                (acc_no, last_id, batch_size),
+            )
+            if not rows:
+                return
+            for row in rows:
+                yield _log_row_to_entry(row[1:])
+            last_id = rows[-1][0]
+
+    def iter_account_from(self, acc_no, index):
+        """One account's rows after its first `index`, oldest first."""
+        rows = self._query(
+            f"SELECT {', '.join(LOG_COLUMNS)} FROM transactions WHERE account_no = ? ORDER BY id LIMIT -1 OFFSET ?",
+            (acc_no, index),
+        )
+        return [_log_row_to_entry(row) for row in rows]
+
+    def cursor(self, acc_no):
+        return SqliteAccountCursor(self, acc_no)
+
+    def count_for(self, acc_no):
+        return self._query("SELECT COUNT(*) FROM transactions WHERE account_no = ?", (acc_no,))[0][0]
+
+
+class SqliteAccountCursor:
+    """Newest-first pages of one account's log rows (keyset pagination on id)."""
+
+    def __init__(self, journal, acc_no):
+        self.journal = journal
+        self.acc_no = acc_no
+        newest = journal._query("SELECT MAX(id) FROM transactions WHERE account_no = ?", (acc_no,))[0][0]
+        self._before_id = newest + 1 if newest is not None else None
+
+    def has_more(self):
+        return self._before_id is not None
+
+    def next_page(self, size):
+        if self._before_id is None:
+            return []
+        rows = self.journal._query(
+            f"SELECT id, {', '.join(LOG_COLUMNS)} FROM transactions "
+            "WHERE account_no = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (self.acc_no, self._before_id, size + 1),
+        )
+        # The extra row only tells us whether another page exists
+        more = len(rows) > size
+        rows = rows[:size]
+        self._before_id = rows[-1][0] if more else None
+        return [_log_row_to_entry(row[1:]) for row in rows]
+
+
+class SqliteRequestStore:
+    """RequestStore-compatible view of the requests table.
+
+    Resolved requests stay in the table; the (source_acc_no, status) index
+    keeps them out of the way of pending-request queries.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _query(self, sql, params=()):
+        with self.backend.lock:
+            return self.backend.conn.execute(sql, params).fetchall()
+
+    def refresh(self):
+        pass # every read goes to the database
+
+    def __contains__(self, req_id):
+        return bool(self._query("SELECT 1 FROM requests WHERE request_id = ?", (req_id,)))
+
+    def get(self, req_id):
+        rows = self._query(f"SELECT {', '.join(REQUEST_COLUMNS)} FROM requests WHERE request_id = ?", (req_id,))
+        return dict(zip(REQUEST_COLUMNS, rows[0])) if rows else None
+
+    def add(self, request):
+        self.add_many([request])
+
+    def add_many(self, requests):
+        rows = [tuple(req.get(col) for col in REQUEST_COLUMNS) for req in requests]
+        with self.backend.transaction() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO requests ({', '.join(REQUEST_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def iter_open(self):
+        rows = self._query(
+            f"SELECT {', '.join(REQUEST_COLUMNS)} FROM requests WHERE status NOT IN (?, ?) ORDER BY timestamp",
+            RESOLVED_STATUSES,
+        )
+        return (dict(zip(REQUEST_COLUMNS, row)) for row in rows)
+
+    def pending_for(self, source_acc_no):
+        rows = self._query(
+            f"SELECT {', '.join(REQUEST_COLUMNS)} FROM requests "
+            "WHERE source_acc_no = ? AND status = 'pending' ORDER BY timestamp, request_id",
+            (source_acc_no,),
+        )
+        return [dict(zip(REQUEST_COLUMNS, row)) for row in rows]
+
+    def count_pending(self, source_acc_no):
+        return self._query(
+            "SELECT COUNT(*) FROM requests WHERE source_acc_no = ? AND status = 'pending'", (source_acc_no,)
+        )[0][0]
+
+    def set_status(self, req_id, status):
+        with self.backend.transaction() as conn:
+            conn.execute("UPDATE requests SET status = ? WHERE request_id = ?", (status, req_id))
+
+    def archive_resolved(self):
+        pass
+
+    def iter_archive(self):
+        rows = self._query(
+            f"SELECT {', '.join(REQUEST_COLUMNS)} FROM requests WHERE status IN (?, ?) ORDER BY timestamp",
+            RESOLVED_STATUSES,
+        )
+        return (dict(zip(REQUEST_COLUMNS, row)) for row in rows)
@@ -0,0 +1,157 @@
+"""Statement export to CSV or JSON Lines, streamed from the transaction journal.
+
+Every export is a generator pipeline, so memory use does not grow with the
+size of the log:
+
+    read one account's records -> keep a date range -> format -> write
+
+One account is read through the journal's per-account index. The bulk
+export used for month-end runs reads the whole log once and routes each
+record to its account's file, keeping only a bounded number of files open.
+
+Dates are "YYYY-mm-dd" or full "YYYY-mm-dd HH:MM:SS" timestamps and both
+ends of the range are inclusive, so --to 2025-11-30 covers that whole day.
+"""
+import collections
+import csv
+import io
+import json
+import os
+
+FORMATS = ("csv", "jsonl")
+COLUMNS = ("timestamp", "account_no", "type", "amount", "status", "target_acc_no")
+MAX_OPEN_FILES = 256
+
+
+# Pipeline stages
+
+def in_date_range(entries, start=None, end=None):
+    """Records whose timestamp falls within [start, end], compared at each bound's precision."""
+    if start is None and end is None:
+        return entries
+    return (
+        entry for entry in entries
+        if (start is None or (entry.get("timestamp") or "")[:len(start)] >= start)
+        and (end is None or (entry.get("timestamp") or "")[:len(end)] <= end)
+    )
+
+
+def format_lines(entries, fmt):
+    """Formats records as text lines; CSV output starts with a header row."""
+    if fmt == "jsonl":
+        return (json.dumps(entry) + "\n" for entry in entries)
+    if fmt == "csv":
+        return _csv_lines(entries)
+    raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def _csv_row(entry):
+    return ["" if entry.get(column) is None else entry.get(column) for column in COLUMNS]
+
+
+def _csv_lines(entries):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for entry in entries:
+        # One row at a time: format into the buffer, hand it on, reuse the buffer
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(_csv_row(entry))
+        yield buffer.getvalue()
+
+
+def write_lines(lines, path):
+    """Writes lines to path (or a file object); returns how many were written."""
+    if hasattr(path, "write"):
+        count = 0
+        for line in lines:
+            path.write(line)
+            count += 1
+        return count
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", newline="", encoding="utf-8") as f:
+        count = write_lines(lines, f)
+    os.replace(temp_path, path)
+    return count
+
+
+# Exports
+
+def export_account(journal, acc_no, path, fmt="csv", start=None, end=None):
+    """Writes one account's records in [start, end], oldest first; returns the record count."""
+    entries = in_date_range(journal.iter_account(acc_no, newest_first=False), start, end)
+    counted = _Counter(entries)
+    write_lines(format_lines(counted, fmt), path)
+    return counted.count
+
+
+def export_all(journal, directory, fmt="csv", start=None, end=None, max_open_files=MAX_OPEN_FILES):
+    """One file per account in `directory`, from a single pass over the whole log.
+
+    Returns {account_no: record count}. Accounts with no records in the
+    range get no file.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    counts = collections.Counter()
+    files = _FileCache(max_open_files)
+    try:
+        # Sealed log segments outside the range are skipped without being read
+        for entry in in_date_range(journal.iter_entries(start, end), start, end):
+            acc_no = entry.get("account_no")
+            if acc_no is None:
+                continue
+            path = os.path.join(directory, f"{acc_no}.{fmt}")
+            first = acc_no not in counts
+            f = files.open(path, truncate=first)
+            if fmt == "jsonl":
+                f.write(json.dumps(entry) + "\n")
+            else:
+                writer = csv.writer(f, lineterminator="\n")
+                if first:
+                    writer.writerow(COLUMNS)
+                writer.writerow(_csv_row(entry))
+            counts[acc_no] += 1
+    finally:
+        files.close()
+    return dict(counts)
+
+
+class _Counter:
+    """Passes records through, counting them."""
+
+    def __init__(self, entries):
+        self._entries = entries
+        self.count = 0
+
+    def __iter__(self):
+        for entry in self._entries:
+            self.count += 1
+            yield entry
+
+
+class _FileCache:
+    """Keeps the most recently used output files open; older ones are closed and reopened to append."""
+
+    def __init__(self, max_open):
+        self.max_open = max_open
+        self._files = collections.OrderedDict()
+
+    def open(self, path, truncate=False):
+        f = self._files.get(path)
+        if f is not None:
+            self._files.move_to_end(path)
+            return f
+        if len(self._files) >= self.max_open:
+            _, oldest = self._files.popitem(last=False)
+            oldest.close()
+        f = self._files[path] = open(path, "w" if truncate else "a", newline="", encoding="utf-8")
+        return f
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
@@ -0,0 +1,382 @@
+"""Pluggable storage for users, the transaction log and money requests.
+
+Every backend exposes the same surface:
+
+    backend.users                 username -> user record (an accounts.AccountTable:
+                                  a compact mapping whose records read like dicts)
+    backend.load_users()          (re)read all users, returns backend.users
+    backend.refresh_users()       pick up changes made elsewhere; returns the
+                                  usernames that changed (empty if none)
+    backend.locked(usernames, keys)
+                                  context manager holding the per-account locks
+                                  (plus extra lock keys such as "request:<id>")
+                                  so a read-validate-commit cycle is not raced by
+                                  other threads or processes
+    backend.commit(usernames, log_entries, updates)
+                                  persist those users' records (and the new
+                                  records in `updates`, username -> record) and
+                                  append the log entries together
+    backend.group_commit()        context manager for a single writer thread:
+                                  every commit inside it is written together
+                                  when the block ends (one fsync for the batch)
+
+With commit_window set, JsonBackend also group-commits across threads:
+each commit() blocks until a CommitPipeline batch containing it is durable.
+    backend.balance_at(acc_no, timestamp)
+                                  the account's balance just after `timestamp`
+                                  ("YYYY-mm-dd HH:MM:SS"), or None if it did not exist
+    backend.snapshot()            record a balance snapshot now (JSON backend)
+    backend.rotate_log()          seal the active transaction log into a compressed
+                                  segment now (JSON backend; see segments.py)
+    backend.journal               open / iter_entries / iter_account / iter_account_from / cursor / count_for
+    backend.requests              RequestStore-compatible money-request store
+    backend.close()
+
+JsonBackend keeps the original users.json / transactions.log /
+pending_requests.json files; sqlite_backend.SqliteBackend stores the same
+data in one SQLite database.
+"""
+import contextlib
+import sys
+import threading
+
+import metrics
+from accounts import AccountTable
+from commit_pipeline import CommitPipeline
+from journal import Journal
+from locking import KeyLocks
+from request_store import RequestStore
+from snapshots import SnapshotStore, apply_entries
+from wal_store import WalStore
+
+ROTATION_KEYS = ("log-rotation",)
+
+
+class StorageBackend:
+    """Base class documenting the storage interface used by BankApp."""
+
+    users = None
+    journal = None
+    requests = None
+
+    def load_users(self):
+        raise NotImplementedError
+
+    def refresh_users(self):
+        raise NotImplementedError
+
+    def locked(self, usernames=(), keys=()):
+        return contextlib.nullcontext()
+
+    def group_commit(self):
+        return contextlib.nullcontext()
+
+    def commit(self, usernames=(), log_entries=(), updates=None):
+        raise NotImplementedError
+
+    def balance_at(self, acc_no, timestamp):
+        raise NotImplementedError
+
+    def snapshot(self):
+        return None
+
+    def rotate_log(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class JsonBackend(StorageBackend):
+    """The JSON files: users.json (+WAL), transactions.log (JSON Lines), pending_requests.json.
+
+    Every `snapshot_interval` bytes of journal, a background thread writes a
+    binary balance snapshot to `<log>.snapshots/` (see snapshots.py) and
+    deletes all but the newest `snapshot_keep` and the opening one. Once
+    the log holds `segment_bytes` (or, with rotate_monthly, a new month
+    begins), another seals it into a compressed segment in `<log>.segments/`.
+    """
+
+    def __init__(self, users_file, log_file, requests_file, checkpoint_every=500, fsync_every=0,
+                 commit_window=None, commit_batch=256, snapshot_interval=8 << 20, snapshot_keep=3,
+                 segment_bytes=32 << 20, rotate_monthly=False):
+        self.key_locks = KeyLocks(users_file + ".keys.lock")
+        # Its own lock file: it is only ever tried, never waited for, by the background sealer
+        self.rotation_lock = KeyLocks(log_file + ".rotate.lock", slots=1)
+        self.user_store = WalStore(users_file, checkpoint_every=checkpoint_every, factory=AccountTable,
+                                   name="ledger")
+        self.journal = Journal(log_file, fsync_every=fsync_every, segment_bytes=segment_bytes,
+                               monthly=rotate_monthly)
+        self.requests = RequestStore(requests_file, checkpoint_every=checkpoint_every,
+                                     before_commit=self._flush_own_group)
+        self.pipeline = None
+        if commit_window is not None:
+            self.pipeline = CommitPipeline(self._write, window=commit_window, max_batch=commit_batch)
+        self.snapshots = SnapshotStore(log_file + ".snapshots")
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_keep = snapshot_keep
+        self._snapshot_position = None
+        self._snapshot_thread = None
+        self._rotation_thread = None
+        # State of an open group_commit() block
+        self._group_owner = None
+        self._group_keys = set()
+        self._staged_users = {}
+        self._staged_previous = {}  # what the staged users replaced in memory, for rollback
+        self._staged_logs = []
+
+    @property
+    def users(self):
+        return self.user_store.data
+
+    def load_users(self):
+        return self.user_store.load()
+
+    def refresh_users(self):
+        changed = self.user_store.refresh()
+        if changed:
+            # A reload must not undo changes that are applied but not written yet
+            unwritten = dict(self._staged_users)
+            if self.pipeline is not None:
+                unwritten.update(self.pipeline.pending_updates())
+            self.user_store.apply(unwritten)
+        return changed
+
+    def _in_group(self):
+        return self._group_owner == threading.get_ident()
+
+    @contextlib.contextmanager
+    def locked(self, usernames=(), keys=()):
+        keys = {f"user:{name}" for name in usernames} | set(keys)
+        if not self._in_group():
+            with self.key_locks.hold(keys):
+                yield
+            return
+
+        # Inside group_commit() locks stay held until the group is written
+        new_keys = keys - self._group_keys
+        if new_keys and not self.key_locks.acquire(new_keys, blocking=False):
+            # Waiting while holding the group's locks could deadlock with another process
+            self._flush_group()
+            self._release_group_keys()
+            self.key_locks.acquire(new_keys)
+        self._group_keys |= new_keys
+        yield
+
+    @contextlib.contextmanager
+    def group_commit(self):
+        """Writes every commit made inside the block as one WAL record and one journal write.
+
+        Changes are visible in memory immediately. Nested blocks join the
+        outer one. Only one thread may use a group at a time; commits from
+        other threads are not part of it.
+        """
+        if self._in_group():
+            yield
+            return
+        if self._group_owner is not None:
+            raise RuntimeError("group_commit() is already open in another thread")
+        self._group_owner = threading.get_ident()
+        try:
+            yield
+        finally:
+            try:
+                self._flush_group()
+            finally:
+                self._release_group_keys()
+                self._group_owner = None
+
+    def _flush_own_group(self):
+        if self._in_group():
+            self._flush_group()
+
+    def _flush_group(self):
+        staged_users, self._staged_users = self._staged_users, {}
+        staged_previous, self._staged_previous = self._staged_previous, {}
+        staged_logs, self._staged_logs = self._staged_logs, []
+        try:
+            self._write(staged_users, staged_logs)
+        except BaseException:
+            self.user_store.rollback(staged_previous)
+            raise
+
+    def _release_group_keys(self):
+        self.key_locks.release(self._group_keys)
+        self._group_keys = set()
+
+    def commit(self, usernames=(), log_entries=(), updates=None):
+        updates = dict(updates or {})
+        for name in usernames:
+            updates.setdefault(name, self.users[name])
+        if self._in_group():
+            self._staged_users.update(updates)
+            for name, value in self.user_store.apply(updates).items():
+                self._staged_previous.setdefault(name, value)
+            self._staged_logs.extend(log_entries)
+            return
+        if self.pipeline is not None:
+            # Visible at once to whoever holds these accounts' locks next; durable on return
+            previous = self.user_store.apply(updates)
+            try:
+                self.pipeline.submit(updates, log_entries)
+            except BaseException:
+                # Still under the caller's account locks, so nobody has built on these values yet
+                self.user_store.rollback(previous)
+                raise
+            return
+        self._write(updates, log_entries)
+
+    def _write(self, updates, log_entries):
+        # Both files under one lock, so a snapshot baseline never sees half a commit
+        with self.user_store.write_lock():
+            # Balances first: if we crash in between, the ledger is right and only a log line is missing
+            if updates:
+                self.user_store.commit(updates=updates, checkpoint=False)
+            if log_entries:
+                self.journal.append_many(list(log_entries))
+        self.user_store.maybe_checkpoint()
+        if log_entries:
+            self._maybe_snapshot()
+            self._maybe_rotate()
+
+    # Balance snapshots
+
+    def _maybe_snapshot(self):
+        if self.snapshot_interval is None:
+            return
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return
+        if self._snapshot_position is None:
+            self._snapshot_position = self.snapshots.latest_position()
+        if (self._snapshot_position is not None
+                and self.journal.end_position() - self._snapshot_position < self.snapshot_interval):
+            return
+        self._snapshot_thread = threading.Thread(target=self._background_snapshot, name="balance-snapshot",
+                                                 daemon=True)
+        self._snapshot_thread.start()
+
+    def _background_snapshot(self):
+        try:
+            self.snapshot()
+        except Exception as e:
+            # Retry after another interval of journal rather than on every commit
+            self._snapshot_position = self.journal.end_position()
+            metrics.count("snapshot_errors")
+            print(f"balance snapshot failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    def snapshot(self):
+        """Writes a snapshot at the current end of the journal; returns it."""
+        latest = self.snapshots.latest()
+        if latest is None:
+            return self._create_baseline()
+        end = self.journal.end_position()
+        if end != latest.position:
+            balances = dict(latest.balances)
+            last_timestamp = apply_entries(
+                balances, (entry for entry, _ in self.journal.read_from(latest.position, end)),
+                latest.last_timestamp,
+            )
+            latest = self.snapshots.write(end, last_timestamp, balances)
+            self.snapshots.prune(self.snapshot_keep)
+        self._snapshot_position = latest.position
+        return latest
+
+    def _create_baseline(self):
+        """First snapshots: balances before any journal record, and as of now.
+
+        Accounts created before the journal existed (or before signups were
+        logged) have no opening record, so their starting point is worked out
+        from today's balance minus everything the journal says happened.
+        """
+        with self.user_store.exclusive() as users:
+            end = self.journal.end_position()
+            current = {user.get("account_no"): user.get("balance", 0) for user in users.values()}
+        totals = {}
+        last_timestamp = apply_entries(totals, (entry for entry, _ in self.journal.read_from(0, end)))
+        opening = {}
+        for acc_no, balance in current.items():
+            before = balance - totals.get(acc_no, 0)
+            if before or acc_no not in totals:  # else it was opened with a logged record
+                opening[acc_no] = before
+        self.snapshots.write(0, "", opening)
+        latest = self.snapshots.write(end, last_timestamp, current) if end else self.snapshots.latest()
+        self._snapshot_position = latest.position
+        return latest
+
+    def balance_at(self, acc_no, timestamp):
+        if self.snapshots.latest_position() is None:
+            self.snapshot()
+        start = self.snapshots.latest(at_or_before=timestamp)
+        # Records up to the next snapshot may still be older than timestamp; none after it are
+        end = self.snapshots.next_position(start.position)
+        balance = start.balances.get(acc_no)
+        for entry in self.journal.iter_account_range(acc_no, start.position, end):
+            if (entry.get("timestamp") or "") <= timestamp:
+                balance = (balance or 0) + entry.get("amount", 0)
+        return balance
+
+    # Log rotation
+
+    def _maybe_rotate(self):
+        # Like a checkpoint, trimming the active file waits for every writer, so it is done
+        # here by a committing thread; the slow part, compression, runs in the background.
+        if self.journal.compaction_due():
+            with self.user_store.exclusive():
+                self.journal.compact()
+            return
+        if self._rotation_thread is not None and self._rotation_thread.is_alive():
+            return
+        if not self.journal.needs_rotation():
+            return
+        self._rotation_thread = threading.Thread(target=self._seal_log, name="log-rotation", daemon=True)
+        self._rotation_thread.start()
+
+    def _seal_log(self, blocking=False):
+        if not self.rotation_lock.acquire(ROTATION_KEYS, blocking=blocking):
+            return None  # another thread or process is sealing
+        try:
+            return self.journal.seal()
+        finally:
+            self.rotation_lock.release(ROTATION_KEYS)
+
+    def rotate_log(self):
+        """Seals the active log into a compressed segment now; returns the segment, or None.
+
+        Compression runs while commits carry on; they pause only while the
+        records written meanwhile are copied into the new active file.
+        """
+        segment = self._seal_log(blocking=True)
+        with self.user_store.exclusive():
+            self.journal.compact()
+        return segment
+
+    def close(self):
+        if self.pipeline is not None:
+            self.pipeline.close()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self._rotation_thread is not None:
+            self._rotation_thread.join()
+        self.user_store.close()
+        self.journal.close()
+
+
+def open_storage(kind, users_file, log_file, requests_file, sqlite_file, checkpoint_every=500, fsync_every=0,
+                 commit_window=None, commit_batch=256, snapshot_interval=8 << 20, snapshot_keep=3,
+                 segment_bytes=32 << 20, rotate_monthly=False):
+    """Returns the backend named by kind ("json" or "sqlite").
+
+    commit_window (seconds) turns on cross-thread group commit for the JSON
+    backend. SQLite in WAL mode with synchronous=NORMAL already defers its
+    syncs to checkpoints, so it ignores the setting.
+    """
+    if kind == "json":
+        return JsonBackend(users_file, log_file, requests_file,
+                           checkpoint_every=checkpoint_every, fsync_every=fsync_every,
+                           commit_window=commit_window, commit_batch=commit_batch,
+                           snapshot_interval=snapshot_interval, snapshot_keep=snapshot_keep,
+                           segment_bytes=segment_bytes, rotate_monthly=rotate_monthly)
+    if kind == "sqlite":
+        from sqlite_backend import SqliteBackend
+        return SqliteBackend(sqlite_file)
+    raise ValueError(f"Unknown storage backend: {kind!r}")
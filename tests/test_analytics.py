@@ -0,0 +1,58 @@
+import pytest
+
+import analytics
+from analytics import StatementAnalytics
+from journal import Journal
+
+ACC_NO = "100001"
+
+
+def record(timestamp, type, amount, target_acc_no=None):
+    return {"timestamp": timestamp, "account_no": ACC_NO, "type": type, "amount": amount,
+            "status": "Success", "target_acc_no": target_acc_no}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / "transactions.log"))
+    yield journal
+    journal.close()
+
+
+def figures(journal, balance):
+    stats = StatementAnalytics(journal)
+    return (stats.monthly_totals(ACC_NO), stats.running_balances(ACC_NO, balance),
+            stats.largest_transfers(ACC_NO, 3), stats.counterparties(ACC_NO), stats.summary(ACC_NO, balance))
+
+
+def pure_python_figures(journal, balance, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(analytics, "np", None)
+        return figures(journal, balance)
+
+
+def test_amounts_beyond_int64_sums_are_exact(journal, monkeypatch):
+    journal.append_many([
+        record("2025-01-05 10:00:00", "Deposit", 5 * 10 ** 18),
+        record("2025-01-06 10:00:00", "Deposit", 5 * 10 ** 18),
+        record("2025-01-07 10:00:00", "Send", -10 ** 18, "100002"),
+    ])
+    balance = 9 * 10 ** 18 + 1000
+
+    months, balances, largest, parties, summary = figures(journal, balance)
+
+    assert months == [{"month": "2025-01", "in": 10 ** 19, "out": 10 ** 18, "net": 9 * 10 ** 18, "count": 3}]
+    assert balances == [5 * 10 ** 18 + 1000, 10 ** 19 + 1000, balance]
+    assert [entry["amount"] for entry in largest] == [5 * 10 ** 18, 5 * 10 ** 18, -10 ** 18]
+    assert parties == [{"acc_no": "100002", "sent": 10 ** 18, "received": 0, "count": 1}]
+    assert summary["in"] == 10 ** 19
+    assert (months, balances, largest, parties, summary) == pure_python_figures(journal, balance, monkeypatch)
+
+
+def test_small_amounts_match_pure_python(journal, monkeypatch):
+    journal.append_many([
+        record("2025-01-05 10:00:00", "Deposit", 500),
+        record("2025-02-01 09:00:00", "Send", -200, "100002"),
+        record("2025-02-03 12:00:00", "Receive (Send)", 75, "100003"),
+    ])
+    assert figures(journal, 2375) == pure_python_figures(journal, 2375, monkeypatch)
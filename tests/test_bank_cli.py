@@ -0,0 +1,26 @@
+import pytest
+
+from bank_cli import read_payroll
+
+
+def payroll_file(tmp_path, text):
+    path = tmp_path / "payroll.csv"
+    path.write_text(text)
+    return str(path)
+
+
+def test_reads_rows_after_a_header(tmp_path):
+    path = payroll_file(tmp_path, "target_acc_no,amount\n280505, 1500\n\n280506,-20\n")
+    assert read_payroll(path) == [("280505", 1500), ("280506", -20)]
+
+
+@pytest.mark.parametrize("text, line", [
+    ("280505\n", 1),
+    ("target_acc_no,amount\n280505,1500\n280506\n", 3),
+    ("280505,1500\n280506,12.5\n", 2),
+    ("target_acc_no,amount\nacc_no,amount\n", 2),
+    ("280505,abc\n", 1),
+])
+def test_bad_rows_are_reported_with_their_line(tmp_path, text, line):
+    with pytest.raises(ValueError, match=f"^line {line}: "):
+        read_payroll(payroll_file(tmp_path, text))
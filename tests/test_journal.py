@@ -0,0 +1,54 @@
+import pytest
+
+from journal import Journal
+
+
+def record(n, acc_no):
+    return {"timestamp": f"2025-01-01 00:00:{n:02d}", "account_no": acc_no, "type": "Deposit", "amount": n}
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """A journal sealed twice: records 0-19 and 20-39 in segments, 40-59 in the active file."""
+    path = str(tmp_path / "transactions.log")
+    journal = Journal(path)
+    for first in (0, 20, 40):
+        journal.append_many([record(n, "100001" if n % 2 else "100002") for n in range(first, first + 20)])
+        if first < 40:
+            journal.seal()
+            journal.compact()
+    journal.close()
+    return path
+
+
+def pages(cursor, size):
+    found = []
+    while cursor.has_more():
+        found.append([entry["amount"] for entry in cursor.next_page(size)])
+    return found
+
+
+def test_cursor_pages_cross_sealed_segments(log_file):
+    journal = Journal(log_file)
+    try:
+        expected = [entry["amount"] for entry in journal.iter_account("100001")]
+        assert expected == list(range(59, 0, -2))
+        for size in (1, 7, 10, 100):
+            found = pages(journal.cursor("100001"), size)
+            assert sum(found, []) == expected
+            assert all(len(page) == size for page in found[:-1])
+    finally:
+        journal.close()
+
+
+def test_cursor_reads_segment_indexes_only_when_it_reaches_them(log_file):
+    journal = Journal(log_file)
+    try:
+        cursor = journal.cursor("100001")
+        assert [entry["amount"] for entry in cursor.next_page(10)] == list(range(59, 39, -2))
+        assert not journal.segments._indexes
+
+        assert [entry["amount"] for entry in cursor.next_page(10)] == list(range(39, 19, -2))
+        assert len(journal.segments._indexes) == 1
+    finally:
+        journal.close()
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import locking
+from locking import KeyLocks
+from storage import JsonBackend
+
+# Both hash to slot 3303 of the default 4096
+COLLIDING_KEYS = ["user:u87", "user:u200"]
+
+
+def taken_by_another_process(path, key):
+    """True if a separate process cannot lock key right now."""
+    code = ("import sys; from locking import KeyLocks; "
+            "sys.exit(0 if KeyLocks(sys.argv[1]).acquire([sys.argv[2]], blocking=False) else 1)")
+    return subprocess.run([sys.executable, "-c", code, path, key], cwd=os.path.dirname(locking.__file__)).returncode != 0
+
+
+def test_colliding_keys_share_a_slot():
+    locks = KeyLocks("unused")
+    assert locks._slot_for(COLLIDING_KEYS[0]) == locks._slot_for(COLLIDING_KEYS[1])
+
+
+def test_slot_is_freed_when_keys_acquired_apart_are_released_together(tmp_path):
+    path = str(tmp_path / "keys.lock")
+    locks = KeyLocks(path)
+    locks.acquire([COLLIDING_KEYS[0]])
+    locks.acquire([COLLIDING_KEYS[1]])
+    assert taken_by_another_process(path, COLLIDING_KEYS[0])
+
+    locks.release(COLLIDING_KEYS)
+    assert not taken_by_another_process(path, COLLIDING_KEYS[0])
+
+
+def test_slot_is_held_until_the_last_key_on_it_is_released(tmp_path):
+    path = str(tmp_path / "keys.lock")
+    locks = KeyLocks(path)
+    locks.acquire(COLLIDING_KEYS)
+    locks.release([COLLIDING_KEYS[0]])
+    assert taken_by_another_process(path, COLLIDING_KEYS[0])
+
+    locks.release([COLLIDING_KEYS[1]])
+    assert not taken_by_another_process(path, COLLIDING_KEYS[0])
+
+
+def test_group_commit_releases_colliding_account_locks(tmp_path):
+    users_file = str(tmp_path / "users.json")
+    storage = JsonBackend(users_file, str(tmp_path / "transactions.log"), str(tmp_path / "requests.jsonl"))
+    try:
+        with storage.group_commit():
+            with storage.locked(["u87"]):
+                pass
+            with storage.locked(["u200"]):
+                pass
+        assert not taken_by_another_process(users_file + ".keys.lock", "user:u87")
+    finally:
+        storage.close()
@@ -0,0 +1,123 @@
+import json
+import queue
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import main
+from ollama_client import OllamaClient
+
+CHUNKS = [
+    {"response": "Hel", "done": False},
+    {"response": "", "done": False},
+    {"response": "lo", "done": False},
+    {"response": "", "done": True, "load_duration": 2_000_000_000},
+]
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Answers /api/generate with CHUNKS as NDJSON; any other path is an unknown model."""
+
+    def do_POST(self):
+        self.server.payloads.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        if self.path != "/api/generate":
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b'{"error": "model not found"}')
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for chunk in CHUNKS:
+            self.wfile.write(json.dumps(chunk).encode() + b"\n")
+            self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    server.payloads = []
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(url):
+    return OllamaClient(url, "llama3", connect_timeout=1, read_timeout=5, retries=0, keep_alive="5m")
+
+
+def generate_url(server, path="/api/generate"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/api/generate"
+
+
+def run_stream_ollama_response(monkeypatch, client):
+    monkeypatch.setattr(main, "get_ollama_client", lambda: client)
+    out_queue = queue.Queue()
+    main.stream_ollama_response("hi", out_queue, threading.Event())
+    client.close()
+    items = []
+    while not out_queue.empty():
+        items.append(out_queue.get_nowait())
+    return items
+
+
+def test_stream_yields_tokens_and_records_latency(server):
+    client = client_for(generate_url(server))
+    try:
+        assert list(client.stream("What is APR?")) == ["Hel", "lo"]
+    finally:
+        client.close()
+    assert server.payloads == [{"model": "llama3", "prompt": "What is APR?", "stream": True, "keep_alive": "5m"}]
+    assert client.last_latency["model_load"] == 2.0
+    assert client.last_latency["first_token"] <= client.last_latency["total"]
+
+
+def test_stream_stops_when_cancelled(server):
+    cancel = threading.Event()
+    client = client_for(generate_url(server))
+    tokens = []
+    try:
+        for token in client.stream("hi", cancel):
+            tokens.append(token)
+            cancel.set()
+    finally:
+        client.close()
+    assert tokens == ["Hel"]
+    assert client.last_latency is None
+
+
+def test_answer_is_streamed_into_the_queue(server, monkeypatch):
+    items = run_stream_ollama_response(monkeypatch, client_for(generate_url(server)))
+    assert items == [("token", "Hel"), ("token", "lo"), ("done", None)]
+
+
+def test_missing_model_reports_404(server, monkeypatch):
+    with pytest.raises(requests.exceptions.HTTPError):
+        list(client_for(generate_url(server, "/unknown")).stream("hi"))
+
+    items = run_stream_ollama_response(monkeypatch, client_for(generate_url(server, "/unknown")))
+    assert items == [("error", f"**Model Error (404).** The model **{main.OLLAMA_MODEL}** may not be installed.")]
+
+
+def test_unreachable_server_reports_connection_error(monkeypatch):
+    with pytest.raises(requests.exceptions.ConnectionError):
+        list(client_for(closed_port_url()).stream("hi"))
+
+    items = run_stream_ollama_response(monkeypatch, client_for(closed_port_url()))
+    assert items == [("error", "**Connection Error.** Please ensure **Ollama is running**.")]
@@ -0,0 +1,63 @@
+import array
+import os
+import sys
+import zlib
+
+import snapshots
+from snapshots import SnapshotStore
+from storage import JsonBackend
+
+
+def test_prune_keeps_the_newest_and_the_opening_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    for position in range(0, 60, 10):
+        store.write(position, f"2025-01-0{position // 10 + 1} 00:00:00", {"100001": position})
+
+    assert store.prune(3) == 2
+    assert [position for position, _, _ in store.headers()] == [0, 30, 40, 50]
+    assert store.prune(3) == 0
+    assert store.latest(at_or_before="2025-01-02 12:00:00").position == 0
+
+
+def test_old_balances_survive_pruning(tmp_path):
+    log_file = str(tmp_path / "transactions.log")
+    storage = JsonBackend(str(tmp_path / "users.json"), log_file, str(tmp_path / "requests.jsonl"),
+                          snapshot_interval=None, snapshot_keep=2)
+    try:
+        storage.load_users()
+        storage.commit(updates={"alice": {"password": "pw", "pin": "1234", "balance": 100, "account_no": "100001"}})
+        balance = 100
+        for day in range(1, 8):
+            balance += day
+            storage.commit(updates={"alice": dict(storage.users["alice"], balance=balance)}, log_entries=[
+                {"timestamp": f"2025-01-0{day} 12:00:00", "account_no": "100001", "type": "Deposit", "amount": day}
+            ])
+            storage.snapshot()
+
+        assert len(os.listdir(log_file + ".snapshots")) == 3
+        assert storage.balance_at("100001", "2025-01-01 23:00:00") == 101
+        assert storage.balance_at("100001", "2025-01-03 23:00:00") == 106
+        assert storage.balance_at("100001", "2025-01-07 23:00:00") == balance
+    finally:
+        storage.close()
+
+
+def test_balances_beyond_int64_round_trip(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    balances = {"100001": 10 ** 30, "100002": -(2 ** 63) - 1, "100003": 2 ** 63 - 1, "100004": 250}
+    store.write(40, "2025-01-01 00:00:00", balances)
+    assert SnapshotStore(store.directory).latest().balances == balances
+
+
+def test_reads_version_1_snapshots(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    os.makedirs(store.directory)
+    blob = b"100001\n100002"
+    values = array.array("q", [5, -7])
+    if sys.byteorder == "big":
+        values.byteswap()
+    payload = blob + values.tobytes()
+    header = snapshots.HEADER.pack(snapshots.MAGIC, 1, 0, 2, b"", len(blob), zlib.crc32(payload))
+    with open(os.path.join(store.directory, f"{0:016d}.snap"), "wb") as f:
+        f.write(header + payload)
+    assert store.latest().balances == {"100001": 5, "100002": -7}
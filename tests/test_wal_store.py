@@ -0,0 +1,72 @@
+import json
+
+from storage import JsonBackend
+from wal_store import WalStore
+
+
+def record(balance, account_no="100001"):
+    return {"password": "pw", "pin": "1234", "balance": balance, "account_no": account_no}
+
+
+def on_disk(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def reopened(path):
+    store = WalStore(path)
+    try:
+        return dict(store.load())
+    finally:
+        store.close()
+
+
+def test_checkpoint_leaves_out_applied_but_unwritten_values(tmp_path):
+    path = str(tmp_path / "users.json")
+    store = WalStore(path)
+    store.load()
+    store.commit(updates={"a": 1, "b": 1})
+
+    store.apply({"a": 2, "new": 5})
+    store.commit(updates={"b": 2})
+    store.checkpoint()
+    assert on_disk(path) == {"a": 1, "b": 2}
+    assert store.data == {"a": 2, "b": 2, "new": 5}
+
+    store.commit(updates={"a": 2, "new": 5})
+    store.checkpoint()
+    store.close()
+    assert on_disk(path) == reopened(path) == {"a": 2, "b": 2, "new": 5}
+
+
+def test_rollback_after_checkpoint_leaves_no_trace_on_disk(tmp_path):
+    path = str(tmp_path / "users.json")
+    store = WalStore(path)
+    store.load()
+    store.commit(updates={"a": 1})
+
+    previous = store.apply({"a": 2})
+    store.checkpoint()
+    assert on_disk(path) == {"a": 1}
+    store.rollback(previous)
+    store.checkpoint()
+    store.close()
+    assert store.data == on_disk(path) == reopened(path) == {"a": 1}
+
+
+def test_group_commit_values_stay_out_of_checkpoints_until_written(tmp_path):
+    users_file = str(tmp_path / "users.json")
+    storage = JsonBackend(users_file, str(tmp_path / "transactions.log"), str(tmp_path / "requests.jsonl"))
+    try:
+        storage.load_users()
+        storage.commit(updates={"alice": record(100)})
+        with storage.group_commit():
+            with storage.locked(["alice"]):
+                storage.commit(updates={"alice": record(40)}, log_entries=[{"account_no": "100001", "amount": -60}])
+            # As a checkpoint triggered by another thread's commit would
+            storage.user_store.checkpoint()
+            assert on_disk(users_file)["alice"]["balance"] == 100
+        storage.user_store.checkpoint()
+        assert on_disk(users_file)["alice"]["balance"] == 40
+    finally:
+        storage.close()
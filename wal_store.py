@@ -0,0 +1,294 @@
+"""Crash-safe JSON dict storage backed by a write-ahead log.
+
+Each commit appends the changed keys as one JSON line to `<file>.wal` and
+fsyncs it; the full JSON file is only rewritten on checkpoint, via a temp
+file and os.replace, so a crash can never leave it half-written. On load,
+the checkpoint is read and the WAL is replayed on top of it.
+
+Several processes may share the same files: commits hold `<file>.lock`
+shared and checkpoints hold it exclusive, and refresh() replays just the
+WAL records other processes appended since we last looked.
+
+`factory` builds the in-memory mapping (a dict by default); values that are
+not plain JSON types, such as accounts.AccountRecord views, are written via
+dict(). Values changed by apply() but not committed yet are kept out of
+checkpoints: those, and exclusive(), see the last durable value instead. Load, commit and checkpoint timings and bytes are reported to
+metrics under `name` (e.g. "ledger_commit", "ledger_wal_written_bytes").
+"""
+import contextlib
+import json
+import os
+import threading
+from collections.abc import Mapping
+
+import metrics
+from locking import FileLock
+
+
+_MISSING = object()
+
+
+class StoreCorruptError(Exception):
+    """The checkpoint file exists but cannot be parsed."""
+
+
+class WalStore:
+    """A JSON object file plus a write-ahead log of per-key updates."""
+
+    def __init__(self, file_path, checkpoint_every=500, fsync=True, factory=dict, name="store"):
+        self.file_path = file_path
+        self.name = name
+        self.wal_path = file_path + ".wal"
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        self.data = factory()
+        self.lock = FileLock(file_path + ".lock")
+        self._mutex = threading.RLock()
+        self._wal = None
+        self._wal_records = 0
+        self._wal_pos = 0
+        self._loaded = False
+        self._checkpoint_id = None
+        self._unwritten = {}  # key -> last durable value, for keys apply() changed ahead of the WAL
+
+    def _checkpoint_identity(self):
+        """Identifies the checkpoint file; os.replace on checkpoint always changes it."""
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _wal_size(self):
+        try:
+            return os.path.getsize(self.wal_path)
+        except FileNotFoundError:
+            return 0
+
+    def refresh(self):
+        """Picks up changes written since we last read or wrote the files.
+
+        Returns the keys that changed (every key after a full reload), or an
+        empty list when nothing changed on disk.
+        """
+        with self._mutex, self.lock.shared():
+            return self._refresh_locked()
+
+    def _refresh_locked(self):
+        if (not self._loaded or self._checkpoint_identity() != self._checkpoint_id
+                or self._wal_size() < self._wal_pos):
+            self._load_locked()
+            return list(self.data)
+        return self._replay_wal()
+
+    def load(self):
+        """Reads the last checkpoint, replays the WAL and returns the data dict."""
+        with self._mutex:
+            with self.lock.shared():
+                self._load_locked()
+            self.maybe_checkpoint()
+        return self.data
+
+    def _load_locked(self):
+        with metrics.timer(self.name + "_load"):
+            data = {}
+            checkpoint_id = self._checkpoint_identity()
+            if checkpoint_id is not None:
+                with open(self.file_path, "r") as f:
+                    content = f.read()
+                metrics.add_bytes(self.name + "_read", len(content))
+                if content.strip():
+                    try:
+                        data = json.loads(content)
+                    except json.JSONDecodeError as e:
+                        raise StoreCorruptError(f"{self.file_path} is not valid JSON: {e}") from e
+
+            # Merge in place so callers holding a reference to self.data stay current
+            for key in list(self.data):
+                if key not in data:
+                    del self.data[key]
+            self.data.update(data)
+            self._loaded = True
+            self._checkpoint_id = checkpoint_id
+            self._wal_pos = 0
+            self._wal_records = 0
+            self._replay_wal()
+
+    def _replay_wal(self):
+        """Applies WAL records past self._wal_pos; returns the keys they touched."""
+        if self._wal_size() <= self._wal_pos:
+            return []
+        changed = []
+        with open(self.wal_path, "rb") as f:
+            f.seek(self._wal_pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # still being written, or torn by a crash mid-append
+                self._wal_pos += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # torn line that a later append terminated; that commit never completed
+                updates = record.get("set", {})
+                self.data.update(updates)
+                changed.extend(updates)
+                for key in record.get("delete", ()):
+                    self.data.pop(key, None)
+                    changed.append(key)
+                self._wal_records += 1
+        return changed
+
+    def _open_wal(self):
+        if self._wal is None:
+            self._wal = open(self.wal_path, "ab", buffering=0)
+            if self._wal.tell() > 0:
+                with open(self.wal_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+                if torn:
+                    self._wal.write(b"\n")
+        return self._wal
+
+    def commit(self, keys=(), deleted=(), updates=None, checkpoint=True):
+        """Durably records the current values of `keys` (and removal of `deleted`).
+
+        `updates` maps keys to new values. They are stored in self.data
+        once the record is durable, under the same mutex as the write, so a
+        concurrent reload can never replace a value that was changed but not
+        yet committed. If the write or fsync fails, self.data is left as it
+        was and the partial record is voided so no reader ever applies it.
+        All keys in one call are written as a single WAL record, so they are
+        applied together or not at all. With checkpoint=False the caller
+        must call maybe_checkpoint() once it no longer holds write_lock().
+        """
+        with metrics.timer(self.name + "_commit"), self._mutex:
+            record = {"set": {key: self.data[key] for key in keys}}
+            if updates:
+                record["set"].update(updates)
+            if deleted:
+                record["delete"] = list(deleted)
+            line = (json.dumps(record, default=dict) + "\n").encode("utf-8")
+            with self.lock.shared():
+                wal = self._open_wal()
+                written, end = 0, None
+                try:
+                    written = wal.write(line) or 0
+                    end = os.lseek(wal.fileno(), 0, os.SEEK_CUR)
+                    if written != len(line):
+                        raise OSError(f"short write to {self.wal_path} ({written} of {len(line)} bytes)")
+                    if self.fsync:
+                        os.fsync(wal.fileno())
+                except BaseException:
+                    if written and end is not None:
+                        self._void_record(end - written)
+                    raise
+                metrics.add_bytes(self.name + "_wal_written", len(line))
+                # Nobody else appended since our last replay: skip re-reading our own record
+                if end - len(line) == self._wal_pos and self._checkpoint_identity() == self._checkpoint_id:
+                    self._wal_pos = end
+                    self._wal_records += 1
+                if updates:
+                    self.data.update(updates)
+                for key in deleted:
+                    self.data.pop(key, None)
+                # Whoever applied these holds their locks until now, so memory and disk agree again
+                for key in record["set"]:
+                    self._unwritten.pop(key, None)
+                for key in deleted:
+                    self._unwritten.pop(key, None)
+            if checkpoint:
+                self.maybe_checkpoint()
+
+    def _void_record(self, position):
+        """Makes a failed record at `position` unparseable, so replay skips it like a torn line."""
+        try:
+            fd = os.open(self.wal_path, os.O_WRONLY)  # no O_APPEND: pwrite must land at `position`
+            try:
+                os.pwrite(fd, b"#", position)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+        # A short write leaves the record unterminated; reopening adds the missing newline
+        self._wal.close()
+        self._wal = None
+
+    def apply(self, updates):
+        """Changes values in memory only; a later commit() has to write them.
+
+        Returns the values they replaced, for rollback() if that commit fails.
+        The caller must hold the keys' locks until that commit or rollback.
+        """
+        with self._mutex:
+            previous = {}
+            for key in updates:
+                value = self.data.get(key, _MISSING)
+                previous[key] = dict(value) if isinstance(value, Mapping) else value
+                self._unwritten.setdefault(key, previous[key])
+            self.data.update(updates)
+            return previous
+
+    def rollback(self, previous):
+        """Restores values that apply() replaced and that were never committed."""
+        with self._mutex:
+            for key, value in previous.items():
+                if value is _MISSING:
+                    self.data.pop(key, None)
+                else:
+                    self.data[key] = value
+                self._unwritten.pop(key, None)
+
+    @contextlib.contextmanager
+    def write_lock(self):
+        """Holds off checkpoints and exclusive() while the caller writes related files."""
+        with self._mutex, self.lock.shared():
+            yield
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Waits for every writer, in this and other processes; yields the data as it is on disk.
+
+        That is self.data brought up to date, minus anything apply() changed
+        that is not committed yet.
+        """
+        with self._mutex, self.lock.exclusive():
+            # Fold in other processes' commits first so none of them is dropped
+            self._refresh_locked()
+            yield self._durable_data()
+
+    def _durable_data(self):
+        if not self._unwritten:
+            return self.data
+        data = dict(self.data)
+        for key, value in self._unwritten.items():
+            if value is _MISSING:
+                data.pop(key, None)
+            else:
+                data[key] = value
+        return data
+
+    def maybe_checkpoint(self):
+        if self._wal_records >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Writes the full data file atomically and empties the WAL."""
+        with metrics.timer(self.name + "_checkpoint"), self.exclusive() as data:
+            temp_path = self.file_path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(data, f, indent=4, default=dict)
+                f.flush()
+                os.fsync(f.fileno())
+                metrics.add_bytes(self.name + "_checkpoint_written", f.tell())
+            os.replace(temp_path, self.file_path)
+
+            with open(self.wal_path, "wb"):
+                pass
+            self._wal_records = 0
+            self._wal_pos = 0
+            self._checkpoint_id = self._checkpoint_identity()
+
+    def close(self):
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None